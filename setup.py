@@ -37,6 +37,7 @@ def get_routines():
         'extension = htsql.ctl.extension:ExtensionRoutine',
         'server = htsql.ctl.server:ServerRoutine',
         'shell = htsql.ctl.shell:ShellRoutine',
+        'snapshot = htsql.ctl.snapshot:SnapshotRoutine',
         'regress = htsql.ctl.regress:RegressRoutine',
         'ui = htsql_ui.ctl.ui:UIRoutine',
     ]
@@ -55,12 +56,15 @@ def get_addons():
         'engine.mssql = htsql_mssql.core:EngineMSSQLAddon',
         'tweak = htsql.tweak:TweakAddon',
         'tweak.autolimit = htsql.tweak.autolimit:TweakAutolimitAddon',
+        'tweak.cache = htsql.tweak.cache:TweakCacheAddon',
         'tweak.cors = htsql.tweak.cors:TweakCORSAddon',
         'tweak.csrf = htsql.tweak.csrf:TweakCSRFAddon',
         'tweak.django = htsql.tweak.django:TweakDjangoAddon',
+        'tweak.etag = htsql.tweak.etag:TweakETagAddon',
         'tweak.etl = htsql.tweak.etl:TweakETLAddon',
         'tweak.filedb = htsql.tweak.filedb:TweakFileDBAddon',
         'tweak.gateway = htsql.tweak.gateway:TweakGatewayAddon',
+        'tweak.gzip = htsql.tweak.gzip:TweakGzipAddon',
         'tweak.hello = htsql.tweak.hello:TweakHelloAddon',
         'tweak.inet = htsql.tweak.inet:TweakINetAddon',
         'tweak.inet.pgsql = htsql_pgsql.tweak.inet:TweakINetPGSQLAddon',
@@ -68,6 +72,8 @@ def get_addons():
         'tweak.meta.slave = htsql.tweak.meta.slave:TweakMetaSlaveAddon',
         'tweak.override = htsql.tweak.override:TweakOverrideAddon',
         'tweak.pool = htsql.tweak.pool:TweakPoolAddon',
+        'tweak.profile = htsql.tweak.profile:TweakProfileAddon',
+        'tweak.replica = htsql.tweak.replica:TweakReplicaAddon',
         'tweak.resource = htsql.tweak.resource:TweakResourceAddon',
         'tweak.shell = htsql.tweak.shell:TweakShellAddon',
         'tweak.shell.default = htsql.tweak.shell.default:TweakShellDefaultAddon',
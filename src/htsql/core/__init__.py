@@ -6,12 +6,15 @@
 from . import (adapter, addon, application, cache, cmd, connect, context,
         domain, entity, error, introspect, split_sql, syn, tr, util, validator,
         wsgi)
-from .validator import DBVal, StrVal, BoolVal
+from .validator import (DBVal, StrVal, BoolVal, PIntVal, SeqVal,
+        ChoiceVal)
 from .addon import Addon, Parameter, Variable, addon_registry
 from .connect import connect
 from .error import Error
-from .introspect import introspect
+from .introspect import introspect, fingerprint
 from .cache import GeneralCache
+import threading
+import time
 
 
 class HTSQLAddon(Addon):
@@ -41,6 +44,83 @@ class HTSQLAddon(Addon):
     the password given as a part of `db` parameter.
 
     The parameter `debug`, if set to `True`, enables debug output.
+
+    The parameter `plan_cache_size` sets the maximum number of
+    translated queries kept for reuse (the default is 256).  Set it
+    to `null` to disable caching of query plans.  Queries in the body
+    of an ETL loop are translated once for all iterations: the values
+    of the loop variables are passed to the database as query
+    parameters.
+
+    The parameter `parameterize`, if set to `True`, makes cached plans
+    reusable for queries that differ only in literal values compared
+    in filters; such values are passed to the database as query
+    parameters.
+
+    The parameter `fetch_size`, if set, enables streaming of query
+    results by the HTTP service: rows are fetched from the database in
+    chunks of the given size and sent to the client as they arrive.
+    In this mode, the width of columns in the text output is estimated
+    from the leading rows.
+
+    The parameter `output_chunk_size` sets the size, in bytes, of pieces
+    in which the HTTP service sends the output to the client (the default
+    is 64K).  Except for the beginning of the output, which is sent
+    as soon as it is available, the output is buffered until a piece
+    of the given size is accumulated.  Set it to `null` to send
+    the output as it is produced.
+
+    The parameter `query_threads`, if set, makes the queries of nested
+    segments run concurrently, on separate database connections, using
+    at most the given number of threads per request.  A thread only
+    takes a connection that is available right away; otherwise the
+    query runs on the connection of the request.  When supported by
+    the backend, the queries share the same database snapshot.  This
+    mode is not used together with streaming or inside an explicit
+    transaction.
+
+    The parameter `refresh_interval`, if set, makes the server check
+    every given number of seconds whether the database schema has
+    changed.  If so, the database catalog is introspected again and
+    cached query plans are discarded.  Not every database backend
+    supports schema change detection.
+
+    The parameter `catalog_snapshot` specifies a file where the
+    database catalog is saved after introspection.  On startup,
+    the catalog is loaded from the file if the database schema and
+    the parameters of addons that adjust the catalog have not changed
+    since the file was written.  Use `htsql-ctl snapshot` to prepare
+    the file in advance.  Snapshots are not used when the catalog is
+    generated from Django or SQLAlchemy models.
+
+    The parameter `warmup`, if set, makes the application prepare
+    itself for serving requests on startup rather than on the first
+    request: all adapters are realized for their declared signatures
+    and the HTSQL grammar is built.  The parameter `warmup_queries`
+    lists queries that are translated during the warm-up; with the
+    plan cache enabled, their plans are cached as well.
+
+    The parameter `read_mode` determines how queries that only read
+    data are executed outside of an explicit transaction:
+
+      - `transaction` (the default): in an ordinary transaction, which
+        is committed once the queries are complete.
+      - `autocommit`: in the autocommit mode, which saves the commit
+        round trip, but the queries of a request may see different
+        snapshots of the database.
+      - `read-only`: in a transaction declared read-only, when the
+        backend supports it (PostgreSQL, MySQL 5.6.5+, Oracle).  This
+        costs an extra round trip to declare the transaction, which
+        is still committed; only `autocommit` saves a round trip.
+      - `deferrable`: as `read-only`; on PostgreSQL 9.1+, the
+        transaction is made serializable and deferrable, so that it
+        runs on a snapshot that is never in conflict with concurrent
+        transactions.  Concurrent queries enabled by `query_threads`
+        share this snapshot.
+
+    Backends that do not support the selected mode execute queries
+    in an ordinary transaction.  ETL commands and explicit transactions
+    are not affected by this parameter.
     """
 
     parameters = [
@@ -50,13 +130,46 @@ class HTSQLAddon(Addon):
             Parameter('password', StrVal(),
                       hint="""override the password"""),
             Parameter('debug', BoolVal(), default=False,
-                      hint="""dump debug information""")
+                      hint="""dump debug information"""),
+            Parameter('plan_cache_size', PIntVal(is_nullable=True),
+                      default=256, value_name="""size""",
+                      hint="""max. number of cached plans (default: 256)"""),
+            Parameter('parameterize', BoolVal(), default=False,
+                      hint="""pass filter literals as query parameters"""),
+            Parameter('fetch_size', PIntVal(is_nullable=True),
+                      value_name="""size""",
+                      hint="""stream rows in chunks of the given size"""),
+            Parameter('output_chunk_size', PIntVal(is_nullable=True),
+                      default=65536, value_name="""size""",
+                      hint="""size of output chunks (default: 65536)"""),
+            Parameter('query_threads', PIntVal(is_nullable=True),
+                      value_name="""number""",
+                      hint="""run nested segment queries concurrently"""),
+            Parameter('refresh_interval', PIntVal(is_nullable=True),
+                      value_name="""sec""",
+                      hint="""interval between schema checks, in sec"""),
+            Parameter('catalog_snapshot', StrVal(),
+                      value_name="""file""",
+                      hint="""cache the database catalog in a file"""),
+            Parameter('warmup', BoolVal(), default=False,
+                      hint="""prepare the application on startup"""),
+            Parameter('warmup_queries', SeqVal(StrVal()), default=[],
+                      value_name="""queries""",
+                      hint="""queries to translate on startup"""),
+            Parameter('read_mode',
+                      ChoiceVal(['transaction', 'autocommit', 'read-only',
+                                 'deferrable']),
+                      default='transaction', value_name="""mode""",
+                      hint="""how to execute read-only queries"""),
     ]
 
     variables = [
             Variable('connection'),
             Variable('can_read', True),
             Variable('can_write', True),
+            Variable('cache'),
+            Variable('profile'),
+            Variable('parameter_names'),
     ]
 
     packages = ['.', '.cmd', '.fmt', '.tr', '.tr.fn', '.syn']
@@ -65,7 +178,14 @@ class HTSQLAddon(Addon):
 
     def __init__(self, app, attributes):
         super(HTSQLAddon, self).__init__(app, attributes)
-        self.cache = GeneralCache()
+        self.cache = GeneralCache(self.plan_cache_size or 0)
+        self.refresh_lock = threading.Lock()
+        self.refresh_time = 0
+        self.fingerprint = None
+
+    @property
+    def plan_cache(self):
+        return self.cache.plans
 
     def validate(self):
         if self.db is None:
@@ -76,6 +196,9 @@ class HTSQLAddon(Addon):
             raise ValueError("failed to establish database connection: %s"
                              % exc)
         try:
+            if self.refresh_interval is not None:
+                self.fingerprint = fingerprint()
+            self.refresh_time = time.time()
             introspect()
         except Error, exc:
             raise ValueError("failed to introspect the database: %s" % exc)
@@ -13,6 +13,7 @@ This module provides a mechanism for pluggable extensions.
 
 from .util import listof, aresubclasses, toposort
 from .context import context
+from .profile import Profile, count_call
 import sys
 import types
 
@@ -126,7 +127,7 @@ class Component(object):
         # A shortcut: if the realization for the given interface and the
         # dispatch key is already built, return it.
         try:
-            return registry.realizations[interface, dispatch_key]
+            return registry.realizations[interface][dispatch_key]
         except KeyError:
             pass
 
@@ -206,7 +207,8 @@ class Component(object):
         realization = type(name, bases, attributes)
 
         # Cache and return the realization.
-        registry.realizations[interface, dispatch_key] = realization
+        registry.realizations.setdefault(interface, {})[dispatch_key] = \
+                realization
         return realization
 
     @classmethod
@@ -256,15 +258,30 @@ class Component(object):
         # Override in subclasses.
         return None
 
+    @classmethod
+    def __signatures__(interface):
+        """
+        Returns dispatch keys declared by implementations of the interface.
+        """
+        # Override in subclasses.
+        return []
+
     @classmethod
     def __prepare__(interface, *args, **kwds):
         """
         Instantiates the interface to the given arguments.
         """
+        if Profile.active:
+            count_call(interface)
         # Extract polymorphic parameters.
         dispatch_key = interface.__dispatch__(*args, **kwds)
-        # Realize the interface.
-        realization = interface.__realize__(dispatch_key)
+        # Realize the interface; the fast path looks up the dispatch
+        # table of the active application directly.
+        try:
+            realization = (context.active_app.component_registry
+                                .realizations[interface][dispatch_key])
+        except (AttributeError, KeyError):
+            realization = interface.__realize__(dispatch_key)
         # Instantiate and return the realization.
         return realization(*args, **kwds)
 
@@ -275,10 +292,17 @@ class Component(object):
 
         Use ``__prepare__()()`` instead when traversing a deeply nested tree.
         """
+        if Profile.active:
+            count_call(interface)
         # Extract polymorphic parameters.
         dispatch_key = interface.__dispatch__(*args, **kwds)
-        # Realize the interface.
-        realization = interface.__realize__(dispatch_key)
+        # Realize the interface; the fast path looks up the dispatch
+        # table of the active application directly.
+        try:
+            realization = (context.active_app.component_registry
+                                .realizations[interface][dispatch_key])
+        except (AttributeError, KeyError):
+            realization = interface.__realize__(dispatch_key)
         # Instantiate and call the realization.
         instance = realization(*args, **kwds)
         return instance()
@@ -365,6 +389,10 @@ class Utility(Component):
         # The dispatch key is always a 0-tuple.
         return ()
 
+    @classmethod
+    def __signatures__(interface):
+        return [()]
+
 
 def rank(value):
     assert isinstance(value, (int, float))
@@ -479,10 +507,27 @@ class Adapter(Component):
     def __dispatch__(interface, *args, **kwds):
         # The types of the leading arguments of the constructor
         # form a dispatch key.
-        assert interface.__arity__ <= len(args)
-        type_vector = tuple(type(arg) for arg in args[:interface.__arity__])
+        arity = interface.__arity__
+        assert arity <= len(args)
+        # Most adapters dispatch on a single argument.
+        if arity == 1:
+            return (type(args[0]),)
+        type_vector = tuple(map(type, args[:arity]))
         return type_vector
 
+    @classmethod
+    def __signatures__(interface):
+        # Signatures of all implementations of the interface.
+        signatures = []
+        seen = set()
+        for component in interface.__implementations__():
+            for type_vector in component.__types__:
+                if (len(type_vector) == interface.__arity__ and
+                        type_vector not in seen):
+                    signatures.append(type_vector)
+                    seen.add(type_vector)
+        return signatures
+
 
 def adapt(*type_vector):
     """
@@ -605,6 +650,10 @@ class Protocol(Component):
         assert isinstance(dispatch_key, str)
         return (dispatch_key in component.__names__)
 
+    @classmethod
+    def __signatures__(interface):
+        return interface.__catalogue__()
+
     @classmethod
     def __catalogue__(interface):
         """
@@ -635,6 +684,31 @@ def call(*names):
     frame.f_locals['__names__'] = list(names)
 
 
+def realize_all():
+    """
+    Realizes all interfaces of the active application for the dispatch
+    keys declared by their implementations.
+
+    Returns the number of realizations.
+    """
+    count = 0
+    # Abstract components shared by several interfaces; they cannot
+    # be realized since their implementations are not ordered.
+    bases = set([Utility, Adapter, Protocol])
+    for component in Component.__components__():
+        # Interfaces are subclasses of `Utility`, `Adapter` or `Protocol`
+        # or of an abstract component.
+        if not all(base in bases for base in component.__bases__):
+            continue
+        try:
+            for dispatch_key in component.__signatures__():
+                component.__realize__(dispatch_key)
+                count += 1
+        except RuntimeError:
+            bases.add(component)
+    return count
+
+
 class ComponentRegistry(object):
     """
     Contains cached components and realizations.
@@ -674,7 +748,8 @@ class ComponentRegistry(object):
         # A mapping: interface -> [components]  (populated by
         # `Component.__implementations__()`).
         self.implementations = {}
-        # A mapping: (interface, dispatch_key) -> realization (populated by
+        # A mapping: interface -> dispatch table, where the dispatch table
+        # is a mapping: dispatch_key -> realization (populated by
         # `Component.__realize__()`).
         self.realizations = {}
 
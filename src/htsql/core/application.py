@@ -13,11 +13,14 @@ This module implements an HTSQL application.
 
 from .context import context
 from .addon import addon_registry
-from .adapter import ComponentRegistry
+from .adapter import ComponentRegistry, realize_all
+from .error import Error
 from .util import maybe, oneof, listof, dictof, tupleof
 from .wsgi import wsgi
 from .cmd.command import UniversalCmd
-from .cmd.act import produce
+from .cmd.act import produce, analyze
+from .syn.scan import prepare_scan
+from .syn.parse import prepare_parse
 
 
 class EnvironmentGuard(object):
@@ -184,6 +187,12 @@ class Application(object):
                 except ValueError, exc:
                     raise ImportError("failed to initialize %r: %s"
                                       % (addon.name, exc))
+            if self.htsql.warmup:
+                try:
+                    warm_up(self.htsql.warmup_queries)
+                except Error, exc:
+                    raise ImportError("failed to warm up the application: %s"
+                                      % exc)
 
     def __enter__(self):
         """
@@ -210,3 +219,17 @@ class Application(object):
             return produce(command, environment, **parameters)
 
 
+def warm_up(queries):
+    """
+    Prepares the active application for serving requests.
+
+    Realizes all interfaces for the declared signatures, builds
+    the HTSQL grammar and translates the given queries.
+    """
+    realize_all()
+    prepare_scan()
+    prepare_parse()
+    for query in queries:
+        analyze(query)
+
+
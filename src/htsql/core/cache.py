@@ -9,11 +9,18 @@ import functools
 
 
 class GeneralCache(object):
+    """
+    Keeps values computed from the database catalog.
 
-    def __init__(self):
+    `plan_cache_size` (an integer)
+        The maximum number of cached query plans.
+    """
+
+    def __init__(self, plan_cache_size=0):
         self.values = {}
         self.locks = {}
         self.cache_lock = threading.Lock()
+        self.plans = LRUCache(plan_cache_size)
 
     def lock(self, service):
         try:
@@ -30,10 +37,134 @@ class GeneralCache(object):
             self.values[key] = value
 
 
+class LRUCache(object):
+    """
+    A thread-safe mapping with a bounded number of entries.
+
+    When the cache is full, adding a new entry evicts the least
+    recently used one.
+
+    `size` (an integer)
+        The maximum number of entries; ``0`` disables the cache.
+
+    The cache counts `hits`, `misses` and `evictions`.
+    """
+
+    def __init__(self, size):
+        assert isinstance(size, (int, long)) and size >= 0
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        # A mapping: key -> link; a link is a list `[prev, next, key, value]`.
+        self.links = {}
+        # The sentinel of a circular list of links; the most recently used
+        # link follows the sentinel, the least recently used precedes it.
+        self.root = []
+        self.root[:] = [self.root, self.root, None, None]
+
+    def __len__(self):
+        return len(self.links)
+
+    def __contains__(self, key):
+        return (key in self.links)
+
+    def get(self, key, default=None):
+        """
+        Returns the value associated with the key and marks it
+        as the most recently used.
+        """
+        with self.lock:
+            link = self.links.get(key)
+            if link is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            # Move the link to the front of the list.
+            prev, next = link[0], link[1]
+            prev[1] = next
+            next[0] = prev
+            root = self.root
+            first = root[1]
+            link[0] = root
+            link[1] = first
+            first[0] = link
+            root[1] = link
+            return link[3]
+
+    def set(self, key, value):
+        """
+        Adds an entry to the cache, evicting the least recently used
+        entry when the cache is full.
+        """
+        if not self.size:
+            return
+        with self.lock:
+            link = self.links.pop(key, None)
+            if link is not None:
+                link[0][1] = link[1]
+                link[1][0] = link[0]
+            elif len(self.links) >= self.size:
+                root = self.root
+                last = root[0]
+                last[0][1] = root
+                root[0] = last[0]
+                del self.links[last[2]]
+                self.evictions += 1
+            root = self.root
+            first = root[1]
+            link = [root, first, key, value]
+            first[0] = link
+            root[1] = link
+            self.links[key] = link
+
+    def discard(self, key):
+        """
+        Removes an entry from the cache if it is present.
+        """
+        with self.lock:
+            link = self.links.pop(key, None)
+            if link is not None:
+                link[0][1] = link[1]
+                link[1][0] = link[0]
+
+    def clear(self):
+        """
+        Removes all entries from the cache.
+        """
+        with self.lock:
+            self.links.clear()
+            self.root[:] = [self.root, self.root, None, None]
+
+    def stats(self):
+        """
+        Returns a dictionary with the cache statistics.
+        """
+        with self.lock:
+            return {
+                    'size': self.size,
+                    'length': len(self.links),
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'evictions': self.evictions,
+            }
+
+
+def active_cache():
+    """
+    Returns the cache used by the current request.
+    """
+    cache = context.env.cache
+    if cache is None:
+        cache = context.app.htsql.cache
+    return cache
+
+
 def once(service):
     @functools.wraps(service)
     def wrapper(*args, **kwds):
-        cache = context.app.htsql.cache
+        cache = active_cache()
         key = (service.__module__, service.__name__) + args
         try:
             return cache.values[key]
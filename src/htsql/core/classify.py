@@ -4,8 +4,7 @@
 
 
 from .util import to_name
-from .context import context
-from .cache import once
+from .cache import once, active_cache
 from .adapter import Adapter, adapt
 from .model import (Node, Arc, Label, HomeNode, TableNode, TableArc, ChainArc,
                     ColumnArc, SyntaxArc, AmbiguousArc)
@@ -362,7 +361,7 @@ def classify(node):
 @once
 def relabel(arc):
     assert isinstance(arc, Arc)
-    cache = context.app.htsql.cache
+    cache = active_cache()
     labels = classify(arc.origin)
     seen = set()
     labels_by_arc = {}
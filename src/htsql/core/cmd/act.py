@@ -4,6 +4,7 @@
 
 
 from ..adapter import Adapter, adapt
+from ..context import context
 from ..error import Error, act_guard
 from ..util import Clonable
 from .command import Command, UniversalCmd, DefaultCmd, FormatCmd, FetchCmd
@@ -13,6 +14,8 @@ from ..syn.parse import parse
 from ..syn.syntax import Syntax
 from ..fmt.emit import emit, emit_headers
 from ..fmt.accept import accept
+from ..introspect import refresh
+from ..profile import measure_output
 
 
 class UnsupportedActionError(Error):
@@ -25,18 +28,21 @@ class Action(Clonable):
 
 class ProduceAction(Action):
 
-    def __init__(self, environment=None, batch=None):
+    def __init__(self, environment=None, batch=None, stream=None):
         self.environment = environment
         self.batch = batch
+        self.stream = stream
 
 
 class SafeProduceAction(ProduceAction):
 
-    def __init__(self, environment=None, cut=None, offset=None, batch=None):
+    def __init__(self, environment=None, cut=None, offset=None, batch=None,
+                 stream=None):
         self.environment = environment
         self.cut = cut
         self.offset = offset
         self.batch = batch
+        self.stream = stream
 
 
 class AnalyzeAction(Action):
@@ -88,10 +94,10 @@ class RenderFormat(Act):
 
     def __call__(self):
         format = self.command.format
-        product = produce(self.command.feed)
+        product = stream(self.command.feed)
         status = "200 OK"
         headers = emit_headers(format, product)
-        body = emit(format, product)
+        body = measure_output(emit, format, product)
         return (status, headers, body)
 
 
@@ -105,16 +111,21 @@ class RenderProducer(Act):
 
     def __call__(self):
         format = accept(self.action.environ)
-        product = produce(self.command)
+        product = stream(self.command)
         status = "200 OK"
         headers = emit_headers(format, product)
-        body = emit(format, product)
+        body = measure_output(emit, format, product)
         return (status, headers, body)
 
 
 def act(command, action):
     assert isinstance(command, (Command, Syntax, unicode, str))
     assert isinstance(action, Action)
+    if context.env.cache is None:
+        # Use the same catalog for the whole request even if it is
+        # refreshed concurrently.
+        with context.env(cache=refresh()):
+            return act(command, action)
     if not isinstance(command, Command):
         command = recognize(command)
     with act_guard(command):
@@ -127,6 +138,14 @@ def produce(command, environment=None, **parameters):
     return act(command, action)
 
 
+def stream(command, environment=None, **parameters):
+    # Produces the output for rendering; if enabled, the rows are
+    # streamed from the database as the output is consumed.
+    environment = embed(environment, **parameters)
+    action = ProduceAction(environment, stream=context.app.htsql.fetch_size)
+    return act(command, action)
+
+
 def safe_produce(command, cut, offset=None, environment=None, **parameters):
     environment = embed(environment, **parameters)
     action = SafeProduceAction(environment, cut, offset)
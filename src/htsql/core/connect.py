@@ -15,6 +15,8 @@ from .adapter import Adapter, Utility, adapt
 from .domain import Domain, Record
 from .error import Error, EngineError
 from .context import context
+from .profile import active_profile, measure_query
+import time
 
 
 class DBErrorGuard(object):
@@ -174,7 +176,8 @@ class CursorProxy(object):
         if addon.debug:
             try:
                 with self.guard:
-                    return self.cursor.execute(statement, *parameters)
+                    with measure_query():
+                        return self.cursor.execute(statement, *parameters)
             except Error, exc:
                 exc.wrap("While executing SQL", statement)
                 if parameters:
@@ -183,7 +186,8 @@ class CursorProxy(object):
                 raise
         else:
             with self.guard:
-                return self.cursor.execute(statement, *parameters)
+                with measure_query():
+                    return self.cursor.execute(statement, *parameters)
 
     def executemany(self, statement, parameters_set):
         """
@@ -193,7 +197,9 @@ class CursorProxy(object):
         if addon.debug:
             try:
                 with self.guard:
-                    return self.cursor.executemany(statement, parameters_set)
+                    with measure_query():
+                        return self.cursor.executemany(statement,
+                                                       parameters_set)
             except Error, exc:
                 exc.wrap("While executing SQL", statement)
                 if not parameters_set:
@@ -205,28 +211,50 @@ class CursorProxy(object):
                 raise
         else:
             with self.guard:
-                return self.cursor.executemany(statement, parameters_set)
+                with measure_query():
+                    return self.cursor.executemany(statement, parameters_set)
 
     def fetchone(self):
         """
         Fetch the next row of the result.
         """
+        profile = active_profile()
+        if profile is None:
+            with self.guard:
+                return self.cursor.fetchone()
+        start = time.time()
         with self.guard:
-            return self.cursor.fetchone()
+            row = self.cursor.fetchone()
+        profile.add_rows(int(row is not None), time.time()-start)
+        return row
 
     def fetchmany(self, *size):
         """
         Fetch the next set of rows of the result.
         """
+        profile = active_profile()
+        if profile is None:
+            with self.guard:
+                return self.cursor.fetchmany(*size)
+        start = time.time()
         with self.guard:
-            return self.cursor.fetchmany(*size)
+            rows = self.cursor.fetchmany(*size)
+        profile.add_rows(len(rows), time.time()-start)
+        return rows
 
     def fetchall(self):
         """
         Fetch all remaining rows of the result.
         """
+        profile = active_profile()
+        if profile is None:
+            with self.guard:
+                return self.cursor.fetchall()
+        start = time.time()
         with self.guard:
-            return self.cursor.fetchall()
+            rows = self.cursor.fetchall()
+        profile.add_rows(len(rows), time.time()-start)
+        return rows
 
     def fetchnamed(self):
         with self.guard:
@@ -242,12 +270,17 @@ class CursorProxy(object):
         Iterates over the rows of the result.
         """
         iterator = iter(self.cursor)
+        profile = active_profile()
         while True:
+            if profile is not None:
+                start = time.time()
             with self.guard:
                 try:
                     row = iterator.next()
                 except StopIteration:
                     row = None
+            if profile is not None:
+                profile.add_rows(int(row is not None), time.time()-start)
             if row is None:
                 break
             yield row
@@ -279,9 +312,14 @@ class Connect(Utility):
             ...
     """
 
-    def __init__(self, with_autocommit=False):
+    def __init__(self, with_autocommit=False, is_read_only=False,
+                 is_blocking=True):
         assert isinstance(with_autocommit, bool)
+        assert isinstance(is_read_only, bool)
+        assert isinstance(is_blocking, bool)
         self.with_autocommit = with_autocommit
+        self.is_read_only = is_read_only
+        self.is_blocking = is_blocking
 
     def __call__(self):
         """
@@ -292,6 +330,9 @@ class Connect(Utility):
 
         If the database parameters for the application are invalid,
         the method may raise :exc:`Error`.
+
+        If `is_blocking` is not set and a connection cannot be obtained
+        without waiting, returns ``None``.
         """
         # Create a guard for DBAPI exceptions.
         guard = DBErrorGuard()
@@ -308,6 +349,9 @@ class Connect(Utility):
 
         `with_autocommit` (Boolean)
             If set, the connection is opened in the autocommit mode.
+
+        `is_read_only` (Boolean)
+            If set, the connection is used only to read data.
         """
         # Override when subclassing.
         raise NotImplementedError()
@@ -343,6 +387,46 @@ class Unscramble(Adapter):
         return self.convert
 
 
+class UnscrambleRows(Utility):
+    """
+    Generates a function that converts a chunk of rows fetched from
+    the database to native Python values.
+
+    The conversion of each column is provided by :class:`Unscramble`;
+    columns which values need no conversion are skipped.  Converters
+    are applied column by column to the whole chunk.
+
+    `domains` (a list of :class:`htsql.core.domain.Domain`)
+        The types of the columns.
+    """
+
+    def __init__(self, domains):
+        assert isinstance(domains, list)
+        assert all(isinstance(domain, Domain) for domain in domains)
+        self.domains = domains
+
+    def __call__(self):
+        width = len(self.domains)
+        converts = []
+        for index, domain in enumerate(self.domains):
+            convert = unscramble(domain)
+            if convert is not Unscramble.convert:
+                converts.append((index, convert))
+        if not converts:
+            def decode(rows):
+                return map(tuple, rows)
+            return decode
+        def decode(rows, width=width, converts=converts):
+            if not rows:
+                return []
+            columns = zip(*rows)
+            assert len(columns) == width
+            for index, convert in converts:
+                columns[index] = map(convert, columns[index])
+            return zip(*columns)
+        return decode
+
+
 class UnscrambleError(Utility):
 
     def __init__(self, error):
@@ -353,30 +437,171 @@ class UnscrambleError(Utility):
         return None
 
 
+class ExportSnapshot(Utility):
+    """
+    Makes the snapshot of the active transaction available to other
+    connections.
+
+    Returns an identifier of the snapshot or ``None`` if the backend
+    does not support sharing snapshots.  Must be called before
+    any query is executed in the transaction.
+
+    `connection` (:class:`ConnectionProxy`)
+        A connection with an active transaction.
+    """
+
+    def __init__(self, connection):
+        assert isinstance(connection, ConnectionProxy)
+        self.connection = connection
+
+    def __call__(self):
+        return None
+
+
+class ImportSnapshot(Utility):
+    """
+    Makes the transaction use a snapshot exported by another connection.
+
+    Must be called before any query is executed in the transaction.
+
+    `connection` (:class:`ConnectionProxy`)
+        A connection with an active transaction.
+
+    `snapshot`
+        A snapshot identifier returned by :class:`ExportSnapshot`.
+    """
+
+    def __init__(self, connection, snapshot):
+        assert isinstance(connection, ConnectionProxy)
+        self.connection = connection
+        self.snapshot = snapshot
+
+    def __call__(self):
+        pass
+
+
+class BeginRead(Utility):
+    """
+    Prepares a new connection for executing queries that only read data.
+
+    Returns ``None`` if the queries are to be executed in an ordinary
+    transaction, which must be committed once the queries are complete.
+    Otherwise, the connection is switched to the autocommit mode and
+    the method returns a value that must be passed to :class:`EndRead`
+    to restore the connection.
+
+    `connection` (:class:`ConnectionProxy`)
+        A new connection.
+
+    `mode` (a string)
+        The value of the `read_mode` parameter: ``'autocommit'``,
+        ``'read-only'`` or ``'deferrable'``.
+    """
+
+    def __init__(self, connection, mode):
+        assert isinstance(connection, ConnectionProxy)
+        assert mode in ['autocommit', 'read-only', 'deferrable']
+        self.connection = connection
+        self.mode = mode
+
+    def __call__(self):
+        # By default, use an ordinary transaction.
+        return None
+
+
+class EndRead(Utility):
+    """
+    Restores a connection prepared with :class:`BeginRead`.
+
+    `connection` (:class:`ConnectionProxy`)
+        A connection prepared with :class:`BeginRead`.
+
+    `state`
+        The value returned by :class:`BeginRead`.
+    """
+
+    def __init__(self, connection, state):
+        assert isinstance(connection, ConnectionProxy)
+        self.connection = connection
+        self.state = state
+
+    def __call__(self):
+        pass
+
+
+class Probe(Utility):
+    """
+    Checks if a connection is alive by executing a trivial query.
+
+    Returns ``False`` if the query failed; the connection is then
+    invalidated.
+
+    `connection` (:class:`ConnectionProxy`)
+        An idle connection.
+    """
+
+    # A query that could be executed on any database.
+    statement = "SELECT 1"
+
+    def __init__(self, connection):
+        assert isinstance(connection, ConnectionProxy)
+        self.connection = connection
+
+    def __call__(self):
+        try:
+            cursor = self.connection.cursor()
+            cursor.execute(self.statement)
+            cursor.fetchall()
+            cursor.close()
+            self.connection.rollback()
+        except Error:
+            self.connection.invalidate()
+            return False
+        return True
+
+
 class Transact(Utility):
 
+    def __init__(self, is_read_only=False, is_blocking=True):
+        assert isinstance(is_read_only, bool)
+        assert isinstance(is_blocking, bool)
+        self.is_read_only = is_read_only
+        self.is_blocking = is_blocking
+
     def __call__(self):
-        return TransactionGuard()
+        return TransactionGuard(self.is_read_only, self.is_blocking)
 
 
 class TransactionGuard(object):
 
-    def __init__(self):
+    def __init__(self, is_read_only=False, is_blocking=True):
         self.connection = context.env.connection
+        self.is_read_only = is_read_only
+        self.is_blocking = is_blocking
+        self.is_owner = False
+        self.read_state = None
 
     def __enter__(self):
         if self.connection is None:
-            connection = connect()
+            # Without `is_blocking`, the guard value is `None` when
+            # no connection is available right away.
+            connection = connect(is_read_only=self.is_read_only,
+                                 is_blocking=self.is_blocking)
+            if connection is None:
+                return None
+            if self.is_read_only:
+                self.read_state = prepare_read(connection)
             context.env.push(connection=connection)
+            self.is_owner = True
             return connection
         return self.connection
 
     def __exit__(self, exc_type, exc_value, exc_traceback):
-        if self.connection is None:
+        if self.is_owner:
             connection = context.env.connection
             context.env.pop()
             if exc_type is None:
-                connection.commit()
+                complete_read(connection, self.read_state)
             else:
                 # FIXME: ?
                 # To avoid issues with pymssql driver, we do not issue
@@ -388,10 +613,47 @@ class TransactionGuard(object):
             connection.release()
 
 
+def prepare_read(connection):
+    """
+    Prepares a new connection for executing queries that only read data
+    according to the `read_mode` parameter.
+
+    Returns a value to pass to :func:`complete_read`.
+    """
+    mode = context.app.htsql.read_mode
+    if mode == 'transaction':
+        return None
+    try:
+        return begin_read(connection, mode)
+    except:
+        connection.invalidate()
+        connection.release()
+        raise
+
+
+def complete_read(connection, state):
+    """
+    Completes a transaction started with :func:`prepare_read`.
+    """
+    if state is None:
+        connection.commit()
+    else:
+        try:
+            end_read(connection, state)
+        except Error:
+            connection.invalidate()
+
+
 connect = Connect.__invoke__
 scramble = Scramble.__invoke__
 unscramble = Unscramble.__invoke__
+unscramble_rows = UnscrambleRows.__invoke__
 unscramble_error = UnscrambleError.__invoke__
 transaction = Transact.__invoke__
+export_snapshot = ExportSnapshot.__invoke__
+import_snapshot = ImportSnapshot.__invoke__
+begin_read = BeginRead.__invoke__
+end_read = EndRead.__invoke__
+probe = Probe.__invoke__
 
 
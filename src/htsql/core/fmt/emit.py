@@ -4,6 +4,7 @@
 
 
 from ..adapter import Adapter, adapt
+from ..context import context
 from .format import Format, DefaultFormat, TextFormat, ProxyFormat
 from .accept import Accept
 import itertools
@@ -86,10 +87,30 @@ def emit(format, product):
         assert not isinstance(format, DefaultFormat), "unknown format"
     tail = (line.encode('utf-8') if isinstance(line, unicode) else line
             for line in Emit.__invoke__(format, product))
+    # Produce the first chunk eagerly to report errors early and to let
+    # the client get the beginning of the output without a delay.
     head = []
     for chunk in tail:
         head.append(chunk)
         break
+    size = context.app.htsql.output_chunk_size
+    if size:
+        tail = coalesce(tail, size)
     return itertools.chain(head, tail)
 
 
+def coalesce(chunks, size):
+    # Joins the output into pieces of at least the given size.
+    buffer = []
+    length = 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield "".join(buffer)
+            buffer = []
+            length = 0
+    if buffer:
+        yield "".join(buffer)
+
+
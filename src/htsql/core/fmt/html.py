@@ -328,6 +328,10 @@ class EmitHTML(Emit):
 
     def __call__(self):
         product_to_html = profile_to_html(self.meta)
+        # The layout of the table requires all the rows.
+        if (isinstance(self.meta.domain, ListDomain) and
+                self.data is not None and not isinstance(self.data, list)):
+            self.data = list(self.data)
         headers_height = product_to_html.headers_height()
         cells_height = product_to_html.cells_height(self.data)
         if self.meta.header:
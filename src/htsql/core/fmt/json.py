@@ -75,6 +75,29 @@ def escape_json(value,
     return escape_regexp.sub(replace, value)
 
 
+def dump_scalar(token):
+    # Converts a scalar token to JSON.
+    if token is None:
+        return u"null"
+    elif token is True:
+        return u"true"
+    elif token is False:
+        return u"false"
+    elif isinstance(token, unicode):
+        return u"\"%s\"" % escape_json(token)
+    elif isinstance(token, (int, long)):
+        return unicode(token)
+    elif isinstance(token, float):
+        if math.isinf(token) or math.isnan(token):
+            return u"null"
+        return unicode(token)
+    elif isinstance(token, decimal.Decimal):
+        if not token.is_finite():
+            return u"null"
+        return unicode(token)
+    assert False, repr(token)
+
+
 def dump_json(iterator):
     states = []
     context = None
@@ -83,27 +106,7 @@ def dump_json(iterator):
     while True:
         token = next_token
         next_token = next(iterator, JS_DONE)
-        if token is None:
-            line = u"null"
-        elif token is True:
-            line = u"true"
-        elif token is False:
-            line = u"false"
-        elif isinstance(token, unicode):
-            line = u"\"%s\"" % escape_json(token)
-        elif isinstance(token, (int, long)):
-            line = unicode(token)
-        elif isinstance(token, float):
-            if math.isinf(token) or math.isnan(token):
-                line = u"null"
-            else:
-                line = unicode(token)
-        elif isinstance(token, decimal.Decimal):
-            if not token.is_finite():
-                line = u"null"
-            else:
-                line = unicode(token)
-        elif token is JS_SEQ:
+        if token is JS_SEQ:
             if next_token is JS_END:
                 line = u"[]"
                 next_token = next(iterator, JS_DONE)
@@ -127,7 +130,7 @@ def dump_json(iterator):
                 next_token = next(iterator, JS_DONE)
                 continue
         else:
-            assert False, repr(token)
+            line = dump_scalar(token)
         if next_token is not JS_END and next_token is not JS_DONE:
             yield prefix+line+u",\n"
         else:
@@ -153,6 +156,76 @@ def dump_json(iterator):
             break
 
 
+def write_tokens(tokens, indent, prefix, suffix, append):
+    # Renders a stream of tokens to JSON; the first line starts with
+    # `prefix`, the other lines with `indent`, and the last line ends
+    # with `suffix`.
+    lines = list(dump_json(iter(tokens)))
+    last = len(lines)-1
+    for idx, line in enumerate(lines):
+        if idx == 0:
+            line = prefix+line
+        else:
+            line = indent+line
+        if idx == last:
+            line = line[:-1]+suffix
+        append(line)
+
+
+def write_items(value, write_item, indent, prefix, suffix, append):
+    # Renders a JSON array; `value` may be any iterable.
+    iterator = iter(value)
+    item = next(iterator, JS_DONE)
+    if item is JS_DONE:
+        append(prefix+u"[]"+suffix)
+        return
+    append(prefix+u"[\n")
+    item_indent = indent+u"  "
+    for next_item in iterator:
+        write_item(item, item_indent, item_indent, u",\n", append)
+        item = next_item
+    write_item(item, item_indent, item_indent, u"\n", append)
+    append(indent+u"]"+suffix)
+
+
+def emit_document(entries, with_null, chunk_size):
+    # Generates a UTF-8 encoded JSON object from a list of entries
+    # `(key, value, write, write_item)`.  If `write_item` is set,
+    # `value` is an array, which is rendered item by item so that
+    # the output could be produced in chunks.
+    buffer = []
+    append = buffer.append
+    if not with_null:
+        entries = [entry for entry in entries if entry[1] is not None]
+    if not entries:
+        yield "{}\n"
+        return
+    append(u"{\n")
+    last = len(entries)-1
+    for idx, (key, value, write, write_item) in enumerate(entries):
+        prefix = u"  \"%s\": " % escape_json(key)
+        suffix = u",\n" if idx < last else u"\n"
+        if write_item is None or value is None:
+            write(value, u"  ", prefix, suffix, append)
+            continue
+        iterator = iter(value)
+        item = next(iterator, JS_DONE)
+        if item is JS_DONE:
+            append(prefix+u"[]"+suffix)
+            continue
+        append(prefix+u"[\n")
+        for next_item in iterator:
+            write_item(item, u"    ", u"    ", u",\n", append)
+            item = next_item
+            if len(buffer) >= chunk_size:
+                yield u"".join(buffer).encode('utf-8')
+                del buffer[:]
+        write_item(item, u"    ", u"    ", u"\n", append)
+        append(u"  ]"+suffix)
+    append(u"}\n")
+    yield u"".join(buffer).encode('utf-8')
+
+
 class EmitJSONHeaders(EmitHeaders):
 
     adapt_many(JSONFormat,
@@ -176,11 +249,24 @@ class EmitRaw(Emit):
 
     adapt(RawFormat)
 
+    # The number of fragments of output to accumulate before producing
+    # a chunk of output.
+    chunk_size = 1024
+
     def __call__(self):
-        tokens = self.emit()
-        if not self.format.with_null:
-            tokens = purge_null_keys(tokens)
-        return dump_json(tokens)
+        with_null = self.format.with_null
+        meta = profile_to_raw(self.meta)
+        if not with_null:
+            meta = purge_null_keys(meta)
+        meta = list(meta)
+        write = ToRaw.__prepare__(self.meta.domain).compile(with_null)
+        write_item = None
+        if isinstance(self.meta.domain, ListDomain):
+            write_item = ToRaw.__prepare__(self.meta.domain.item_domain) \
+                                .compile(with_null)
+        entries = [(u"meta", meta, write_tokens, None),
+                   (u"data", self.data, write, write_item)]
+        return emit_document(entries, with_null, self.chunk_size)
 
     def emit(self):
         meta = list(profile_to_raw(self.meta))
@@ -199,11 +285,23 @@ class EmitJSON(Emit):
 
     adapt(JSONFormat)
 
+    # The number of fragments of output to accumulate before producing
+    # a chunk of output.
+    chunk_size = 1024
+
     def __call__(self):
-        tokens = self.emit()
-        if not self.format.with_null:
-            tokens = purge_null_keys(tokens)
-        return dump_json(tokens)
+        with_null = self.format.with_null
+        if self.meta.tag:
+            key = self.meta.tag
+        else:
+            key = unicode(0)
+        write = ToJSON.__prepare__(self.meta.domain).compile(with_null)
+        write_item = None
+        if isinstance(self.meta.domain, ListDomain):
+            write_item = ToJSON.__prepare__(self.meta.domain.item_domain) \
+                                .compile(with_null)
+        entries = [(key, self.data, write, write_item)]
+        return emit_document(entries, with_null, self.chunk_size)
 
     def emit(self):
         product_to_json = to_json(self.meta.domain)
@@ -235,6 +333,23 @@ class ToRaw(Adapter):
         else:
             yield self.domain.dump(value)
 
+    def compile(self, with_null):
+        """
+        Returns a function that renders a value to JSON in one pass.
+
+        The function has the signature ``write(value, indent, prefix,
+        suffix, append)``; it passes the output lines to `append`.
+        The first line starts with `prefix`, the following lines with
+        `indent`, and the last line ends with `suffix`.
+        """
+        scatter = self.scatter
+        def write(value, indent, prefix, suffix, append):
+            tokens = scatter(value)
+            if not with_null:
+                tokens = purge_null_keys(tokens)
+            write_tokens(tokens, indent, prefix, suffix, append)
+        return write
+
 
 class RecordToRaw(ToRaw):
 
@@ -255,6 +370,25 @@ class RecordToRaw(ToRaw):
                     yield token
             yield JS_END
 
+    def compile(self, with_null):
+        fields_write = [ToRaw.__prepare__(field.domain).compile(with_null)
+                        for field in self.domain.fields]
+        if not fields_write:
+            return super(RecordToRaw, self).compile(with_null)
+        suffixes = [u",\n"]*(len(fields_write)-1)+[u"\n"]
+        def write(value, indent, prefix, suffix, append):
+            if value is None:
+                append(prefix+u"null"+suffix)
+                return
+            append(prefix+u"[\n")
+            item_indent = indent+u"  "
+            for item, field_write, item_suffix in zip(value, fields_write,
+                                                      suffixes):
+                field_write(item, item_indent, item_indent, item_suffix,
+                            append)
+            append(indent+u"]"+suffix)
+        return write
+
 
 class ListToRaw(ToRaw):
 
@@ -275,6 +409,16 @@ class ListToRaw(ToRaw):
                     yield token
             yield JS_END
 
+    def compile(self, with_null):
+        write_item = ToRaw.__prepare__(self.domain.item_domain) \
+                            .compile(with_null)
+        def write(value, indent, prefix, suffix, append):
+            if value is None:
+                append(prefix+u"null"+suffix)
+                return
+            write_items(value, write_item, indent, prefix, suffix, append)
+        return write
+
 
 class NativeToRaw(ToRaw):
 
@@ -288,6 +432,18 @@ class NativeToRaw(ToRaw):
     def scatter(value):
         yield value
 
+    def compile(self, with_null):
+        if isinstance(self.domain, (TextDomain, EnumDomain)):
+            def write(value, indent, prefix, suffix, append):
+                if value.__class__ is unicode:
+                    append(prefix+u"\""+escape_json(value)+u"\""+suffix)
+                else:
+                    append(prefix+dump_scalar(value)+suffix)
+        else:
+            def write(value, indent, prefix, suffix, append):
+                append(prefix+dump_scalar(value)+suffix)
+        return write
+
 
 class NativeStringToRaw(ToRaw):
 
@@ -301,6 +457,15 @@ class NativeStringToRaw(ToRaw):
         else:
             yield unicode(value)
 
+    def compile(self, with_null):
+        def write(value, indent, prefix, suffix, append):
+            if value is None:
+                append(prefix+u"null"+suffix)
+            else:
+                append(prefix+u"\""+escape_json(unicode(value))+u"\""
+                       + suffix)
+        return write
+
 
 class DateTimeToRaw(ToRaw):
 
@@ -315,6 +480,16 @@ class DateTimeToRaw(ToRaw):
         else:
             yield unicode(value)
 
+    def compile(self, with_null):
+        def write(value, indent, prefix, suffix, append):
+            if value is None:
+                append(prefix+u"null"+suffix)
+                return
+            if not value.time():
+                value = value.date()
+            append(prefix+u"\""+escape_json(unicode(value))+u"\""+suffix)
+        return write
+
 
 class OpaqueToRaw(ToRaw):
 
@@ -491,6 +666,14 @@ class ToJSON(Adapter):
     def __call__(self):
         return to_raw(self.domain)
 
+    def compile(self, with_null):
+        """
+        Returns a function that renders a value to JSON in one pass.
+
+        See :meth:`ToRaw.compile`.
+        """
+        return ToRaw.__prepare__(self.domain).compile(with_null)
+
 
 class RecordToJSON(ToJSON):
 
@@ -525,6 +708,39 @@ class RecordToJSON(ToJSON):
                     yield token
             yield JS_END
 
+    def compile(self, with_null):
+        fields_write = [ToJSON.__prepare__(field.domain).compile(with_null)
+                        for field in self.domain.fields]
+        keys = [u"\"%s\": " % escape_json(key) for key in self.field_keys]
+        # Field prefixes for each indentation level.
+        prefixes_by_indent = {}
+        def write(value, indent, prefix, suffix, append):
+            if value is None:
+                append(prefix+u"null"+suffix)
+                return
+            item_indent = indent+u"  "
+            prefixes = prefixes_by_indent.get(indent)
+            if prefixes is None:
+                prefixes = [item_indent+key for key in keys]
+                prefixes_by_indent[indent] = prefixes
+            entries = zip(value, fields_write, prefixes)
+            if not with_null:
+                entries = [entry for entry in entries if entry[0] is not None]
+            if not entries:
+                append(prefix+u"{}"+suffix)
+                return
+            append(prefix+u"{\n")
+            last = len(entries)-1
+            for idx, (item, field_write, item_prefix) in enumerate(entries):
+                if idx < last:
+                    field_write(item, item_indent, item_prefix, u",\n",
+                                append)
+                else:
+                    field_write(item, item_indent, item_prefix, u"\n",
+                                append)
+            append(indent+u"}"+suffix)
+        return write
+
 
 class ListToJSON(ToJSON):
 
@@ -548,6 +764,16 @@ class ListToJSON(ToJSON):
                     yield token
             yield JS_END
 
+    def compile(self, with_null):
+        write_item = ToJSON.__prepare__(self.domain.item_domain) \
+                            .compile(with_null)
+        def write(value, indent, prefix, suffix, append):
+            if value is None:
+                append(prefix+u"null"+suffix)
+                return
+            write_items(value, write_item, indent, prefix, suffix, append)
+        return write
+
 
 def profile_to_raw(profile):
     yield JS_MAP
@@ -24,6 +24,7 @@ from ..tr.pipe import SQLPipe
 import re
 import decimal
 import datetime
+import itertools
 
 
 class EmitTextHeaders(EmitHeaders):
@@ -38,13 +39,25 @@ class EmitText(Emit):
 
     adapt(TextFormat)
 
+    # The number of leading rows used to estimate the width of columns
+    # when the rows are streamed.
+    sample_size = 1000
+
     def __call__(self):
         addon = context.app.htsql
         product_to_text = profile_to_text(self.meta)
         size = product_to_text.size
         if size == 0:
             return
-        widths = product_to_text.widths(self.data)
+        data = self.data
+        if (isinstance(self.meta.domain, ListDomain) and data is not None
+                and not isinstance(data, list)):
+            data = iter(data)
+            sample = list(itertools.islice(data, self.sample_size))
+            widths = product_to_text.widths(sample)
+            data = itertools.chain(sample, data)
+        else:
+            widths = product_to_text.widths(data)
         depth = product_to_text.head_depth()
         head = product_to_text.head(depth)
         if depth > 0:
@@ -134,7 +147,7 @@ class EmitText(Emit):
                 line.append(u"-+-")
             line.append(u"\n")
             yield u"".join(line)
-        body = product_to_text.body(self.data, widths)
+        body = product_to_text.body(data, widths)
         for row in body:
             line = []
             is_last_solid = False
@@ -245,6 +258,8 @@ class TextToText(ToText):
             yield [(u"%*s" % (-width, value), True)]
             return
         chunks = self.boundary_regexp.split(value)
+        # The width could be estimated from a sample of the data.
+        width = max([width]+[len(chunk) for chunk in chunks])
         best_badnesses = []
         best_lengths = []
         best_sizes = []
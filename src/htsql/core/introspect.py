@@ -12,7 +12,21 @@ This module declares the database introspector adapter.
 
 
 from .adapter import Utility, rank
-from .cache import once
+from .context import context
+from .cache import once, GeneralCache
+from .connect import transaction
+from .entity import make_catalog
+from .error import Error
+import sys
+import os
+import os.path
+import time
+import tempfile
+import cPickle
+
+
+# Incremented whenever the format of catalog snapshots changes.
+SNAPSHOT_VERSION = 2
 
 
 class Introspect(Utility):
@@ -80,10 +94,244 @@ class IntrospectCleanup(Introspect):
         return catalog
 
 
+class Fingerprint(Utility):
+    """
+    Declares the catalog fingerprint interface.
+
+    A fingerprint is a value that changes whenever the database
+    schema changes.  The default implementation returns ``None``,
+    which means the fingerprint is not supported by the backend.
+    """
+
+    # An SQL query that produces the fingerprint.
+    sql = None
+
+    def __call__(self):
+        """
+        Returns the fingerprint of the database catalog.
+        """
+        if self.sql is None:
+            return None
+        with transaction(is_read_only=True) as connection:
+            cursor = connection.cursor()
+            cursor.execute(self.sql)
+            rows = cursor.fetchall()
+        return tuple(tuple(row) for row in rows)
+
+
+def dump_catalog(catalog):
+    # Converts the catalog to a structure of lists and tuples.
+    schemas = []
+    for schema in catalog:
+        tables = []
+        for table in schema:
+            columns = [(column.name, column.domain,
+                        column.is_nullable, column.has_default)
+                       for column in table]
+            unique_keys = [([column.name for column in key.origin_columns],
+                            key.is_primary, key.is_partial)
+                           for key in table.unique_keys]
+            foreign_keys = [([column.name for column in key.origin_columns],
+                             key.target.schema.name, key.target.name,
+                             [column.name for column in key.target_columns],
+                             key.is_partial)
+                            for key in table.foreign_keys]
+            tables.append((table.name, columns, unique_keys, foreign_keys))
+        schemas.append((schema.name, schema.priority, tables))
+    return schemas
+
+
+def load_catalog(schemas):
+    # Restores the catalog from the output of `dump_catalog()`.
+    catalog = make_catalog()
+    for schema_name, priority, tables in schemas:
+        schema = catalog.add_schema(schema_name, priority)
+        for table_name, columns, unique_keys, foreign_keys in tables:
+            table = schema.add_table(table_name)
+            for name, domain, is_nullable, has_default in columns:
+                table.add_column(name, domain, is_nullable, has_default)
+            for names, is_primary, is_partial in unique_keys:
+                columns = [table[name] for name in names]
+                table.add_unique_key(columns, is_primary, is_partial)
+    for schema_name, priority, tables in schemas:
+        schema = catalog[schema_name]
+        for table_name, columns, unique_keys, foreign_keys in tables:
+            table = schema[table_name]
+            for (names, target_schema_name, target_name,
+                    target_names, is_partial) in foreign_keys:
+                target = catalog[target_schema_name][target_name]
+                columns = [table[name] for name in names]
+                target_columns = [target[name] for name in target_names]
+                table.add_foreign_key(columns, target, target_columns,
+                                      is_partial)
+    catalog.freeze()
+    return catalog
+
+
+def freeze_value(value):
+    # Converts a parameter value to a form that survives pickling and
+    # could be compared for equality.
+    if value is None or isinstance(value, (bool, int, long, float,
+                                           str, unicode)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze_value(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((freeze_value(key), freeze_value(value[key]))
+                            for key in value))
+    return (value.__class__.__name__, str(value))
+
+
+def get_snapshot_key():
+    # Identifies the database and the configuration of the application;
+    # the catalog depends on the addons that override introspection
+    # and their parameters.
+    app = context.app
+    db = app.htsql.db
+    modules = set(component.__module__
+                  for component in Introspect.__implementations__()
+                  if component.__module__ != Introspect.__module__)
+    addons = []
+    for addon in app.addons:
+        package = addon.__module__
+        if not hasattr(sys.modules[package], '__path__'):
+            package = package.rsplit('.', 1)[0]
+        parameters = ()
+        if any(module == package or module.startswith(package+'.')
+               for module in modules):
+            parameters = tuple((parameter.attribute,
+                                freeze_value(getattr(addon,
+                                                     parameter.attribute)))
+                               for parameter in addon.parameters)
+        addons.append((addon.name, parameters))
+    return (SNAPSHOT_VERSION, db.engine, db.host, db.port, db.database,
+            tuple(sorted(addons)))
+
+
+def save_snapshot(path, catalog, fingerprint):
+    """
+    Saves the catalog to a snapshot file.
+
+    `path` (a string)
+        The name of the snapshot file.
+
+    `catalog` (:class:`htsql.core.entity.CatalogEntity`)
+        The database catalog.
+
+    `fingerprint`
+        The fingerprint of the database schema taken before
+        the catalog was introspected.
+    """
+    data = (get_snapshot_key(), fingerprint, dump_catalog(catalog))
+    # Write to a temporary file first so that concurrent readers
+    # never see an incomplete snapshot.
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temporary_path = tempfile.mkstemp(dir=directory)
+    try:
+        stream = os.fdopen(descriptor, 'wb')
+        try:
+            cPickle.dump(data, stream, 2)
+        finally:
+            stream.close()
+        os.rename(temporary_path, path)
+    except:
+        os.unlink(temporary_path)
+        raise
+
+
+def load_snapshot(path, fingerprint):
+    """
+    Loads the catalog from a snapshot file.
+
+    Returns ``None`` if the file does not exist, is damaged, or was
+    generated for another database, configuration or schema.
+    """
+    try:
+        stream = open(path, 'rb')
+    except IOError:
+        return None
+    try:
+        try:
+            key, snapshot_fingerprint, schemas = cPickle.load(stream)
+        except Exception:
+            return None
+    finally:
+        stream.close()
+    if key != get_snapshot_key() or snapshot_fingerprint != fingerprint:
+        return None
+    return load_catalog(schemas)
+
+
 @once
 def introspect():
+    path = context.app.htsql.catalog_snapshot
+    value = None
+    if path is not None:
+        value = fingerprint()
+        if value is not None:
+            catalog = load_snapshot(path, value)
+            if catalog is not None:
+                return catalog
     catalog = Introspect.__invoke__()
     catalog.freeze()
+    if value is not None:
+        try:
+            save_snapshot(path, catalog, value)
+        except (IOError, OSError):
+            # The snapshot is an optimization; a read-only location
+            # should not prevent the application from starting.
+            pass
     return catalog
 
 
+def fingerprint():
+    """
+    Returns the fingerprint of the database catalog.
+    """
+    return Fingerprint.__invoke__()
+
+
+def refresh(force=False):
+    """
+    Rebuilds the catalog if the database schema has changed.
+
+    The fingerprint of the catalog is checked no more often than
+    `refresh_interval` seconds.  When it changes, the catalog and all
+    the values derived from it are rebuilt in a new cache, which
+    replaces the active cache of the application.  Requests that are
+    already running keep using the old cache.
+
+    `force` (Boolean)
+        If set, check the fingerprint regardless of the interval and
+        rebuild the catalog even if the fingerprint is not supported.
+
+    Returns the active cache.
+    """
+    addon = context.app.htsql
+    if not force:
+        if addon.refresh_interval is None:
+            return addon.cache
+        with addon.refresh_lock:
+            now = time.time()
+            if now < addon.refresh_time+addon.refresh_interval:
+                return addon.cache
+            # Other requests do not wait for the check to complete.
+            addon.refresh_time = now
+    try:
+        value = fingerprint()
+        if value == addon.fingerprint and not (force and value is None):
+            return addon.cache
+        cache = GeneralCache(addon.plan_cache_size or 0)
+        with context.env(cache=cache):
+            introspect()
+    except Error:
+        if force:
+            raise
+        # Keep the current catalog; the database may be unavailable.
+        return addon.cache
+    with addon.refresh_lock:
+        addon.cache = cache
+        addon.fingerprint = value
+    return cache
+
+
@@ -0,0 +1,284 @@
+#
+# Copyright (c) 2006-2013, Prometheus Research, LLC
+#
+
+
+"""
+:mod:`htsql.core.profile`
+=========================
+
+This module collects performance statistics of HTSQL requests.
+
+Profiling is disabled unless explicitly requested::
+
+    with app:
+        with profiling() as profile:
+            product = produce('/school')
+    print profile
+"""
+
+
+from .context import context
+import threading
+import time
+
+
+class Profile(object):
+    """
+    Performance statistics of a request.
+
+    `timings` (a list of pairs)
+        Wall time, in seconds, spent in each translation stage, in order
+        of the first appearance of the stage.
+
+    `calls` (a dictionary)
+        The number of ``__invoke__()`` and ``__prepare__()`` calls
+        for each adapter or utility interface.
+
+    `queries` (an integer)
+        The number of executed SQL statements.
+
+    `rows` (an integer)
+        The number of fetched rows.
+
+    `execute_time`, `fetch_time`, `format_time` (numbers)
+        Time spent executing SQL, fetching rows and formatting the output.
+    """
+
+    # The number of profiles being collected in all threads; adapter calls
+    # are only counted when it is not zero.
+    active = 0
+    active_lock = threading.Lock()
+
+    def __init__(self):
+        self.timings = []
+        self.stage_index = {}
+        self.calls = {}
+        self.queries = 0
+        self.rows = 0
+        self.execute_time = 0.0
+        self.fetch_time = 0.0
+        self.format_time = 0.0
+
+    def add_timing(self, stage, elapsed):
+        """
+        Adds time spent in a translation stage.
+        """
+        index = self.stage_index.get(stage)
+        if index is None:
+            self.stage_index[stage] = len(self.timings)
+            self.timings.append((stage, elapsed))
+        else:
+            self.timings[index] = (stage, self.timings[index][1]+elapsed)
+
+    def add_call(self, interface):
+        """
+        Counts a call of an adapter interface.
+        """
+        name = interface.__name__
+        self.calls[name] = self.calls.get(name, 0)+1
+
+    def add_query(self, elapsed):
+        """
+        Counts an executed SQL statement.
+        """
+        self.queries += 1
+        self.execute_time += elapsed
+
+    def add_rows(self, count, elapsed):
+        """
+        Counts fetched rows.
+        """
+        self.rows += count
+        self.fetch_time += elapsed
+
+    def summary(self):
+        """
+        Returns a short one-line description of the profile.
+        """
+        chunks = []
+        for stage, elapsed in self.timings:
+            chunks.append("%s=%.1fms" % (stage, elapsed*1000))
+        chunks.append("sql=%.1fms" % ((self.execute_time+self.fetch_time)
+                                      * 1000))
+        chunks.append("queries=%s" % self.queries)
+        chunks.append("rows=%s" % self.rows)
+        chunks.append("format=%.1fms" % (self.format_time*1000))
+        chunks.append("calls=%s" % sum(self.calls.values()))
+        return "; ".join(chunks)
+
+    def __str__(self):
+        lines = []
+        lines.append("Translation:")
+        total = 0.0
+        for stage, elapsed in self.timings:
+            lines.append("  %-20s %10.3f ms" % (stage, elapsed*1000))
+            total += elapsed
+        lines.append("  %-20s %10.3f ms" % ("total", total*1000))
+        lines.append("")
+        lines.append("Database:")
+        lines.append("  %-20s %10s" % ("queries", self.queries))
+        lines.append("  %-20s %10.3f ms" % ("execute",
+                                             self.execute_time*1000))
+        lines.append("  %-20s %10s" % ("rows", self.rows))
+        lines.append("  %-20s %10.3f ms" % ("fetch", self.fetch_time*1000))
+        lines.append("")
+        lines.append("Output:")
+        lines.append("  %-20s %10.3f ms" % ("format", self.format_time*1000))
+        lines.append("")
+        lines.append("Adapter calls:")
+        for name, count in sorted(self.calls.items(),
+                                  key=(lambda item: (-item[1], item[0]))):
+            lines.append("  %-40s %10s" % (name, count))
+        lines.append("  %-40s %10s" % ("total", sum(self.calls.values())))
+        return "\n".join(lines)+"\n"
+
+
+class ProfilingGuard(object):
+    # Collects a profile while the guard is active.
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.env_guard = None
+
+    def __enter__(self):
+        with Profile.active_lock:
+            Profile.active += 1
+        self.env_guard = context.env(profile=self.profile)
+        self.env_guard.__enter__()
+        return self.profile
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.env_guard.__exit__(exc_type, exc_value, exc_traceback)
+        with Profile.active_lock:
+            Profile.active -= 1
+
+
+class MeasureGuard(object):
+    # Adds the time spent within the guard to a translation stage.
+
+    def __init__(self, profile, stage):
+        self.profile = profile
+        self.stage = stage
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.time()
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.profile.add_timing(self.stage, time.time()-self.start)
+
+
+class QueryGuard(object):
+    # Counts an SQL statement executed within the guard.
+
+    def __init__(self, profile):
+        self.profile = profile
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.time()
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.profile.add_query(time.time()-self.start)
+
+
+class NullGuard(object):
+    # Used in place of `MeasureGuard` when profiling is disabled.
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        pass
+
+
+null_guard = NullGuard()
+
+
+def profiling(profile=None):
+    """
+    Collects performance statistics of requests executed in the guarded
+    block.
+
+    Returns a context manager, which value is a :class:`Profile` instance.
+    """
+    if profile is None:
+        profile = Profile()
+    return ProfilingGuard(profile)
+
+
+def active_profile():
+    """
+    Returns the profile being collected or ``None``.
+    """
+    env = context.active_env
+    if env is None:
+        return None
+    return getattr(env, 'profile', None)
+
+
+def measure(stage):
+    """
+    Adds the time spent in the guarded block to the given translation
+    stage of the active profile.
+    """
+    profile = active_profile()
+    if profile is None:
+        return null_guard
+    return MeasureGuard(profile, stage)
+
+
+def measure_query():
+    """
+    Adds the SQL statement executed in the guarded block to the active
+    profile.
+    """
+    profile = active_profile()
+    if profile is None:
+        return null_guard
+    return QueryGuard(profile)
+
+
+def measure_output(generate, *arguments):
+    """
+    Calls ``generate(*arguments)`` to produce the output of a request
+    and adds the time spent formatting the output to the active profile.
+    """
+    profile = active_profile()
+    if profile is None:
+        return generate(*arguments)
+    # Time spent fetching rows while the output is generated is not
+    # included.
+    fetch_time = profile.fetch_time
+    start = time.time()
+    body = generate(*arguments)
+    profile.format_time += ((time.time()-start)
+                            - (profile.fetch_time-fetch_time))
+    return measure_chunks(profile, body)
+
+
+def measure_chunks(profile, body):
+    # Generates the output adding the time to the profile.
+    body = iter(body)
+    while True:
+        fetch_time = profile.fetch_time
+        start = time.time()
+        try:
+            chunk = body.next()
+        except StopIteration:
+            chunk = None
+        profile.format_time += ((time.time()-start)
+                                - (profile.fetch_time-fetch_time))
+        if chunk is None:
+            break
+        yield chunk
+
+
+def count_call(interface):
+    # Counts an adapter call; invoked only when some profile is active.
+    profile = active_profile()
+    if profile is not None:
+        profile.add_call(interface)
+
+
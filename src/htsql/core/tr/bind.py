@@ -33,14 +33,15 @@ from .binding import (Binding, WrappingBinding, CollectBinding, RootBinding,
         DefineLiftBinding, SelectionBinding, WildSelectionBinding,
         DirectionBinding, TitleBinding, RerouteBinding,
         ReferenceRerouteBinding, AliasBinding, LiteralBinding, FormulaBinding,
-        VoidBinding, Recipe, LiteralRecipe, SelectionRecipe, FreeTableRecipe,
+        VoidBinding, Recipe, LiteralRecipe, PlaceholderRecipe,
+        SelectionRecipe, FreeTableRecipe,
         AttachedTableRecipe, ColumnRecipe, KernelRecipe, ComplementRecipe,
         IdentityRecipe, ChainRecipe, SubstitutionRecipe, BindingRecipe,
         ClosedRecipe, PinnedRecipe, AmbiguousRecipe)
 from .lookup import (lookup_attribute, lookup_reference, lookup_complement,
         lookup_attribute_set, lookup_reference_set, expand, direct, guess_tag,
         identify, unwrap)
-from .signature import IsEqualSig, AndSig
+from .signature import IsEqualSig, AndSig, PlaceholderSig
 from .coerce import coerce
 from .decorate import decorate
 
@@ -935,6 +936,17 @@ class BindByName(Protocol):
         # None of the names matched the dispatch key.
         return False
 
+    @classmethod
+    def __signatures__(interface):
+        # Names with a fixed number of arguments; we cannot enumerate
+        # dispatch keys for names accepting any number of arguments.
+        signatures = []
+        for name in interface.__catalogue__():
+            if isinstance(name, tuple) and name[1] != -1:
+                name, arity = name
+                signatures.append((unicode(name.lower()), arity))
+        return signatures
+
     @classmethod
     def __dispatch__(interface, syntax, *args, **kwds):
         assert isinstance(syntax, (ApplySyntax, IdentifierSyntax))
@@ -1096,6 +1108,17 @@ class BindByLiteral(BindByRecipe):
                               self.syntax)
 
 
+class BindByPlaceholder(BindByRecipe):
+
+    adapt(PlaceholderRecipe)
+
+    def __call__(self):
+        return FormulaBinding(self.state.scope,
+                              PlaceholderSig(self.recipe.index),
+                              self.recipe.domain,
+                              self.syntax)
+
+
 class BindBySelection(BindByRecipe):
 
     adapt(SelectionRecipe)
@@ -1301,12 +1324,16 @@ class BindByAmbiguous(BindByRecipe):
             raise Error("Found ambiguous name", syntax)
 
 
-def bind(syntax, environment=None):
+def bind(syntax, environment=None, slots=None):
+    # `slots` maps the names of environment variables to indexes of
+    # query parameters that carry the values of the variables.
     recipes = []
     if environment is not None:
         for name in sorted(environment):
             value = environment[name]
-            if value.data is None:
+            if slots and name in slots:
+                recipe = PlaceholderRecipe(slots[name], value.domain)
+            elif value.data is None:
                 recipe = LiteralRecipe(value.data, value.domain)
             elif isinstance(value.domain, ListDomain):
                 item_recipes = [LiteralRecipe(item,
@@ -737,6 +737,22 @@ class LiteralRecipe(Recipe):
         return "%s: %s" % (self.value, self.domain)
 
 
+class PlaceholderRecipe(Recipe):
+    # Generates a query parameter in place of a literal value.
+
+    def __init__(self, index, domain):
+        assert isinstance(index, int)
+        assert isinstance(domain, Domain)
+        self.index = index
+        self.domain = domain
+
+    def __basis__(self):
+        return (self.index, self.domain)
+
+    def __str__(self):
+        return "$%s: %s" % (self.index+1, self.domain)
+
+
 class SelectionRecipe(Recipe):
 
     def __init__(self, recipes):
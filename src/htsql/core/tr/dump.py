@@ -321,15 +321,17 @@ class SerializeSegment(Serialize):
         sql = self.state.flush()
         input_domains = None
         if placeholders:
-            input_domains = []
-            for index in sorted(placeholders):
-                input_domains.append(placeholders[index])
+            # The statement may use only some of the query parameters;
+            # the slots for unused parameters are filled with `None`.
+            input_domains = [placeholders.get(index)
+                             for index in range(max(placeholders)+1)]
         output_domains = [phrase.domain for phrase in self.clause.select]
+        tables = self.tables()
         if self.state.batch is None:
-            pipe = SQLPipe(sql, input_domains, output_domains)
+            pipe = SQLPipe(sql, input_domains, output_domains, tables)
         else:
             pipe = BatchSQLPipe(sql, input_domains, output_domains,
-                                self.state.batch)
+                                self.state.batch, tables)
         if self.clause.dependents:
             feeds = [pipe]
             keys = [self.clause.key_pipe]
@@ -342,6 +344,19 @@ class SerializeSegment(Serialize):
             pipe = ComposePipe(pipe, mix_pipe)
         return pipe
 
+    def tables(self):
+        """
+        Returns the list of tables read by the segment.
+        """
+        tables = []
+        queue = [self.clause]
+        while queue:
+            frame = queue.pop(0)
+            if frame.is_table and frame.table not in tables:
+                tables.append(frame.table)
+            queue.extend(frame.kids)
+        return tables
+
     def aliasing(self, frame=None,
                  taken_select_aliases=None,
                  taken_include_aliases=None):
@@ -21,16 +21,32 @@ from .space import (RootSpace, ScalarSpace, DirectTableSpace, FiberTableSpace,
         ForkedSpace, AttachSpace, ClippedSpace, FilteredSpace, OrderedSpace,
         SegmentExpr, LiteralCode, FormulaCode, CastCode, ColumnUnit,
         ScalarUnit, KernelUnit, CoveringUnit)
-from .signature import Signature, IsNullSig, NullIfSig, IsEqualSig, AndSig
+from .signature import (Signature, IsNullSig, NullIfSig, IsEqualSig, AndSig,
+        CompareSig, PlaceholderSig)
 import decimal
 
 
 class EncodingState(object):
+    """
+    Encapsulates the state of the encoding process.
+
+    `literals` (a list of :class:`htsql.core.syn.syntax.LiteralSyntax`)
+        Literal nodes which values could be replaced with query
+        parameters; the position of a literal in the list is
+        the index of the parameter.
+
+    State attributes:
+
+    `parameters` (a dictionary `index -> domain`)
+        Query parameters generated in place of the literals.
+    """
 
-    def __init__(self):
+    def __init__(self, literals=None):
         self.flow_to_code = {}
         self.flow_to_space = {}
         self.flow_to_bundle = {}
+        self.literals = literals or []
+        self.parameters = {}
 
     def encode(self, flow):
         # When caching is enabled, we check if `flow` was
@@ -56,6 +72,43 @@ class EncodingState(object):
                 self.flow_to_bundle[flow] = bundle
             return self.flow_to_bundle[flow]
 
+    def parameterize(self, code):
+        """
+        Replaces a literal with a query parameter, when possible.
+
+        `code` (:class:`htsql.core.tr.space.Code`)
+            An encoded operand.
+        """
+        if not (self.literals and isinstance(code, LiteralCode) and
+                code.value is not None and
+                isinstance(code.domain, (TextDomain, NumberDomain, DateDomain,
+                                         TimeDomain, DateTimeDomain))):
+            return code
+        # Find the original literal node.
+        flow = code.flow
+        while isinstance(flow, CastFlow):
+            flow = flow.base
+        if not isinstance(flow, LiteralFlow):
+            return code
+        index = None
+        for idx, literal in enumerate(self.literals):
+            if literal is flow.binding.syntax:
+                index = idx
+        if index is None:
+            return code
+        # Make sure the value of the parameter could be recovered from
+        # the literal text.
+        try:
+            value = code.domain.parse(self.literals[index].text)
+        except ValueError:
+            return code
+        if value != code.value:
+            return code
+        if self.parameters.get(index, code.domain) != code.domain:
+            return code
+        self.parameters[index] = code.domain
+        return FormulaCode(PlaceholderSig(index), code.domain, code.flow)
+
 
 class Bundle(object):
 
@@ -905,6 +958,19 @@ class EncodeBySignature(EncodeBySignatureBase):
                            **arguments)
 
 
+class EncodeComparison(EncodeBySignature):
+
+    adapt_many(IsEqualSig, CompareSig)
+
+    def __call__(self):
+        # Encode the operands; the right operand may be replaced with
+        # a query parameter.
+        lop = self.state.encode(self.flow.lop)
+        rop = self.state.parameterize(self.state.encode(self.flow.rop))
+        return FormulaCode(self.signature, self.domain, self.flow,
+                           lop=lop, rop=rop)
+
+
 class UnpackSelection(Unpack):
 
     adapt(SelectionFlow)
@@ -1026,8 +1092,9 @@ def relate(flow, state=None):
     return Relate.__invoke__(flow, state)
 
 
-def encode(flow):
-    state = EncodingState()
+def encode(flow, state=None):
+    if state is None:
+        state = EncodingState()
     bundle = state.unpack(flow)
     if len(bundle.codes) == 0 and len(bundle.segments) == 1:
         [segment] = bundle.segments
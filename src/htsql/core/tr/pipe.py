@@ -6,11 +6,13 @@
 from ..util import Clonable, YAMLable
 from ..context import context
 from ..domain import Product
-from ..connect import transaction, scramble, unscramble
+from ..connect import (connect, transaction, scramble, unscramble_rows,
+        export_snapshot, import_snapshot, prepare_read, complete_read)
 from ..error import PermissionError
+from .spill import SpillFile
 import operator
-import tempfile
-import cPickle
+import threading
+import sys
 
 
 class Pipe(Clonable, YAMLable):
@@ -36,45 +38,48 @@ class ComposePipe(Pipe):
 
 class SQLPipe(Pipe):
 
-    def __init__(self, sql, input_domains, output_domains):
+    def __init__(self, sql, input_domains, output_domains, tables=None):
         self.sql = sql
         self.input_domains = input_domains
         self.output_domains = output_domains
+        # The tables read by the statement.
+        self.tables = tables
+        # The row decoder is built on the first execution and reused
+        # by the subsequent ones.
+        self.decode = None
 
     def __call__(self):
+        if self.decode is None:
+            self.decode = unscramble_rows(self.output_domains)
         def run_sql(input, sql=self.sql.encode('utf-8'),
                            input_domains=self.input_domains,
-                           output_domains=self.output_domains):
+                           decode=self.decode):
             if not context.env.can_read:
                 raise PermissionError("No read permissions")
             scrambles = None
             if input_domains is not None:
-                scrambles = [scramble(domain) for domain in input_domains]
-            unscrambles = [unscramble(domain) for domain in output_domains]
-            with transaction() as connection:
+                scrambles = [scramble(domain) if domain is not None else None
+                             for domain in input_domains]
+            with transaction(is_read_only=True) as connection:
                 cursor = connection.cursor()
                 if scrambles is None:
-                    assert input is None
                     cursor.execute(sql)
                 else:
                     assert isinstance(input, (tuple, list))
-                    assert len(input) == len(scrambles)
+                    assert len(input) >= len(scrambles)
                     parameters = dict((str(index+1), scramble(item))
                             for index, (item, scramble)
-                                    in enumerate(zip(input, scrambles)))
+                                    in enumerate(zip(input, scrambles))
+                            if scramble is not None)
                     cursor.execute(sql, parameters)
-                output = []
-                for row in cursor:
-                    assert len(row) == len(unscrambles)
-                    output.append(tuple(unscramble(item)
-                                  for item, unscramble in zip(row, unscrambles)))
+                output = decode(cursor.fetchall())
             return output
         return run_sql
 
     def __yaml__(self):
         yield ('sql', self.sql+'\n')
         if self.input_domains:
-            yield ('input', [unicode(domain)
+            yield ('input', [unicode(domain) if domain is not None else None
                              for domain in self.input_domains])
         if self.output_domains:
             yield ('output', [unicode(domain)
@@ -83,62 +88,55 @@ class SQLPipe(Pipe):
 
 class BatchSQLPipe(Pipe):
 
-    def __init__(self, sql, input_domains, output_domains, batch):
+    def __init__(self, sql, input_domains, output_domains, batch,
+                 tables=None):
         self.sql = sql
         self.input_domains = input_domains
         self.output_domains = output_domains
         self.batch = batch
+        self.tables = tables
+        self.decode = None
 
     def __call__(self):
+        if self.decode is None:
+            self.decode = unscramble_rows(self.output_domains)
         def run_sql(input, sql=self.sql.encode('utf-8'),
                            input_domains=self.input_domains,
                            output_domains=self.output_domains,
-                           batch=self.batch):
+                           batch=self.batch,
+                           decode=self.decode):
             if not context.env.can_read:
                 raise PermissionError("No read permissions")
             scrambles = None
             if input_domains is not None:
-                scrambles = [scramble(domain) for domain in input_domains]
-            unscrambles = [unscramble(domain) for domain in output_domains]
-            with transaction() as connection:
+                scrambles = [scramble(domain) if domain is not None else None
+                             for domain in input_domains]
+            with transaction(is_read_only=True) as connection:
                 cursor = connection.cursor()
                 if scrambles is None:
-                    assert input is None
                     cursor.execute(sql)
                 else:
                     assert isinstance(input, (tuple, list))
-                    assert len(input) == len(scrambles)
+                    assert len(input) >= len(scrambles)
                     parameters = dict((str(index+1), scramble(item))
                             for index, (item, scramble)
-                                    in enumerate(zip(input, scrambles)))
+                                    in enumerate(zip(input, scrambles))
+                            if scramble is not None)
                     cursor.execute(sql, parameters)
-                chunk = cursor.fetchmany(batch)
-                chunk = [tuple([convert(item)
-                                for item, convert in zip(row, unscrambles)])
-                         for row in chunk]
+                chunk = decode(cursor.fetchmany(batch))
                 if len(chunk) < batch:
                     return chunk
-                stream = tempfile.TemporaryFile()
-                size = 0
+                spill = SpillFile(output_domains)
                 while chunk:
-                    size += 1
-                    cPickle.dump(chunk, stream, 2)
-                    chunk = cursor.fetchmany(batch)
-                    chunk = [tuple([convert(item)
-                                    for item, convert in zip(row, unscrambles)])
-                             for row in chunk]
-                stream.seek(0)
-                def iterate(stream=stream, size=size, load=cPickle.load):
-                    for k in xrange(size):
-                        for row in load(stream):
-                            yield row
-                return iterate(stream, size)
+                    spill.write(chunk)
+                    chunk = decode(cursor.fetchmany(batch))
+                return iter(spill)
         return run_sql
 
     def __yaml__(self):
         yield ('sql', self.sql+'\n')
         if self.input_domains:
-            yield ('input', [unicode(domain)
+            yield ('input', [unicode(domain) if domain is not None else None
                              for domain in self.input_domains])
         if self.output_domains:
             yield ('output', [unicode(domain)
@@ -146,6 +144,96 @@ class BatchSQLPipe(Pipe):
         yield ('batch', self.batch)
 
 
+class StreamSQLPipe(Pipe):
+
+    def __init__(self, sql, input_domains, output_domains, size,
+                 tables=None):
+        self.sql = sql
+        self.input_domains = input_domains
+        self.output_domains = output_domains
+        self.size = size
+        self.tables = tables
+        self.decode = None
+
+    def __call__(self):
+        if self.decode is None:
+            self.decode = unscramble_rows(self.output_domains)
+        def run_sql(input, sql=self.sql.encode('utf-8'),
+                           input_domains=self.input_domains,
+                           size=self.size,
+                           decode=self.decode):
+            if not context.env.can_read:
+                raise PermissionError("No read permissions")
+            scrambles = None
+            if input_domains is not None:
+                scrambles = [scramble(domain) if domain is not None else None
+                             for domain in input_domains]
+            # The rows are consumed after the pipe returns, so we cannot
+            # use `transaction()` unless the connection is managed by
+            # the caller.
+            connection = context.env.connection
+            is_own = (connection is None)
+            state = None
+            if is_own:
+                connection = connect(is_read_only=True)
+                state = prepare_read(connection)
+            try:
+                cursor = connection.cursor()
+                if scrambles is None:
+                    cursor.execute(sql)
+                else:
+                    assert isinstance(input, (tuple, list))
+                    assert len(input) >= len(scrambles)
+                    parameters = dict((str(index+1), scramble(item))
+                            for index, (item, scramble)
+                                    in enumerate(zip(input, scrambles))
+                            if scramble is not None)
+                    cursor.execute(sql, parameters)
+                # Fetch the first chunk eagerly so that errors are reported
+                # before any output is produced.
+                chunk = decode(cursor.fetchmany(size))
+            except:
+                if is_own:
+                    connection.invalidate()
+                    connection.release()
+                raise
+            return stream(context.app, connection, cursor, chunk,
+                          decode, size, is_own, state)
+        return run_sql
+
+    def __yaml__(self):
+        yield ('sql', self.sql+'\n')
+        if self.input_domains:
+            yield ('input', [unicode(domain) if domain is not None else None
+                             for domain in self.input_domains])
+        if self.output_domains:
+            yield ('output', [unicode(domain)
+                              for domain in self.output_domains])
+        yield ('size', self.size)
+
+
+def stream(app, connection, cursor, chunk, decode, size, is_own, state):
+    # Generates the rows fetching them from the cursor in chunks.  The
+    # application may be inactive by the time the rows are consumed, so
+    # we activate it for each database call.
+    is_done = False
+    try:
+        while chunk:
+            for row in chunk:
+                yield row
+            with app:
+                chunk = decode(cursor.fetchmany(size))
+        if is_own:
+            with app:
+                complete_read(connection, state)
+        is_done = True
+    finally:
+        if is_own:
+            if not is_done:
+                connection.invalidate()
+            connection.release()
+
+
 class ProducePipe(Pipe):
 
     def __init__(self, meta, data_pipe, **properties):
@@ -198,6 +286,137 @@ class RecordPipe(Pipe):
         yield ('fields', self.field_pipes)
 
 
+class StreamRecordPipe(RecordPipe):
+    # Like `RecordPipe`, but evaluates the first field, which streams
+    # the rows of the top-level segment, after the other fields.  The
+    # streaming cursor holds its connection until the rows are consumed,
+    # so the queries of nested segments must complete before it opens.
+
+    def __call__(self):
+        make_fields = [field_pipe() for field_pipe in self.field_pipes]
+        def make_record(input, make_fields=make_fields,
+                               record_class=self.record_class):
+            fields = [make_field(input) for make_field in make_fields[1:]]
+            fields.insert(0, make_fields[0](input))
+            return record_class(fields)
+        return make_record
+
+
+class ParallelRecordPipe(Pipe):
+    # Like `RecordPipe`, but evaluates all fields except the first one
+    # in worker threads, each with its own database connection.  Workers
+    # only take a connection that is available right away; the fields
+    # left over are evaluated on the connection of the request.
+
+    def __init__(self, field_pipes, size, record_class=tuple):
+        self.field_pipes = field_pipes
+        self.size = size
+        self.record_class = record_class
+
+    def __call__(self):
+        make_fields = [field_pipe() for field_pipe in self.field_pipes]
+        def make_record(input, make_fields=make_fields,
+                               size=self.size,
+                               record_class=self.record_class):
+            # Within an explicit transaction, the queries must see
+            # the changes made by the transaction, so we cannot use
+            # other connections.
+            if context.env.connection is not None:
+                return record_class([make_field(input)
+                                     for make_field in make_fields])
+            with transaction(is_read_only=True) as connection:
+                snapshot = export_snapshot(connection)
+                tasks = list(enumerate(make_fields[1:], 1))
+                lock = threading.Lock()
+                workers = run_parallel(tasks, lock, input, size, snapshot)
+                outputs = {}
+                try:
+                    fields = [make_fields[0](input)]
+                    while True:
+                        with lock:
+                            if not tasks:
+                                break
+                            index, make_field = tasks.pop(0)
+                        outputs[index] = make_field(input)
+                except:
+                    # Make the workers stop.
+                    with lock:
+                        del tasks[:]
+                    raise
+                finally:
+                    for worker in workers:
+                        worker.join()
+            for worker in workers:
+                if worker.exc_info is not None:
+                    exc_type, exc_value, exc_traceback = worker.exc_info
+                    raise exc_type, exc_value, exc_traceback
+            for worker in workers:
+                outputs.update(worker.outputs)
+            fields.extend(outputs[index]
+                          for index in range(1, len(make_fields)))
+            return record_class(fields)
+        return make_record
+
+    def __yaml__(self):
+        yield ('fields', self.field_pipes)
+        yield ('size', self.size)
+
+
+class ParallelWorker(threading.Thread):
+    # Evaluates a queue of fields in a separate thread.
+
+    def __init__(self, tasks, lock, input, snapshot):
+        super(ParallelWorker, self).__init__()
+        self.daemon = True
+        self.tasks = tasks
+        self.lock = lock
+        self.input = input
+        self.snapshot = snapshot
+        # The request environment; the worker uses its own connection.
+        env = context.env
+        variables = dict((name, getattr(env, name))
+                         for name in context.app.variables)
+        variables['connection'] = None
+        self.app = context.app
+        self.env = env.__class__(**variables)
+        self.outputs = {}
+        self.exc_info = None
+
+    def run(self):
+        context.push(self.app, self.env)
+        try:
+            with transaction(is_read_only=True,
+                             is_blocking=False) as connection:
+                # No connection is available; the request evaluates
+                # the fields itself.
+                if connection is None:
+                    return
+                if self.snapshot is not None:
+                    import_snapshot(connection, self.snapshot)
+                while True:
+                    with self.lock:
+                        if not self.tasks:
+                            break
+                        index, make_field = self.tasks.pop(0)
+                    self.outputs[index] = make_field(self.input)
+        except:
+            self.exc_info = sys.exc_info()
+            # Make the other workers stop.
+            with self.lock:
+                del self.tasks[:]
+        finally:
+            context.pop(self.app)
+
+
+def run_parallel(tasks, lock, input, size, snapshot):
+    # Starts at most `size` threads evaluating the given fields.
+    workers = [ParallelWorker(tasks, lock, input, snapshot)
+               for k in range(min(size, len(tasks)))]
+    for worker in workers:
+        worker.start()
+    return workers
+
+
 class ExtractPipe(Pipe):
 
     def __init__(self, index):
@@ -217,6 +436,8 @@ class SinglePipe(Pipe):
 
     def __call__(self):
         def make_single(input):
+            if not isinstance(input, list):
+                input = list(input)
             assert len(input) <= 1
             if input:
                 return input[0]
@@ -272,30 +493,37 @@ class MixPipe(Pipe):
                        make_kid_keys=make_keys[1:]):
             parent = input[0]
             kids = input[1:]
-            kids_range = range(len(kids))
-            tops = [0]*len(kids)
-            output = []
-            for parent_row in parent:
-                row = list(parent_row)
-                parent_key = make_parent_key(parent_row)
-                for idx in kids_range:
-                    kid = kids[idx]
-                    top = tops[idx]
-                    make_kid_key = make_kid_keys[idx]
-                    kid_rows = []
-                    while (top < len(kid) and
-                           make_kid_key(kid[top]) == parent_key):
-                        kid_rows.append(kid[top])
-                        top += 1
-                    tops[idx] = top
-                    row.append(kid_rows)
-                output.append(tuple(row))
-            for idx in kids_range:
-                assert tops[idx] == len(kids[idx])
-            return output
+            rows = mix_rows(parent, kids, make_parent_key, make_kid_keys)
+            # Keep streaming if the parent rows are streamed.
+            if not isinstance(parent, list):
+                return rows
+            return list(rows)
         return mix
 
     def __yaml__(self):
         yield ('keys', self.key_pipes)
 
 
+def mix_rows(parent, kids, make_parent_key, make_kid_keys):
+    # Attaches to each parent row the matching rows of the nested segments.
+    kids_range = range(len(kids))
+    tops = [0]*len(kids)
+    for parent_row in parent:
+        row = list(parent_row)
+        parent_key = make_parent_key(parent_row)
+        for idx in kids_range:
+            kid = kids[idx]
+            top = tops[idx]
+            make_kid_key = make_kid_keys[idx]
+            kid_rows = []
+            while (top < len(kid) and
+                   make_kid_key(kid[top]) == parent_key):
+                kid_rows.append(kid[top])
+                top += 1
+            tops[idx] = top
+            row.append(kid_rows)
+        yield tuple(row)
+    for idx in kids_range:
+        assert tops[idx] == len(kids[idx])
+
+
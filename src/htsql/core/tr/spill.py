@@ -0,0 +1,283 @@
+#
+# Copyright (c) 2006-2013, Prometheus Research, LLC
+#
+
+
+"""
+:mod:`htsql.core.tr.spill`
+==========================
+
+This module implements a columnar format for spilling query results
+to a temporary file.
+"""
+
+
+from ..adapter import Adapter, adapt, adapt_many
+from ..domain import (Domain, BooleanDomain, IntegerDomain, DecimalDomain,
+        FloatDomain, TextDomain, EnumDomain, DateDomain, TimeDomain,
+        DateTimeDomain)
+import array
+import cPickle
+import datetime
+import decimal
+import mmap
+import tempfile
+
+
+class Spill(Adapter):
+    """
+    Encodes and decodes a column of values of the given domain.
+
+    Unless overridden, the values are pickled.  Specialized encoders
+    may fail on unexpected values, in which case the column is pickled
+    too; the first byte of the encoded column indicates the format.
+
+    `domain` (:class:`htsql.core.domain.Domain`)
+        The type of the column.
+    """
+
+    adapt(Domain)
+
+    def __init__(self, domain):
+        assert isinstance(domain, Domain)
+        self.domain = domain
+
+    def __call__(self):
+        return self
+
+    def dump(self, values):
+        """
+        Encodes a list of values to a string.
+        """
+        try:
+            return 'C'+self.encode(values)
+        except (TypeError, ValueError, AttributeError,
+                OverflowError, UnicodeError):
+            return 'P'+cPickle.dumps(values, 2)
+
+    def load(self, data, size):
+        """
+        Decodes a list of `size` values.
+        """
+        if data[0] == 'C':
+            return self.decode(data[1:], size)
+        return cPickle.loads(data[1:])
+
+    def encode(self, values):
+        raise TypeError()
+
+    def decode(self, data, size):
+        raise NotImplementedError()
+
+
+class SpillArray(Spill):
+    # A column of fixed-width values: a null mask followed by an array.
+
+    typecode = 'l'
+    # Conversions between values and array items; `None` means no
+    # conversion is needed.
+    to_item = None
+    from_item = None
+
+    def encode(self, values):
+        to_item = self.to_item
+        mask = ''.join(['\0' if value is not None else '\1'
+                        for value in values])
+        if to_item is None:
+            items = [value if value is not None else 0
+                     for value in values]
+        else:
+            items = [to_item(value) if value is not None else 0
+                     for value in values]
+        return mask+array.array(self.typecode, items).tostring()
+
+    def decode(self, data, size):
+        from_item = self.from_item
+        mask = data[:size]
+        items = array.array(self.typecode)
+        items.fromstring(data[size:])
+        if '\1' not in mask:
+            if from_item is None:
+                return items.tolist()
+            return map(from_item, items)
+        if from_item is None:
+            return [item if flag == '\0' else None
+                    for item, flag in zip(items, mask)]
+        return [from_item(item) if flag == '\0' else None
+                for item, flag in zip(items, mask)]
+
+
+class SpillBoolean(SpillArray):
+
+    adapt(BooleanDomain)
+
+    typecode = 'b'
+    to_item = staticmethod(int)
+    from_item = staticmethod(bool)
+
+
+class SpillInteger(SpillArray):
+
+    adapt(IntegerDomain)
+
+
+class SpillFloat(SpillArray):
+
+    adapt(FloatDomain)
+
+    typecode = 'd'
+
+
+class SpillDate(SpillArray):
+
+    adapt(DateDomain)
+
+    from_item = staticmethod(datetime.date.fromordinal)
+
+    @staticmethod
+    def to_item(value):
+        return value.toordinal()
+
+
+class SpillTime(SpillArray):
+
+    adapt(TimeDomain)
+
+    @staticmethod
+    def to_item(value):
+        if value.tzinfo is not None:
+            raise ValueError(value)
+        return (((value.hour*60+value.minute)*60+value.second)*1000000
+                + value.microsecond)
+
+    @staticmethod
+    def from_item(item):
+        seconds, microsecond = divmod(item, 1000000)
+        minutes, second = divmod(seconds, 60)
+        hour, minute = divmod(minutes, 60)
+        return datetime.time(hour, minute, second, microsecond)
+
+
+class SpillDateTime(SpillArray):
+
+    adapt(DateTimeDomain)
+
+    @staticmethod
+    def to_item(value, minimum=datetime.datetime.min):
+        if value.tzinfo is not None:
+            raise ValueError(value)
+        delta = value-minimum
+        return ((delta.days*86400+delta.seconds)*1000000
+                + delta.microseconds)
+
+    @staticmethod
+    def from_item(item, minimum=datetime.datetime.min,
+                  timedelta=datetime.timedelta):
+        return minimum+timedelta(0, 0, item)
+
+
+class SpillText(Spill):
+    # A column of strings: a null mask followed by UTF-8 encoded values
+    # separated by `NUL` characters; values containing `NUL` are pickled.
+
+    adapt_many(TextDomain,
+               EnumDomain)
+
+    to_text = None
+    from_text = None
+
+    def encode(self, values):
+        to_text = self.to_text
+        if to_text is not None:
+            values = [to_text(value) if value is not None else None
+                      for value in values]
+        mask = ''.join(['\0' if value is not None else '\1'
+                        for value in values])
+        text = u'\0'.join([value if value is not None else u''
+                           for value in values])
+        if values and text.count(u'\0') != len(values)-1:
+            raise ValueError(text)
+        return mask+text.encode('utf-8')
+
+    def decode(self, data, size):
+        from_text = self.from_text
+        if not size:
+            return []
+        mask = data[:size]
+        values = data[size:].decode('utf-8').split(u'\0')
+        if '\1' not in mask:
+            if from_text is None:
+                return values
+            return map(from_text, values)
+        if from_text is None:
+            return [value if flag == '\0' else None
+                    for value, flag in zip(values, mask)]
+        return [from_text(value) if flag == '\0' else None
+                for value, flag in zip(values, mask)]
+
+
+class SpillDecimal(SpillText):
+
+    adapt(DecimalDomain)
+
+    to_text = staticmethod(str)
+    from_text = staticmethod(decimal.Decimal)
+
+
+class SpillFile(object):
+    """
+    Accumulates rows in a temporary file.
+
+    `domains` (a list of :class:`htsql.core.domain.Domain`)
+        The types of the columns.
+    """
+
+    def __init__(self, domains):
+        self.spills = [Spill.__invoke__(domain) for domain in domains]
+        self.stream = tempfile.TemporaryFile()
+        # The number of rows and the lengths of the columns in each batch.
+        self.batches = []
+
+    def write(self, rows):
+        """
+        Adds a batch of rows.
+        """
+        columns = zip(*rows)
+        if not columns:
+            columns = [()]*len(self.spills)
+        lengths = []
+        for spill, column in zip(self.spills, columns):
+            data = spill.dump(list(column))
+            self.stream.write(data)
+            lengths.append(len(data))
+        self.batches.append((len(rows), lengths))
+
+    def __iter__(self):
+        # Memory-map the file and generate the rows batch by batch.  The
+        # file is closed even if the consumer stops early.
+        buffer = ''
+        try:
+            self.stream.flush()
+            self.stream.seek(0, 2)
+            if self.stream.tell() > 0:
+                buffer = mmap.mmap(self.stream.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+            start = 0
+            for size, lengths in self.batches:
+                columns = []
+                for spill, length in zip(self.spills, lengths):
+                    end = start+length
+                    columns.append(spill.load(buffer[start:end], size))
+                    start = end
+                if columns:
+                    for row in zip(*columns):
+                        yield row
+                else:
+                    for k in xrange(size):
+                        yield ()
+        finally:
+            if isinstance(buffer, mmap.mmap):
+                buffer.close()
+            self.stream.close()
+
+
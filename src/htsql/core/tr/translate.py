@@ -3,13 +3,21 @@
 #
 
 
-from ..syn.syntax import Syntax
+from ..context import context
+from ..cache import active_cache
+from ..profile import measure
+from ..error import Error
+from ..domain import (TextDomain, NumberDomain, DateDomain, TimeDomain,
+        DateTimeDomain)
+from ..syn.syntax import (Syntax, CollectSyntax, FilterSyntax, GroupSyntax,
+        SelectSyntax, LocateSyntax, PipeSyntax, OperatorSyntax, PrefixSyntax,
+        LiteralSyntax, StringSyntax, NumberSyntax)
 from ..syn.parse import parse
 from .bind import bind
 from .binding import Binding
 from .decorate import decorate
 from .route import route
-from .encode import encode
+from .encode import EncodingState, encode
 from .space import OrderedSpace
 from .rewrite import rewrite
 from .compile import compile
@@ -17,32 +25,237 @@ from .assemble import assemble
 from .reduce import reduce
 from .dump import serialize
 from .pack import pack
-from .pipe import SQLPipe, RecordPipe, ComposePipe, ProducePipe
+from .pipe import (SQLPipe, StreamSQLPipe, RecordPipe, StreamRecordPipe,
+        ParallelRecordPipe, ComposePipe, ProducePipe, ValuePipe)
 
 
-def translate(syntax, environment=None, limit=None, offset=None, batch=None):
+def translate(syntax, environment=None, limit=None, offset=None, batch=None,
+              stream=None):
     assert isinstance(syntax, (Syntax, Binding, unicode, str))
     if isinstance(syntax, (str, unicode)):
-        syntax = parse(syntax)
+        with measure('parse'):
+            syntax = parse(syntax)
+    addon = context.app.htsql
+    cache = active_cache().plans
+    key = None
+    literals = []
+    variables = []
+    if isinstance(syntax, Syntax) and cache.size:
+        with measure('cache'):
+            if addon.parameterize:
+                literals = find_literals(syntax)
+            variables = find_variables(environment)
+            key = get_key(syntax, literals, environment,
+                          limit, offset, batch, stream, variables)
+            entry = cache.get(key)
+            if entry is not None and entry[0] is None:
+                # The variables could not be replaced with parameters.
+                variables = []
+                key = get_key(syntax, literals, environment,
+                              limit, offset, batch, stream)
+                entry = cache.get(key)
+            if entry is not None and not matches(entry, literals):
+                # The plan was generated for different values of
+                # the literals that could not be replaced with parameters.
+                key = key+(tuple(literals[index].text
+                                 for index, text in entry[2]),)
+                entry = cache.get(key)
+            pipe = None
+            if entry is not None:
+                pipe = instantiate(entry, syntax, literals,
+                                   [environment[name].data
+                                    for name in variables])
+        if pipe is not None:
+            return pipe
+    slots = dict((name, len(literals)+index)
+                 for index, name in enumerate(variables))
+    try:
+        pipe, parameters = plan(syntax, environment, slots, literals,
+                                limit, offset, batch, stream)
+    except Error:
+        if not variables:
+            raise
+        # Some variables are used where a literal value is expected;
+        # remember it and embed the values into the plan.
+        cache.set(key, (None, (), ()))
+        variables = []
+        key = get_key(syntax, literals, environment,
+                      limit, offset, batch, stream)
+        pipe, parameters = plan(syntax, environment, None, literals,
+                                limit, offset, batch, stream)
+    if key is not None:
+        slots = sorted(parameters.items())
+        pins = [(index, literal.text)
+                for index, literal in enumerate(literals)
+                if index not in parameters]
+        entry = (pipe, tuple(slots), tuple(pins))
+        cache.set(key, entry)
+        pipe = instantiate(entry, syntax, literals,
+                           [environment[name].data for name in variables])
+    return pipe
+
+
+def plan(syntax, environment, slots, literals, limit, offset, batch, stream):
+    # Translates the query; returns the pipe and the query parameters
+    # generated in place of the literals.
+    addon = context.app.htsql
     if not isinstance(syntax, Binding):
-        binding = bind(syntax, environment=environment)
+        with measure('bind'):
+            binding = bind(syntax, environment=environment, slots=slots)
     else:
         binding = syntax
-    profile = decorate(binding)
-    flow = route(binding)
-    expression = encode(flow)
-    if limit is not None or offset is not None:
-        expression = safe_patch(expression, limit, offset)
-    expression = rewrite(expression)
-    term = compile(expression)
-    frame = assemble(term)
-    frame = reduce(frame)
-    raw_pipe = serialize(frame, batch=batch)
-    sql = get_sql(raw_pipe)
-    value_pipe = pack(flow, frame, profile.tag)
+    with measure('decorate'):
+        profile = decorate(binding)
+    with measure('route'):
+        flow = route(binding)
+    with measure('encode'):
+        state = EncodingState(literals)
+        expression = encode(flow, state)
+        if limit is not None or offset is not None:
+            expression = safe_patch(expression, limit, offset)
+    with measure('rewrite'):
+        expression = rewrite(expression)
+    with measure('compile'):
+        term = compile(expression)
+    with measure('assemble'):
+        frame = assemble(term)
+    with measure('reduce'):
+        frame = reduce(frame)
+    with measure('serialize'):
+        raw_pipe = serialize(frame, batch=batch)
+        sql = get_sql(raw_pipe)
+        if stream is not None:
+            raw_pipe = stream_pipe(raw_pipe, stream)
+        elif addon.query_threads is not None:
+            raw_pipe = parallel_pipe(raw_pipe, addon.query_threads)
+    with measure('pack'):
+        value_pipe = pack(flow, frame, profile.tag)
     pipe = ComposePipe(raw_pipe, value_pipe)
     #print pipe
-    return ProducePipe(profile, pipe, sql=sql)
+    pipe = ProducePipe(profile, pipe, sql=sql)
+    return pipe, state.parameters
+
+
+def get_key(syntax, literals, environment, limit, offset, batch, stream,
+            variables=None):
+    # Generates the key of a query plan in the plan cache.  Values
+    # of environment variables are embedded into the plan, so the key
+    # includes both the domains and the values of the variables, except
+    # for `variables` which values are passed as query parameters.
+    # Literals that could be passed as query parameters are masked.
+    shape = None
+    if environment is not None:
+        shape = tuple((name, environment[name].domain,
+                       unicode(environment[name])
+                       if not variables or name not in variables else None)
+                      for name in sorted(environment))
+    text = unicode(syntax)
+    if literals:
+        blanks = dict((id(literal), StringSyntax(u""))
+                      for literal in literals)
+        text = (unicode(substitute(syntax, blanks)),
+                tuple(literal.__class__ for literal in literals))
+    return (text, shape, limit, offset, batch, stream)
+
+
+def find_variables(environment):
+    # Finds environment variables which values could be passed to
+    # the SQL query as parameters.  Only the variables listed in
+    # `context.env.parameter_names` are considered.
+    names = context.env.parameter_names
+    if not names or not environment:
+        return []
+    return [name for name in sorted(environment)
+            if name in names and
+                environment[name].data is not None and
+                isinstance(environment[name].domain,
+                           (TextDomain, NumberDomain, DateDomain, TimeDomain,
+                            DateTimeDomain))]
+
+
+def matches(entry, literals):
+    # Checks if the plan was generated for the same values of the pinned
+    # literals.
+    pipe, slots, pins = entry
+    return all(literals[index].text == text for index, text in pins)
+
+
+def instantiate(entry, syntax, literals, variables=None):
+    # Makes a pipe from a cached plan and the values of query parameters.
+    # The parameters for the literals are followed by the values of
+    # `variables`.  Returns `None` if a literal could not be converted
+    # to a parameter value; the caller is expected to translate the query
+    # from scratch to report the error.
+    pipe, slots, pins = entry
+    if not slots and not variables:
+        return pipe
+    values = [None]*len(literals)
+    if variables:
+        values.extend(variables)
+    for index, domain in slots:
+        try:
+            values[index] = domain.parse(literals[index].text)
+        except ValueError:
+            return None
+        if values[index] is None:
+            return None
+    return ProducePipe(pipe.meta.clone(syntax=syntax),
+                       ComposePipe(ValuePipe(tuple(values)), pipe.data_pipe),
+                       **pipe.properties)
+
+
+def find_literals(syntax):
+    # Finds literals which values could be passed to the SQL query
+    # as parameters.  We only take right operands of comparison operators
+    # in filters along the main path of the query; such literals do not
+    # affect the headers of the output columns.
+    literals = []
+    conditions = []
+    queue = [syntax]
+    while queue:
+        syntax = queue.pop(0)
+        if isinstance(syntax, FilterSyntax):
+            queue.append(syntax.larm)
+            conditions.append(syntax.rarm)
+        elif isinstance(syntax, (CollectSyntax, GroupSyntax)):
+            queue.append(syntax.arm)
+        elif isinstance(syntax, (SelectSyntax, LocateSyntax)):
+            queue.append(syntax.larm)
+        elif isinstance(syntax, PipeSyntax) and not syntax.is_flow:
+            queue.append(syntax.larm)
+    while conditions:
+        syntax = conditions.pop(0)
+        if isinstance(syntax, OperatorSyntax):
+            if syntax.symbol in [u'&', u'|']:
+                conditions.extend([syntax.larm, syntax.rarm])
+            elif (syntax.symbol in [u'=', u'!=', u'<', u'<=', u'>', u'>=']
+                    and isinstance(syntax.rarm, (StringSyntax, NumberSyntax))
+                    and not isinstance(syntax.larm, LiteralSyntax)):
+                literals.append(syntax.rarm)
+        elif isinstance(syntax, PrefixSyntax) and syntax.symbol == u'!':
+            conditions.append(syntax.arm)
+        elif isinstance(syntax, GroupSyntax):
+            conditions.append(syntax.arm)
+    return literals
+
+
+def substitute(syntax, replacements):
+    # Rebuilds the syntax tree replacing the nodes given by the mapping
+    # `id(node) -> replacement`.
+    if id(syntax) in replacements:
+        return replacements[id(syntax)]
+    init_code = syntax.__init__.im_func.func_code
+    names = init_code.co_varnames[1:init_code.co_argcount]
+    arguments = {}
+    for name in names:
+        value = getattr(syntax, name)
+        if isinstance(value, Syntax):
+            arguments[name] = substitute(value, replacements)
+        elif isinstance(value, list):
+            arguments[name] = [substitute(item, replacements)
+                               if isinstance(item, Syntax) else item
+                               for item in value]
+    return syntax.clone(**arguments)
 
 
 def get_sql(pipe):
@@ -64,6 +277,33 @@ def get_sql(pipe):
             return u"\n\n".join(merged_sqls)
 
 
+def stream_pipe(pipe, size):
+    # Makes the pipe stream the rows of the top-level segment; nested
+    # segments are still fetched in full, before the streaming query
+    # starts, so that a request never holds two connections at once.
+    if isinstance(pipe, SQLPipe):
+        return StreamSQLPipe(pipe.sql, pipe.input_domains,
+                             pipe.output_domains, size, pipe.tables)
+    if isinstance(pipe, ComposePipe) and \
+            isinstance(pipe.left_pipe, RecordPipe):
+        feeds = pipe.left_pipe.field_pipes[:]
+        feeds[0] = stream_pipe(feeds[0], size)
+        left_pipe = StreamRecordPipe(feeds, pipe.left_pipe.record_class)
+        return pipe.clone(left_pipe=left_pipe)
+    return pipe
+
+
+def parallel_pipe(pipe, size):
+    # Makes the pipe execute the queries of the nested segments
+    # concurrently.
+    if isinstance(pipe, ComposePipe) and \
+            isinstance(pipe.left_pipe, RecordPipe):
+        left_pipe = ParallelRecordPipe(pipe.left_pipe.field_pipes, size,
+                                       pipe.left_pipe.record_class)
+        return pipe.clone(left_pipe=left_pipe)
+    return pipe
+
+
 def safe_patch(segment, limit, offset):
     space = segment.space
     if limit is not None:
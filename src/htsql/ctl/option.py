@@ -12,7 +12,8 @@ This module defines script options.
 
 
 from ..core.util import maybe
-from ..core.validator import Validator, StrVal, UIntVal, ExtensionVal
+from ..core.validator import (Validator, StrVal, UIntVal, PIntVal,
+        ExtensionVal)
 import re
 
 
@@ -195,6 +196,32 @@ PortOption = Option(
         default=8080,
         hint="""port to listen for incoming connections""")
 
+WorkersOption = Option(
+        attribute='workers',
+        long_name='--workers',
+        with_value=True,
+        value_name="n",
+        validator=PIntVal(),
+        hint="""handle requests in N worker processes""")
+
+ThreadsOption = Option(
+        attribute='threads',
+        long_name='--threads',
+        with_value=True,
+        value_name="n",
+        validator=PIntVal(),
+        default=16,
+        hint="""handle at most N connections at once""")
+
+KeepAliveOption = Option(
+        attribute='keep_alive',
+        long_name='--keep-alive',
+        with_value=True,
+        value_name="sec",
+        validator=UIntVal(),
+        default=15,
+        hint="""close idle connections after SEC seconds""")
+
 InputOption = Option(
         attribute='input',
         short_name='-i',
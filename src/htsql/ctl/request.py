@@ -347,15 +347,34 @@ class DBRoutine(Routine):
 
     # Path to the default configuration file.
     default_path = '~/.htsql/default.yaml'
+    # The database password entered by the user.
+    entered_password = None
 
     def run(self):
+        # Create the HTSQL application.
+        app = self.create_app()
+
+        # Run the routine-specific code.
+        self.start(app)
+
+    def create_app(self, *updates):
+        """
+        Creates an HTSQL application from the routine arguments
+        and configuration files.
+
+        `updates` (a list of dictionaries)
+            Addon parameters that override the configuration.
+        """
         # Determine HTSQL initialization parameters.
         parameters = [self.db]
+        parameters.extend(updates)
 
-        # Ask for the database password if necessary.
+        # Ask for the database password if necessary; the password
+        # is remembered in case the application is created again.
         if self.password:
-            password = getpass.getpass()
-            parameters.append({'htsql': {'password': password}})
+            if self.entered_password is None:
+                self.entered_password = getpass.getpass()
+            parameters.append({'htsql': {'password': self.entered_password}})
 
         # Load addon configuration.
         parameters.extend(self.extensions)
@@ -389,9 +408,7 @@ class DBRoutine(Routine):
             app = HTSQL(*parameters)
         except ImportError, exc:
             raise ScriptError("failed to construct application: %s" % exc)
-
-        # Run the routine-specific code.
-        self.start(app)
+        return app
 
     def start(self, app):
         # Override in subclasses.
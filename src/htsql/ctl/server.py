@@ -11,32 +11,274 @@ This module implements the `server` routine.
 """
 
 
-from .option import HostOption, PortOption, QuietOption
+from .error import ScriptError
+from .option import (HostOption, PortOption, QuietOption, WorkersOption,
+        ThreadsOption, KeepAliveOption)
 from .request import DBRoutine
+import os
+import sys
+import time
+import errno
+import signal
+import select
 import socket
-import SocketServer
+import threading
+import traceback
+import Queue
 import wsgiref.simple_server
 import binascii
 
 
-class HTSQLServer(SocketServer.ThreadingMixIn,
-                  wsgiref.simple_server.WSGIServer, object):
+class HTSQLServer(wsgiref.simple_server.WSGIServer, object):
     # We override `WSGIServer` to pass a `ServerRoutine` object to the
     # constructor.  The routine is used to get the server address
     # and to access the standard output stream.
-    # 
-    # Note: `HTSQLServer` inherits from `ThreadingMixIn` to handle each
-    # request in a separate thread; and from `object` to be able to
+    #
+    # Connections are handled by a bounded pool of threads, which
+    # are started on demand.  When all threads are busy, new
+    # connections wait in a queue.
+    #
+    # Note: `HTSQLServer` inherits from `object` to be able to
     # use `super()`.
 
     def __init__(self, routine):
         super(HTSQLServer, self).__init__((routine.host, routine.port),
                                           HTSQLRequestHandler)
         self.routine = routine
+        self.max_threads = routine.threads
+        self.threads = []
+        self.connections = Queue.Queue()
+
+    def process_request(self, request, client_address):
+        # Queue the connection and start a new thread if all threads
+        # are busy.
+        self.connections.put((request, client_address))
+        if (self.connections.unfinished_tasks > len(self.threads) and
+                len(self.threads) < self.max_threads):
+            thread = threading.Thread(target=self.process_connections)
+            thread.daemon = True
+            self.threads.append(thread)
+            thread.start()
+
+    def process_connections(self):
+        # Handles queued connections until the pool is stopped.
+        while True:
+            item = self.connections.get()
+            try:
+                if item is None:
+                    break
+                request, client_address = item
+                try:
+                    self.finish_request(request, client_address)
+                except:
+                    self.handle_error(request, client_address)
+                self.shutdown_request(request)
+            finally:
+                self.connections.task_done()
+
+    def stop_threads(self):
+        # Waits until the queued connections are handled and stops
+        # the threads.
+        for thread in self.threads:
+            self.connections.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+
+
+class HTSQLServerHandler(wsgiref.simple_server.ServerHandler):
+    # We override `ServerHandler` to support persistent connections.
+    # When the length of the response is not known in advance, the body
+    # is sent using chunked transfer encoding to HTTP/1.1 clients;
+    # otherwise the connection is closed after the response.
+
+    http_version = "1.1"
+    is_chunked = False
+    is_bodyless = False
+
+    def cleanup_headers(self):
+        wsgiref.simple_server.ServerHandler.cleanup_headers(self)
+        request_handler = self.request_handler
+        code = self.status.split(' ', 1)[0]
+        self.is_chunked = False
+        self.is_bodyless = (self.environ['REQUEST_METHOD'] == 'HEAD' or
+                            code.startswith('1') or code in ('204', '304'))
+        if 'Content-Length' not in self.headers and not self.is_bodyless:
+            if request_handler.request_version == 'HTTP/1.1':
+                self.headers['Transfer-Encoding'] = 'chunked'
+                self.is_chunked = True
+            else:
+                request_handler.close_connection = True
+        if request_handler.close_connection:
+            self.headers['Connection'] = 'close'
+        elif request_handler.request_version != 'HTTP/1.1':
+            self.headers['Connection'] = 'keep-alive'
+
+    def write(self, data):
+        # Same as `BaseHandler.write()`, but encodes the data with chunked
+        # transfer encoding if necessary.
+        assert isinstance(data, str), "write() argument must be string"
+        if not self.status:
+            raise AssertionError("write() before start_response()")
+        elif not self.headers_sent:
+            self.bytes_sent = len(data)
+            self.send_headers()
+        else:
+            self.bytes_sent += len(data)
+        if self.is_bodyless or not data:
+            return
+        if self.is_chunked:
+            data = "%x\r\n%s\r\n" % (len(data), data)
+        self._write(data)
+        self._flush()
+
+    def finish_content(self):
+        wsgiref.simple_server.ServerHandler.finish_content(self)
+        if self.is_chunked:
+            self._write("0\r\n\r\n")
+            self._flush()
+
+    def handle_error(self):
+        # The response may be incomplete, so the connection could not
+        # be reused.
+        self.request_handler.close_connection = True
+        wsgiref.simple_server.ServerHandler.handle_error(self)
+
+
+class RequestBody(object):
+    # Restricts reading of the request body to `CONTENT_LENGTH` bytes,
+    # so that the next request on the connection could be read.
+
+    def __init__(self, stream, length):
+        self.stream = stream
+        self.length = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.length:
+            size = self.length
+        data = self.stream.read(size)
+        self.length -= len(data)
+        return data
+
+    def readline(self, size=-1):
+        if size < 0 or size > self.length:
+            size = self.length
+        data = self.stream.readline(size)
+        self.length -= len(data)
+        return data
+
+    def readlines(self, hint=-1):
+        return list(self)
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                break
+            yield line
+
+    def drain(self):
+        # Skips the unread part of the body.
+        while self.length > 0:
+            if not self.read(65536):
+                break
 
 
 class HTSQLRequestHandler(wsgiref.simple_server.WSGIRequestHandler):
-    # We override `WSGIRequestHandler` to customize logging.
+    # We override `WSGIRequestHandler` to customize logging and to keep
+    # the connection open between requests.
+
+    protocol_version = "HTTP/1.1"
+
+    # The number of seconds to wait for the client to send the first
+    # request and to read or write any piece of a request.
+    request_timeout = 30
+    # How often an idle connection checks if other connections wait
+    # for a thread.
+    poll_interval = 0.1
+
+    def setup(self):
+        self.timeout = self.request_timeout
+        wsgiref.simple_server.WSGIRequestHandler.setup(self)
+
+    def handle(self):
+        # Handle requests until the connection is closed.  The first
+        # request on a connection is always served; the socket timeout
+        # limits how long we wait for it.
+        self.close_connection = True
+        self.handle_one_request()
+        while not self.close_connection:
+            # Close the connection if no request arrives in the given
+            # number of seconds.
+            if not self.wait_for_request(self.server.routine.keep_alive):
+                self.close_connection = True
+                break
+            self.handle_one_request()
+
+    def wait_for_request(self, timeout):
+        # Waits until the client sends the next request; returns `False`
+        # if the connection should be closed.  An idle connection gives
+        # up its thread when other connections wait in the queue, but
+        # only if no input is pending on the socket.
+        deadline = time.time()+timeout
+        delay = 0
+        while not self.has_buffered_input():
+            try:
+                ready = select.select([self.connection], [], [], delay)[0]
+            except (select.error, socket.error):
+                return False
+            if ready:
+                return True
+            if self.server.connections.qsize() > 0:
+                return False
+            remaining = deadline-time.time()
+            if remaining <= 0:
+                return False
+            delay = min(remaining, self.poll_interval)
+        return True
+
+    def has_buffered_input(self):
+        # Checks if the next request has already been read into
+        # the buffer of `rfile`, which `select()` cannot detect.
+        buffer = getattr(self.rfile, '_rbuf', None)
+        return (buffer is not None and buffer.tell() > 0)
+
+    def handle_one_request(self):
+        try:
+            self.raw_requestline = self.rfile.readline(65537)
+        except socket.timeout:
+            self.close_connection = True
+            return
+        if not self.raw_requestline:
+            self.close_connection = True
+            return
+        if len(self.raw_requestline) > 65536:
+            self.requestline = ''
+            self.request_version = ''
+            self.command = ''
+            self.send_error(414)
+            self.close_connection = True
+            return
+        if not self.parse_request():
+            self.close_connection = True
+            return
+        if not self.server.routine.keep_alive:
+            self.close_connection = True
+        # We cannot find the end of a request body without a length.
+        if self.headers.getheader('transfer-encoding'):
+            self.close_connection = True
+        try:
+            length = int(self.headers.getheader('content-length') or 0)
+        except ValueError:
+            length = 0
+            self.close_connection = True
+        body = RequestBody(self.rfile, max(length, 0))
+        handler = HTSQLServerHandler(body, self.wfile, self.get_stderr(),
+                                     self.get_environ())
+        handler.request_handler = self
+        handler.run(self.server.get_app())
+        if not self.close_connection:
+            body.drain()
 
     def get_stderr(self):
         # Returns a stream suitable for dumping logs and tracebacks.
@@ -76,6 +318,178 @@ class HTSQLRequestHandler(wsgiref.simple_server.WSGIRequestHandler):
         stderr.flush()
 
 
+class WorkerSupervisor(object):
+    # Runs a fixed number of worker processes handling requests on
+    # the listening socket of the server.  The application is created
+    # in the supervisor process and shared by the workers.
+    #
+    # Workers that die are restarted.  On `SIGHUP`, the supervisor
+    # creates a new application, starts new workers and lets the old
+    # workers finish the requests they are handling.  On `SIGTERM` or
+    # `SIGINT`, all workers are stopped gracefully.
+
+    # How often to check the state of the workers, in seconds.
+    poll_interval = 0.5
+    # If a worker dies within this interval after start, the next
+    # worker is started with a delay.
+    min_lifetime = 1.0
+
+    def __init__(self, routine, httpd):
+        self.routine = routine
+        self.httpd = httpd
+        # A mapping: PID -> start time of running workers.
+        self.workers = {}
+        # Workers being stopped.
+        self.retired = set()
+        # Received signals.
+        self.signals = []
+        # Do not start new workers until this time.
+        self.delay_until = 0.0
+
+    def run(self):
+        if not hasattr(os, 'fork'):
+            raise ScriptError("worker processes are not supported"
+                              " on this platform")
+        handlers = {}
+        for signum in [signal.SIGTERM, signal.SIGINT, signal.SIGHUP]:
+            handlers[signum] = signal.signal(signum, self.notify)
+        try:
+            self.spawn()
+            while True:
+                while self.signals:
+                    signum = self.signals.pop(0)
+                    if signum == signal.SIGHUP:
+                        self.reload()
+                    else:
+                        self.stop()
+                        return
+                self.reap()
+                self.spawn()
+                time.sleep(self.poll_interval)
+        finally:
+            for signum in sorted(handlers):
+                signal.signal(signum, handlers[signum])
+
+    def notify(self, signum, frame):
+        # Handles a signal; the supervisor processes it in the main loop.
+        self.signals.append(signum)
+
+    def log(self, message):
+        if not self.routine.quiet:
+            self.routine.ctl.out(message)
+
+    def spawn(self):
+        # Starts missing workers.
+        while (len(self.workers) < self.routine.workers and
+                    time.time() >= self.delay_until):
+            pid = os.fork()
+            if pid == 0:
+                status = 0
+                try:
+                    self.serve()
+                except:
+                    traceback.print_exc(file=sys.stderr)
+                    status = 1
+                os._exit(status)
+            self.workers[pid] = time.time()
+
+    def reap(self):
+        # Collects exited workers.
+        while self.workers or self.retired:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except OSError, exc:
+                if exc.errno == errno.EINTR:
+                    continue
+                if exc.errno == errno.ECHILD:
+                    break
+                raise
+            if pid == 0:
+                break
+            if pid in self.retired:
+                self.retired.remove(pid)
+                continue
+            start = self.workers.pop(pid, None)
+            if start is None:
+                continue
+            self.log("Worker %s exited with status %s; restarting"
+                     % (pid, status))
+            if time.time()-start < self.min_lifetime:
+                self.delay_until = time.time()+self.min_lifetime
+
+    def reload(self):
+        # Replaces the workers with workers running a new application.
+        self.log("Reloading the application")
+        try:
+            app = self.routine.create_app()
+        except ScriptError, exc:
+            self.routine.ctl.err("Failed to reload the application: %s"
+                                 % exc)
+            return
+        self.httpd.set_app(app)
+        workers = self.workers
+        self.workers = {}
+        self.delay_until = 0.0
+        self.spawn()
+        for pid in sorted(workers):
+            self.kill(pid)
+            self.retired.add(pid)
+
+    def stop(self):
+        # Stops all workers and waits until they exit.
+        pids = set(self.workers) | self.retired
+        for pid in sorted(pids):
+            self.kill(pid)
+        while pids:
+            try:
+                pid, status = os.waitpid(-1, 0)
+            except OSError, exc:
+                if exc.errno == errno.EINTR:
+                    continue
+                if exc.errno == errno.ECHILD:
+                    break
+                raise
+            pids.discard(pid)
+        self.workers = {}
+        self.retired = set()
+
+    def kill(self, pid):
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except OSError, exc:
+            if exc.errno != errno.ESRCH:
+                raise
+
+    def serve(self):
+        # Handles requests in a worker process until the worker is
+        # asked to stop or the supervisor dies.
+        stopped = []
+        signal.signal(signal.SIGTERM,
+                      (lambda signum, frame: stopped.append(signum)))
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        supervisor = os.getppid()
+        httpd = self.httpd
+        while not stopped and os.getppid() == supervisor:
+            try:
+                readable, writable, errors = \
+                        select.select([httpd], [], [], self.poll_interval)
+            except select.error, exc:
+                if exc.args[0] == errno.EINTR:
+                    continue
+                raise
+            # Another worker may accept the connection first; then
+            # `accept()` blocks until the next one or a signal.
+            if readable:
+                httpd._handle_request_noblock()
+        # Let the requests being handled complete.
+        httpd.stop_threads()
+        current_thread = threading.current_thread()
+        for thread in threading.enumerate():
+            if thread is not current_thread and not thread.daemon:
+                thread.join()
+
+
 class ServerRoutine(DBRoutine):
     """
     Implements the `server` routine.
@@ -90,6 +504,9 @@ class ServerRoutine(DBRoutine):
             HostOption,
             PortOption,
             QuietOption,
+            WorkersOption,
+            ThreadsOption,
+            KeepAliveOption,
     ]
     hint = """start an HTTP server handling HTSQL requests"""
     help = """
@@ -119,6 +536,21 @@ class ServerRoutine(DBRoutine):
 
     The HTTP logs are dumped to the standard output in the Apache Common Log
     Format.  Use option `--quiet` to suppress the logs.
+
+    The server keeps HTTP connections open for subsequent requests.
+    Use option `--keep-alive` to set the number of seconds an idle
+    connection is kept open (the default is 15); 0 disables persistent
+    connections.  Connections are handled by a pool of threads; use
+    option `--threads` to set the size of the pool (the default is 16).
+    When all threads are busy, idle connections are closed to serve
+    the waiting ones.
+
+    By default, the server handles requests in a single process.  Use
+    option `--workers` to handle requests in the given number of worker
+    processes.  In this mode, the database is introspected once before
+    the workers are started, and workers that exit unexpectedly are
+    restarted.  Send `SIGHUP` to the server process to reload the
+    configuration and replace the workers gracefully.
     """
 
     def start(self, app):
@@ -133,6 +565,10 @@ class ServerRoutine(DBRoutine):
                          % (host, self.port, app.htsql.db.database))
 
         # Start the server.
-        httpd.serve_forever()
+        if self.workers is None:
+            httpd.serve_forever()
+        else:
+            supervisor = WorkerSupervisor(self, httpd)
+            supervisor.run()
 
 
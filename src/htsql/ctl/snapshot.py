@@ -0,0 +1,87 @@
+#
+# Copyright (c) 2006-2013, Prometheus Research, LLC
+#
+
+
+"""
+:mod:`htsql.ctl.snapshot`
+=========================
+
+This module implements the `snapshot` routine.
+"""
+
+
+from .error import ScriptError
+from .option import OutputOption, QuietOption
+from .request import DBRoutine
+from ..core.error import Error
+from ..core.introspect import (Introspect, fingerprint, load_snapshot,
+        save_snapshot)
+
+
+class SnapshotRoutine(DBRoutine):
+    """
+    Implements the `snapshot` routine.
+
+    The routine introspects the database and saves the catalog
+    to a snapshot file.
+    """
+
+    name = 'snapshot'
+    options = DBRoutine.options + [
+            OutputOption,
+            QuietOption,
+    ]
+    hint = """save the database catalog to a snapshot file"""
+    help = """
+    The routine introspects the database and saves the catalog to
+    a snapshot file, which an HTSQL application loads on startup
+    instead of introspecting the database.
+
+    The DB argument specifies database connection parameters.
+
+    The snapshot is written to the file specified by the `--output`
+    option or, if the option is omitted, by the `catalog_snapshot`
+    parameter of the `htsql` addon.  The application must be configured
+    with the same set of addons as the one that loads the snapshot.
+
+    Not every database backend supports snapshots: the snapshot
+    is only used if the backend can detect changes in the database
+    schema.
+    """
+
+    def run(self):
+        # The application saves the snapshot when it is created, so
+        # we point it to the output file.  Warming up is not needed.
+        updates = {'warmup': False}
+        if self.output is not None:
+            updates['catalog_snapshot'] = self.output
+        app = self.create_app({'htsql': updates})
+        self.start(app)
+
+    def start(self, app):
+        path = app.htsql.catalog_snapshot
+        if path is None:
+            raise ScriptError("snapshot file is not specified")
+        with app:
+            try:
+                value = fingerprint()
+                if value is None:
+                    raise ScriptError("%s database does not support"
+                                      " snapshots" % app.htsql.db.engine)
+                # The application could fail to save the snapshot, or
+                # the schema could change after it was introspected.
+                if load_snapshot(path, value) is None:
+                    catalog = Introspect.__invoke__()
+                    catalog.freeze()
+                    try:
+                        save_snapshot(path, catalog, value)
+                    except (IOError, OSError), exc:
+                        raise ScriptError("failed to write snapshot: %s"
+                                          % exc)
+            except Error, exc:
+                raise ScriptError("failed to introspect the database: %s"
+                                  % exc)
+        if not self.quiet:
+            self.ctl.out("Saved the catalog of %s to %s"
+                         % (app.htsql.db.database, path))
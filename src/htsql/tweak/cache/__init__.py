@@ -0,0 +1,86 @@
+#
+# Copyright (c) 2006-2013, Prometheus Research, LLC
+#
+
+
+from . import act, connect
+from ...core.addon import Addon, Parameter, Variable
+from ...core.validator import UIntVal, PIntVal, SeqVal, RecordVal, StrVal
+from .cache import ResultCache
+import re
+
+
+class TweakCacheAddon(Addon):
+
+    name = 'tweak.cache'
+    hint = """cache results of read queries"""
+    help = """
+    This addon keeps results of read queries in memory, so that
+    repeated queries are answered without accessing the database.
+    Queries executed within a transaction are never cached.
+
+    Parameter `max_size` limits the number of cached results; when
+    the cache is full, the least recently used result is discarded.
+
+    Parameter `ttl` is the number of seconds a result is kept
+    (the default is 60).  Parameter `rules` sets the time for
+    specific queries; it is a list of entries with fields `pattern`,
+    a regular expression matched against the query, and `ttl`.
+    The first matching rule applies; `ttl` of 0 disables caching
+    of the query.
+
+    Results that depend on a table are discarded when the table
+    is changed with ETL commands `insert`, `update`, `merge`,
+    `delete`, `truncate`, `copy` and `clone`.  Changes made
+    to the database by other means are visible only after the
+    results expire.
+
+    The cache belongs to a single process.  When requests are
+    served by several processes, for instance, by `htsql-ctl
+    server --workers`, changes made with ETL commands in one
+    process are visible to the other processes only after their
+    results expire; choose `ttl` accordingly.
+    """
+
+    parameters = [
+            Parameter('max_size', PIntVal(), default=1024,
+                      value_name="""size""",
+                      hint="""number of cached results (default: 1024)"""),
+            Parameter('ttl', UIntVal(), default=60,
+                      value_name="""sec""",
+                      hint="""time to keep results (default: 60)"""),
+            Parameter('rules', SeqVal(RecordVal([
+                            ('pattern', StrVal()),
+                            ('ttl', UIntVal())])),
+                      default=[],
+                      hint="""time to keep results of specific queries"""),
+    ]
+
+    variables = [
+            Variable('cache_writes'),
+    ]
+
+    def __init__(self, app, attributes):
+        super(TweakCacheAddon, self).__init__(app, attributes)
+        self.cache = ResultCache(self.max_size)
+        self.rule_regexps = []
+
+    def validate(self):
+        for rule in self.rules:
+            try:
+                regexp = re.compile(rule.pattern, re.U)
+            except re.error, exc:
+                raise ValueError("invalid pattern %r: %s"
+                                 % (rule.pattern, exc))
+            self.rule_regexps.append((regexp, rule.ttl))
+
+    def get_ttl(self, query):
+        """
+        Returns the number of seconds to keep results of the query.
+        """
+        for regexp, ttl in self.rule_regexps:
+            if regexp.search(query):
+                return ttl
+        return self.ttl
+
+
@@ -0,0 +1,96 @@
+#
+# Copyright (c) 2006-2013, Prometheus Research, LLC
+#
+
+
+from ...core.context import context
+from ...core.cmd.act import SafeProduceAction
+from ...core.cmd.fetch import ProduceFetch
+from ...core.syn.syntax import Syntax
+from ...core.tr.translate import translate, get_key
+from ...core.tr.pipe import (ComposePipe, ProducePipe, RecordPipe,
+        ParallelRecordPipe, SQLPipe, BatchSQLPipe, StreamSQLPipe)
+from ..etl.cmd.insert import BuildExtractNode
+from ..etl.cmd.truncate import ProduceTruncate
+from .cache import table_name
+
+
+class CacheProduceFetch(ProduceFetch):
+
+    def __call__(self):
+        addon = context.app.tweak.cache
+        syntax = self.command.syntax
+        # Batched output is spilled to temporary files and results
+        # read within a transaction may see uncommitted changes,
+        # so neither is cached.
+        if (self.action.batch is not None or
+                context.env.connection is not None or
+                not context.env.can_read or
+                not isinstance(syntax, Syntax)):
+            return super(CacheProduceFetch, self).__call__()
+        ttl = addon.get_ttl(unicode(syntax))
+        if not ttl:
+            return super(CacheProduceFetch, self).__call__()
+        limit = None
+        offset = None
+        if isinstance(self.action, SafeProduceAction):
+            limit = self.action.cut
+            offset = self.action.offset
+        environment = self.action.environment
+        key = get_key(syntax, [], environment, limit, offset, None, None)
+        product = addon.cache.get(key)
+        if product is not None:
+            return product
+        # The cached result is kept in memory, so the rows are not
+        # streamed even if requested.
+        pipe = translate(syntax, environment, limit=limit, offset=offset)
+        snapshot = addon.cache.snapshot(table_name(table)
+                                        for table in find_tables(pipe))
+        product = pipe()(None)
+        addon.cache.set(key, product, snapshot, ttl)
+        return product
+
+
+def find_tables(pipe):
+    # Lists the tables read by the SQL statements of the pipe.
+    tables = []
+    if isinstance(pipe, (SQLPipe, BatchSQLPipe, StreamSQLPipe)):
+        tables.extend(pipe.tables or [])
+    elif isinstance(pipe, ProducePipe):
+        tables.extend(find_tables(pipe.data_pipe))
+    elif isinstance(pipe, ComposePipe):
+        tables.extend(find_tables(pipe.left_pipe))
+        tables.extend(find_tables(pipe.right_pipe))
+    elif isinstance(pipe, (RecordPipe, ParallelRecordPipe)):
+        for field_pipe in pipe.field_pipes:
+            tables.extend(find_tables(field_pipe))
+    return tables
+
+
+def invalidate(table):
+    # Marks cached results that depend on the table as stale.  Since
+    # the change is not visible to other connections until the
+    # transaction is committed, the table is invalidated again on
+    # commit.
+    context.app.tweak.cache.cache.invalidate([table_name(table)])
+    writes = context.env.cache_writes
+    if writes is not None:
+        writes.add(table_name(table))
+
+
+class CacheBuildExtractNode(BuildExtractNode):
+
+    def __call__(self):
+        pipe = super(CacheBuildExtractNode, self).__call__()
+        invalidate(pipe.node.table)
+        return pipe
+
+
+class CacheProduceTruncate(ProduceTruncate):
+
+    def __call__(self):
+        product = super(CacheProduceTruncate, self).__call__()
+        invalidate(self.command.table)
+        return product
+
+
@@ -0,0 +1,115 @@
+#
+# Copyright (c) 2006-2013, Prometheus Research, LLC
+#
+
+
+from ...core.cache import LRUCache
+import threading
+import time
+
+
+class ResultCache(object):
+    """
+    Keeps results of read queries.
+
+    `size` (an integer)
+        The maximum number of cached results.
+
+    Each result is stored together with the generations of the tables
+    read by the query; writing to a table increments its generation,
+    which makes all results that depend on the table stale.
+    """
+
+    def __init__(self, size):
+        self.entries = LRUCache(size)
+        self.lock = threading.Lock()
+        # A mapping: (schema name, table name) -> generation.
+        self.generations = {}
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def snapshot(self, tables):
+        """
+        Returns the current generations of the given tables.
+        """
+        with self.lock:
+            return tuple((name, self.generations.get(name, 0))
+                         for name in sorted(set(tables)))
+
+    def get(self, key):
+        """
+        Returns a cached result or ``None`` if the result is missing,
+        expired or depends on a table that has been changed.
+        """
+        entry = self.entries.get(key)
+        with self.lock:
+            if entry is not None:
+                value, snapshot, expires = entry
+                if expires <= time.time():
+                    self.expirations += 1
+                    entry = None
+                else:
+                    for name, generation in snapshot:
+                        if self.generations.get(name, 0) != generation:
+                            entry = None
+                            break
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return value
+
+    def set(self, key, value, snapshot, ttl):
+        """
+        Adds a result to the cache.
+
+        `snapshot`
+            The generations of the tables read by the query taken
+            *before* the query was executed.
+
+        `ttl` (an integer)
+            The number of seconds the result is valid.
+        """
+        self.entries.set(key, (value, snapshot, time.time()+ttl))
+
+    def invalidate(self, tables):
+        """
+        Marks results that depend on any of the given tables as stale.
+        """
+        tables = set(tables)
+        if not tables:
+            return
+        with self.lock:
+            for name in tables:
+                self.generations[name] = self.generations.get(name, 0)+1
+            self.invalidations += 1
+
+    def clear(self):
+        """
+        Removes all results from the cache.
+        """
+        self.entries.clear()
+
+    def stats(self):
+        """
+        Returns a dictionary with the cache statistics.
+        """
+        stats = self.entries.stats()
+        with self.lock:
+            stats.update({
+                    'hits': self.hits,
+                    'misses': self.misses,
+                    'expirations': self.expirations,
+                    'invalidations': self.invalidations,
+            })
+        return stats
+
+
+def table_name(table):
+    # The key identifying a table; table entities are recreated when
+    # the catalog is refreshed, so we identify tables by name.
+    return (table.schema.name, table.name)
+
+
@@ -0,0 +1,47 @@
+#
+# Copyright (c) 2006-2013, Prometheus Research, LLC
+#
+
+
+from ...core.adapter import rank
+from ...core.context import context
+from ...core.connect import Transact
+
+
+class CacheTransact(Transact):
+
+    rank(1.0) # wrap transactions of other addons
+
+    def __call__(self):
+        guard = super(CacheTransact, self).__call__()
+        return CacheTransactionGuard(guard)
+
+
+class CacheTransactionGuard(object):
+    # Collects the tables changed by the outermost transaction and
+    # invalidates them once the transaction is complete.
+
+    def __init__(self, guard):
+        self.guard = guard
+        self.is_nested = (context.env.cache_writes is not None)
+
+    def __enter__(self):
+        if not self.is_nested:
+            context.env.push(cache_writes=set())
+        try:
+            return self.guard.__enter__()
+        except:
+            if not self.is_nested:
+                context.env.pop()
+            raise
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        try:
+            return self.guard.__exit__(exc_type, exc_value, exc_traceback)
+        finally:
+            if not self.is_nested:
+                writes = context.env.cache_writes
+                context.env.pop()
+                context.app.tweak.cache.cache.invalidate(writes)
+
+
@@ -4,13 +4,23 @@
 
 
 from ...core.adapter import Protocol, rank, call
-from ...core.introspect import Introspect
+from ...core.introspect import Introspect, Fingerprint
 from ...core.entity import make_catalog
 from ...core.domain import (BooleanDomain, IntegerDomain, FloatDomain,
                             DecimalDomain, TextDomain, DateDomain,
                             TimeDomain, DateTimeDomain, OpaqueDomain)
 
 
+class DjangoFingerprint(Fingerprint):
+
+    rank(1.0)
+
+    def __call__(self):
+        # The catalog is generated from the models, so the database
+        # fingerprint cannot tell when it is out of date.
+        return None
+
+
 class DjangoIntrospect(Introspect):
 
     rank(1.0)
@@ -0,0 +1,50 @@
+#
+# Copyright (c) 2006-2013, Prometheus Research, LLC
+#
+
+
+from . import wsgi
+from ...core.addon import Addon, Parameter
+from ...core.cache import LRUCache
+from ...core.validator import UIntVal, PIntVal
+
+
+class TweakETagAddon(Addon):
+
+    name = 'tweak.etag'
+    hint = """support conditional HTTP requests"""
+    help = """
+    This addon adds `ETag` and `Last-Modified` headers to query
+    output and responds with `304 Not Modified` when the client
+    already has the same output.  The entity tag is a checksum
+    of the output; to compute it, the output is generated in full
+    and kept in a temporary file before it is sent to the client.
+
+    When `tweak.cache` is enabled and `ttl` is set, the addon
+    remembers the tables read by the query and, for `ttl` seconds,
+    confirms a validator sent by the client without executing the
+    query as long as the tables are not changed with ETL commands.
+    Like `tweak.cache`, it only sees changes made by the same
+    process, so a client may be told its output is current when
+    the data was changed by another process or application.  By
+    default, `ttl` is 0 and the query is always executed.
+
+    Parameter `max_size` limits the number of remembered
+    validators.
+    """
+
+    parameters = [
+            Parameter('ttl', UIntVal(), default=0,
+                      value_name="""sec""",
+                      hint="""time to trust a validator (default: 0)"""),
+            Parameter('max_size', PIntVal(), default=1024,
+                      value_name="""size""",
+                      hint="""number of remembered validators"""
+                           """ (default: 1024)"""),
+    ]
+
+    def __init__(self, app, attributes):
+        super(TweakETagAddon, self).__init__(app, attributes)
+        self.validators = LRUCache(self.max_size)
+
+
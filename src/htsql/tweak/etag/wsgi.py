@@ -0,0 +1,161 @@
+#
+# Copyright (c) 2006-2013, Prometheus Research, LLC
+#
+
+
+from ...core.context import context
+from ...core.adapter import rank
+from ...core.error import Error
+from ...core.wsgi import WSGI
+from ...core.cmd.act import analyze
+from ...core.cmd.command import FormatCmd, DefaultCmd, FetchCmd
+from ...core.cmd.summon import recognize
+from ..cache.act import find_tables
+from ..cache.cache import table_name
+import email.utils
+import hashlib
+import tempfile
+import time
+
+
+class ETagWSGI(WSGI):
+
+    rank(16.0)
+
+    # Output larger than this is spooled to a temporary file.
+    spool_size = 1024*1024
+    # Request variables that may affect the output.
+    vary = ['HTTP_ACCEPT', 'HTTP_ACCEPT_ENCODING', 'REMOTE_USER']
+
+    def __call__(self):
+        addon = context.app.tweak.etag
+        if self.environ['REQUEST_METHOD'] != 'GET':
+            return super(ETagWSGI, self).__call__()
+        key = (self.request(),)+tuple(self.environ.get(name)
+                                      for name in self.vary)
+        # Check if the client has a valid copy of the output before
+        # executing the query.
+        entry = addon.validators.get(key)
+        if entry is not None:
+            etag, last_modified, tables, snapshot, expires = entry
+            generations = get_generations()
+            if (tables is not None and generations is not None and
+                    expires > time.time() and
+                    generations.snapshot(tables) == snapshot and
+                    self.is_fresh(etag, last_modified)):
+                return self.not_modified(etag, last_modified)
+        tables = None
+        snapshot = None
+        generations = get_generations()
+        if generations is not None and addon.ttl:
+            tables = self.find_tables()
+            if tables is not None:
+                snapshot = generations.snapshot(tables)
+        start_response = self.start_response
+        response = []
+        writes = []
+        def etag_start_response(status, headers, exc_info=None):
+            response[:] = [status, headers, exc_info]
+            return writes.append
+        self.start_response = etag_start_response
+        body = super(ETagWSGI, self).__call__()
+        status, headers, exc_info = response
+        if writes:
+            body = writes+list(body)
+        if (not status.startswith('200') or
+                any(header.lower() == 'etag' for header, value in headers)):
+            start_response(status, headers, exc_info)
+            return body
+        # Compute the validator over the whole output, keeping the output
+        # in a temporary file.
+        digest = hashlib.sha1()
+        spool = tempfile.SpooledTemporaryFile(self.spool_size)
+        try:
+            for chunk in body:
+                digest.update(chunk)
+                spool.write(chunk)
+        finally:
+            if hasattr(body, 'close'):
+                body.close()
+        etag = '"%s"' % digest.hexdigest()
+        last_modified = time.time()
+        if entry is not None and entry[0] == etag:
+            last_modified = entry[1]
+        addon.validators.set(key, (etag, last_modified, tables, snapshot,
+                                   time.time()+addon.ttl))
+        if self.is_fresh(etag, last_modified):
+            spool.close()
+            return self.not_modified(etag, last_modified)
+        headers = headers+[('ETag', etag),
+                           ('Last-Modified', format_date(last_modified))]
+        start_response(status, headers, exc_info)
+        spool.seek(0)
+        return read(spool)
+
+    def find_tables(self):
+        # Finds the tables read by the query; returns `None` if the query
+        # does not just fetch data.
+        try:
+            command = recognize(self.request())
+            while isinstance(command, FormatCmd):
+                command = command.feed
+            if not isinstance(command, (DefaultCmd, FetchCmd)):
+                return None
+            pipe = analyze(command)
+        except Error:
+            return None
+        return [table_name(table) for table in find_tables(pipe)]
+
+    def is_fresh(self, etag, last_modified):
+        # Checks the validators sent by the client.
+        if_none_match = self.environ.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            tags = [tag[2:] if tag.startswith('W/') else tag
+                    for tag in tags]
+            return ('*' in tags or etag in tags)
+        if_modified_since = self.environ.get('HTTP_IF_MODIFIED_SINCE')
+        if if_modified_since is not None:
+            timestamp = parse_date(if_modified_since)
+            return (timestamp is not None and
+                    timestamp >= int(last_modified))
+        return False
+
+    def not_modified(self, etag, last_modified):
+        self.start_response("304 Not Modified",
+                            [('ETag', etag),
+                             ('Last-Modified', format_date(last_modified))])
+        return []
+
+
+def get_generations():
+    # Returns the table change counters maintained by `tweak.cache`.
+    cache = getattr(context.app.tweak, 'cache', None)
+    if cache is None:
+        return None
+    return cache.cache
+
+
+def format_date(timestamp):
+    return email.utils.formatdate(timestamp, usegmt=True)
+
+
+def parse_date(value):
+    value = email.utils.parsedate_tz(value)
+    if value is None:
+        return None
+    return email.utils.mktime_tz(value)
+
+
+def read(spool):
+    # Generates the output from the temporary file.
+    try:
+        while True:
+            chunk = spool.read(65536)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        spool.close()
+
+
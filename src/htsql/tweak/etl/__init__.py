@@ -15,7 +15,11 @@ class TweakETLAddon(Addon):
     help = """
     The extension provides the following commands:
 
-    `insert(feed)` adds records to a table.
+    `insert(feed)` adds records to a table.  When the values of
+    the key columns are given, records are inserted in chunks
+    of `insert_limit` rows; set it to `null` to insert one
+    record at a time.  Links to other tables are resolved in
+    chunks too; up to `link_cache_size` resolved links are reused.
 
     `copy(feed)` adds records to a table chunking the input.
 
@@ -35,6 +39,12 @@ class TweakETLAddon(Addon):
     parameters = [
             Parameter('copy_limit', PIntVal(is_nullable=True), default=10000,
                       hint="""chunk size for copy (default: 10000)"""),
+            Parameter('insert_limit', PIntVal(is_nullable=True), default=1000,
+                      value_name="""size""",
+                      hint="""chunk size for insert (default: 1000)"""),
+            Parameter('link_cache_size', PIntVal(is_nullable=True),
+                      default=10000, value_name="""size""",
+                      hint="""number of cached links (default: 10000)"""),
     ]
 
     @classmethod
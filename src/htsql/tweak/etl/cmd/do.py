@@ -4,6 +4,7 @@
 
 
 from ....core.adapter import Adapter, adapt
+from ....core.context import context
 from ....core.connect import transaction
 from ....core.domain import IdentityDomain
 from ....core.cmd.command import DefaultCmd
@@ -20,12 +21,18 @@ class ProduceDo(Act):
     def __call__(self):
         environment = self.action.environment.copy()
         product = None
+        # Within a loop, the references are passed to the queries
+        # as parameters, like the loop variable.
+        names = context.env.parameter_names
         with transaction():
             for reference, command in self.command.blocks:
                 action = self.action.clone(environment=environment)
-                product = act(command, action)
+                with context.env(parameter_names=names):
+                    product = act(command, action)
                 if reference is not None:
                     environment[reference] = product
+                    if names:
+                        names |= frozenset([reference])
         return product
 
 
@@ -4,6 +4,7 @@
 
 
 from ....core.adapter import adapt
+from ....core.context import context
 from ....core.error import Error, act_guard
 from ....core.connect import transaction
 from ....core.domain import UntypedDomain, ListDomain, RecordDomain, Value, Product
@@ -37,20 +38,27 @@ class ProduceFor(Act):
                             Value(field.domain, item)
                             for field, item
                                 in zip(input.domain.fields, input.data)]
-                for value in values:
-                    environment = self.action.environment.copy()
-                    environment[self.command.name] = value
-                    action = self.action.clone(environment=environment)
-                    product = act(self.command.body, action)
-                    data = product.data
-                    if data is not None:
-                        if meta is None:
-                            meta = product.meta
-                        elif product.domain != meta.domain:
-                            raise Error("Unexpected loop body type",
-                                        " expected %s; got %s"
-                                        % (meta.domain, product.domain))
-                        output.append(data)
+                # Pass the loop variable to the queries of the body as
+                # a query parameter so that the queries are translated
+                # once for all iterations.
+                names = frozenset([self.command.name])
+                if context.env.parameter_names:
+                    names |= context.env.parameter_names
+                with context.env(parameter_names=names):
+                    for value in values:
+                        environment = self.action.environment.copy()
+                        environment[self.command.name] = value
+                        action = self.action.clone(environment=environment)
+                        product = act(self.command.body, action)
+                        data = product.data
+                        if data is not None:
+                            if meta is None:
+                                meta = product.meta
+                            elif product.domain != meta.domain:
+                                raise Error("Unexpected loop body type",
+                                            " expected %s; got %s"
+                                            % (meta.domain, product.domain))
+                            output.append(data)
         if meta is None:
             meta = decorate(VoidBinding())
             meta = meta.clone(domain=UntypedDomain())
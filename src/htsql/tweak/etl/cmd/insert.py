@@ -7,6 +7,7 @@ from ....core.util import listof
 from ....core.adapter import Utility, Adapter, adapt, adapt_many
 from ....core.error import Error, PermissionError
 from ....core.context import context
+from ....core.cache import LRUCache
 from ....core.connect import transaction, scramble, unscramble
 from ....core.domain import (Domain, ListDomain, RecordDomain, BooleanDomain,
         IntegerDomain, FloatDomain, DecimalDomain, TextDomain, EnumDomain,
@@ -23,7 +24,8 @@ from ....core.syn.syntax import VoidSyntax, IdentifierSyntax
 from ....core.tr.binding import (VoidBinding, RootBinding, FormulaBinding,
         LocateBinding, SelectionBinding, SieveBinding, AliasBinding,
         CollectBinding, FreeTableRecipe, ColumnRecipe)
-from ....core.tr.signature import IsEqualSig, AndSig, PlaceholderSig
+from ....core.tr.signature import (IsEqualSig, IsInSig, AndSig, OrSig,
+        PlaceholderSig)
 from ....core.tr.decorate import decorate
 from ....core.tr.coerce import coerce
 from ....core.tr.lookup import identify
@@ -335,6 +337,12 @@ class ExtractTablePipe(object):
                for item, resolve in zip(row, self.resolves)]
         return tuple([extract(row) for extract in self.extracts])
 
+    def prefetch(self, rows):
+        # Resolves the links of a batch of rows in advance.
+        for idx, resolve in enumerate(self.resolves):
+            if resolve is not None and hasattr(resolve, 'prefetch'):
+                resolve.prefetch([row[idx] for row in rows])
+
 
 class BuildExtractTable(Utility):
 
@@ -362,6 +370,8 @@ class BuildExtractTable(Utility):
             elif isinstance(arc, ChainArc):
                 if self.with_cache:
                     resolve = BuildCacheChain.__invoke__(arc)
+                elif len(arc.joins) == 1:
+                    resolve = BuildBatchChain.__invoke__(arc)
                 else:
                     resolve = BuildResolveChain.__invoke__(arc)
                 resolves.append(resolve)
@@ -411,6 +421,24 @@ class ExecuteInsertPipe(object):
         return row
 
 
+def get_key_columns(table):
+    # Finds the columns that identify a table record.
+    key_columns = []
+    if table.primary_key is not None:
+        key_columns = table.primary_key.origin_columns
+    else:
+        for key in table.unique_keys:
+            if key.is_partial:
+                continue
+            if all(not column.is_nullable
+                   for column in key.origin_columns):
+                key_columns = key.origin_columns
+                break
+    if not key_columns:
+        raise Error("Table does not have a primary key")
+    return key_columns
+
+
 class BuildExecuteInsert(Utility):
 
     def __init__(self, table, columns):
@@ -420,22 +448,84 @@ class BuildExecuteInsert(Utility):
         self.columns = columns
 
     def __call__(self):
-        table = self.table
-        returning_columns = []
-        if table.primary_key is not None:
-            returning_columns = table.primary_key.origin_columns
-        else:
-            for key in table.unique_keys:
-                if key.is_partial:
-                    continue
-                if all(not column.is_nullable
-                       for column in key.origin_columns):
-                    returning_columns = key.origin_columns
-                    break
-        if not returning_columns:
-            raise Error("Table does not have a primary key")
-        sql = serialize_insert(table, self.columns, returning_columns)
-        return ExecuteInsertPipe(table, self.columns, returning_columns, sql)
+        returning_columns = get_key_columns(self.table)
+        sql = serialize_insert(self.table, self.columns, returning_columns)
+        return ExecuteInsertPipe(self.table, self.columns,
+                                 returning_columns, sql)
+
+
+class ExecuteInsertBatchPipe(object):
+    # Inserts a chunk of rows with a single multi-row `INSERT` statement.
+    # The database may return the keys in any order, so the key columns
+    # must be among the input columns; the returned keys are matched
+    # to the supplied values.
+
+    def __init__(self, table, input_columns, output_columns, size):
+        assert isinstance(table, TableEntity)
+        assert isinstance(input_columns, listof(ColumnEntity))
+        assert isinstance(output_columns, listof(ColumnEntity))
+        assert all(column in input_columns for column in output_columns)
+        assert isinstance(size, int) and size >= 1
+        self.table = table
+        self.input_columns = input_columns
+        self.output_columns = output_columns
+        self.size = size
+        self.key_indexes = [input_columns.index(column)
+                            for column in output_columns]
+        self.input_converts = [scramble(column.domain)
+                               for column in input_columns]
+        self.output_converts = [unscramble(column.domain)
+                                for column in output_columns]
+        self.sql_by_count = {}
+
+    def __call__(self, rows):
+        assert 1 <= len(rows) <= self.size
+        count = len(rows)
+        sql = self.sql_by_count.get(count)
+        if sql is None:
+            sql = serialize_insert(self.table, self.input_columns,
+                                   self.output_columns, count)
+            self.sql_by_count[count] = sql
+        parameters = tuple(convert(item)
+                           for row in rows
+                           for item, convert in zip(row, self.input_converts))
+        if not context.env.can_write:
+            raise PermissionError("No write permissions")
+        with transaction() as connection:
+            cursor = connection.cursor()
+            cursor.execute(sql.encode('utf-8'), parameters)
+            output_rows = cursor.fetchall()
+            if len(output_rows) != count:
+                raise Error("Failed to insert a batch of records")
+        keys = set(tuple(convert(item)
+                         for item, convert in zip(row, self.output_converts))
+                   for row in output_rows)
+        data = [tuple(row[index] for index in self.key_indexes)
+                for row in rows]
+        if len(keys) != count or not keys.issuperset(data):
+            raise Error("Failed to match the keys of inserted records")
+        return data
+
+
+class BuildExecuteInsertBatch(Utility):
+
+    # The maximum number of parameters in a single statement.
+    max_parameters = 32766
+
+    def __init__(self, table, columns, size):
+        assert isinstance(table, TableEntity)
+        assert isinstance(columns, listof(ColumnEntity)) and columns
+        assert isinstance(size, int) and size >= 1
+        self.table = table
+        self.columns = columns
+        self.size = size
+
+    def __call__(self):
+        returning_columns = get_key_columns(self.table)
+        width = max(len(self.columns), len(returning_columns))
+        size = max(1, min(self.size, self.max_parameters // width))
+        return ExecuteInsertBatchPipe(self.table, self.columns,
+                                      returning_columns, size)
 
 
 class ResolveIdentityPipe(object):
@@ -512,6 +602,107 @@ class BuildResolveIdentity(Utility):
         return ResolveIdentityPipe(profile, pipe)
 
 
+def match_batch(scope, bindings, count, syntax):
+    # Generates a condition that matches `bindings` against any of
+    # `count` rows of placeholders.
+    width = len(bindings)
+    if width == 1:
+        [binding] = bindings
+        placeholders = [FormulaBinding(scope, PlaceholderSig(idx),
+                                       binding.domain, syntax)
+                        for idx in range(count)]
+        return FormulaBinding(scope, IsInSig(+1), coerce(BooleanDomain()),
+                              syntax, lop=binding, rops=placeholders)
+    alternatives = []
+    for row_idx in range(count):
+        conditions = []
+        for idx, binding in enumerate(bindings):
+            placeholder = FormulaBinding(scope,
+                                         PlaceholderSig(row_idx*width+idx),
+                                         binding.domain, syntax)
+            conditions.append(FormulaBinding(scope, IsEqualSig(+1),
+                                             coerce(BooleanDomain()), syntax,
+                                             lop=binding, rop=placeholder))
+        alternatives.append(FormulaBinding(scope, AndSig(),
+                                           coerce(BooleanDomain()), syntax,
+                                           ops=conditions))
+    if len(alternatives) == 1:
+        return alternatives[0]
+    return FormulaBinding(scope, OrSig(), coerce(BooleanDomain()), syntax,
+                          ops=alternatives)
+
+
+class ResolveIdentityBatchPipe(object):
+    # Finds the identities of a chunk of records with a single query;
+    # a query is translated for each chunk size.
+
+    def __init__(self, table, columns):
+        assert isinstance(table, TableEntity)
+        assert isinstance(columns, listof(ColumnEntity))
+        self.table = table
+        self.columns = columns
+        self.pipe_by_count = {}
+
+    def __call__(self, rows):
+        count = len(rows)
+        pipe = self.pipe_by_count.get(count)
+        if pipe is None:
+            pipe = BuildResolveIdentityBatch.__invoke__(
+                    self.table, self.columns, count)
+            self.pipe_by_count[count] = pipe
+        raw_values = [item for row in rows for item in row]
+        product = pipe()(raw_values)
+        identity_by_key = {}
+        for row in product.data:
+            identity_by_key[tuple(row[1:])] = row[0]
+        data = []
+        for row in rows:
+            key = tuple(row)
+            if key not in identity_by_key:
+                raise Error("Unable to locate the inserted record")
+            data.append(identity_by_key[key])
+        return data
+
+
+class BuildResolveIdentityBatch(Utility):
+
+    def __init__(self, table, columns, count):
+        assert isinstance(table, TableEntity)
+        assert isinstance(columns, listof(ColumnEntity))
+        assert isinstance(count, int) and count >= 1
+        self.table = table
+        self.columns = columns
+        self.count = count
+
+    def __call__(self):
+        syntax = VoidSyntax()
+        scope = RootBinding(syntax)
+        state = BindingState(scope)
+        seed = state.use(FreeTableRecipe(self.table), syntax)
+        state.push_scope(seed)
+        column_bindings = [state.use(ColumnRecipe(column), syntax)
+                           for column in self.columns]
+        condition = match_batch(seed, column_bindings, self.count, syntax)
+        scope = SieveBinding(seed, condition, syntax)
+        state.pop_scope()
+        state.push_scope(scope)
+        recipe = identify(scope)
+        if recipe is None:
+            raise Error("Cannot determine table identity")
+        identity = state.use(recipe, syntax)
+        elements = [identity]
+        for column in self.columns:
+            elements.append(state.use(ColumnRecipe(column), syntax))
+        fields = [decorate(element) for element in elements]
+        domain = RecordDomain(fields)
+        scope = SelectionBinding(scope, elements, domain, syntax)
+        binding = Select.__invoke__(scope, state)
+        state.pop_scope()
+        domain = ListDomain(binding.domain)
+        binding = CollectBinding(state.root, binding, domain, syntax)
+        return translate(binding)
+
+
 class ResolveChainPipe(object):
 
     def __init__(self, name, columns, domain, pipe):
@@ -661,6 +852,181 @@ class BuildCacheChain(Utility):
         return CacheChainPipe(target_name, columns, domain, pipe)
 
 
+class BatchChainPipe(object):
+    # Resolves links in batches: the distinct values of a batch are
+    # looked up with a single query; resolved values are kept in
+    # a bounded cache.
+
+    # The maximum number of parameters in a single statement.
+    max_parameters = 32766
+
+    def __init__(self, name, arc, columns, domain, cache_size):
+        assert isinstance(columns, listof(ColumnEntity))
+        self.name = name
+        self.arc = arc
+        self.columns = columns
+        self.domain = domain
+        self.width = len(domain.leaves)
+        self.size = max(1, self.max_parameters // self.width)
+        self.cache = LRUCache(cache_size)
+        # Links of the current batch: value -> row or `None` if
+        # the link could not be resolved.
+        self.batch = {}
+        self.pipe_by_count = {}
+
+    def __call__(self, value):
+        if value is None:
+            return (None,)*len(self.columns)
+        if value in self.batch:
+            row = self.batch[value]
+        else:
+            row = self.cache.get(value)
+            if row is None:
+                row = self.resolve([value]).get(value)
+        if row is None:
+            quote = None
+            if self.name:
+                quote = u"%s[%s]" % (self.name, self.domain.dump(value))
+            else:
+                quote = u"[%s]" % self.domain.dump(value)
+            raise Error("Unable to resolve a link", quote)
+        return row
+
+    def prefetch(self, values):
+        self.batch = {}
+        missing = []
+        for value in set(values):
+            if value is None:
+                continue
+            row = self.cache.get(value)
+            if row is not None:
+                self.batch[value] = row
+            else:
+                missing.append(value)
+        for start in range(0, len(missing), self.size):
+            chunk = missing[start:start+self.size]
+            row_by_value = self.resolve(chunk)
+            for value in chunk:
+                self.batch[value] = row_by_value.get(value)
+
+    def resolve(self, values):
+        count = len(values)
+        pipe = self.pipe_by_count.get(count)
+        if pipe is None:
+            pipe = BuildResolveBatchChain.__invoke__(self.arc, count)
+            self.pipe_by_count[count] = pipe
+        raw_values = []
+        for value in values:
+            for leaf in self.domain.leaves:
+                raw_value = value
+                for idx in leaf:
+                    raw_value = raw_value[idx]
+                raw_values.append(raw_value)
+        product = pipe()(raw_values)
+        row_by_value = {}
+        for row in product.data:
+            row_by_value[row[0]] = row[1:]
+            self.cache.set(row[0], row[1:])
+        return row_by_value
+
+
+class BuildBatchChain(Utility):
+
+    def __init__(self, arc):
+        assert isinstance(arc, ChainArc) and len(arc.joins) == 1
+        self.arc = arc
+
+    def __call__(self):
+        target_labels = relabel(TableArc(self.arc.target.table))
+        target_name = target_labels[0].name if target_labels else None
+        [join] = self.arc.joins
+        syntax = VoidSyntax()
+        scope = RootBinding(syntax)
+        state = BindingState(scope)
+        seed = state.use(FreeTableRecipe(join.target), syntax)
+        recipe = identify(seed)
+        if recipe is None:
+            raise Error("Cannot determine identity of a link", target_name)
+        identity = state.use(recipe, syntax, scope=seed)
+        columns = join.origin_columns[:]
+        cache_size = context.app.tweak.etl.link_cache_size or 0
+        return BatchChainPipe(target_name, self.arc, columns,
+                              identity.domain, cache_size)
+
+
+class BuildResolveBatchChain(Utility):
+
+    def __init__(self, arc, count):
+        assert isinstance(arc, ChainArc) and len(arc.joins) == 1
+        assert isinstance(count, int) and count >= 1
+        self.arc = arc
+        self.count = count
+
+    def __call__(self):
+        [join] = self.arc.joins
+        syntax = VoidSyntax()
+        scope = RootBinding(syntax)
+        state = BindingState(scope)
+        seed = state.use(FreeTableRecipe(join.target), syntax)
+        recipe = identify(seed)
+        if recipe is None:
+            raise Error("Cannot determine identity of a link")
+        identity = state.use(recipe, syntax, scope=seed)
+        def make_leaves(identity):
+            leaves = []
+            for field in identity.elements:
+                if isinstance(field.domain, IdentityDomain):
+                    leaves.extend(make_leaves(field))
+                else:
+                    leaves.append(field)
+            return leaves
+        leaves = make_leaves(identity)
+        condition = match_batch(seed, leaves, self.count, syntax)
+        scope = SieveBinding(seed, condition, syntax)
+        state.push_scope(scope)
+        identity = state.use(identify(scope), syntax)
+        elements = [identity]
+        for column in join.target_columns:
+            elements.append(state.use(ColumnRecipe(column), syntax))
+        fields = [decorate(element) for element in elements]
+        domain = RecordDomain(fields)
+        scope = SelectionBinding(scope, elements, domain, syntax)
+        binding = Select.__invoke__(scope, state)
+        state.pop_scope()
+        domain = ListDomain(binding.domain)
+        binding = CollectBinding(state.root, binding, domain, syntax)
+        return translate(binding)
+
+
+class Savepoint(object):
+    # Marks a point in the current transaction to roll back to when
+    # a statement fails.  SQLite undoes a failed statement by itself;
+    # besides, its driver commits the transaction before executing
+    # a `SAVEPOINT` statement, so we do not issue one.
+
+    name = u"htsql_insert"
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.is_native = (context.app.htsql.db.engine != 'sqlite')
+        if self.is_native:
+            self.execute(u"SAVEPOINT %s" % self.name)
+
+    def execute(self, sql):
+        cursor = self.connection.cursor()
+        cursor.execute(sql.encode('utf-8'))
+        cursor.close()
+
+    def rollback(self):
+        if self.is_native:
+            self.execute(u"ROLLBACK TO SAVEPOINT %s" % self.name)
+            self.release()
+
+    def release(self):
+        if self.is_native:
+            self.execute(u"RELEASE SAVEPOINT %s" % self.name)
+
+
 class ProduceInsert(Act):
 
     adapt(InsertCmd, ProduceAction)
@@ -684,6 +1050,22 @@ class ProduceInsert(Act):
             else:
                 records = [product.data]
                 record_domain = product.meta.domain
+            size = context.app.tweak.etl.insert_limit
+            # Inserted records are identified by the keys returned by the
+            # database, which could be matched with the input records only
+            # if the key values are given.
+            if (extract_node.is_list and size and
+                    all(column in execute_insert.input_columns
+                        for column in execute_insert.output_columns)):
+                execute_batch = BuildExecuteInsertBatch.__invoke__(
+                        execute_insert.table, execute_insert.input_columns,
+                        size)
+                resolve_batch = ResolveIdentityBatchPipe(
+                        execute_insert.table, execute_insert.output_columns)
+                data = self.insert_batches(records, record_domain,
+                                           extract_node, extract_table,
+                                           execute_batch, resolve_batch)
+                return Product(meta, data)
             for idx, record in enumerate(records):
                 if record is None:
                     continue
@@ -709,4 +1091,70 @@ class ProduceInsert(Act):
                     data = None
             return Product(meta, data)
 
-
+    def insert_batches(self, records, record_domain, extract_node,
+                       extract_table, execute_batch, resolve_batch):
+        data = []
+        batch = []
+        for idx, record in enumerate(records):
+            if record is None:
+                continue
+            try:
+                row = extract_node(record)
+            except Error, exc:
+                message = "While inserting record #%s" % (idx+1)
+                quote = record_domain.dump(record)
+                exc.wrap(message, quote)
+                raise
+            batch.append((idx, record, row))
+            if len(batch) == execute_batch.size:
+                data.extend(self.insert_batch(batch, record_domain,
+                                              extract_table, execute_batch,
+                                              resolve_batch))
+                batch = []
+        if batch:
+            data.extend(self.insert_batch(batch, record_domain,
+                                          extract_table, execute_batch,
+                                          resolve_batch))
+        return data
+
+    def insert_batch(self, batch, record_domain, extract_table,
+                     execute_batch, resolve_batch):
+        start = batch[0][0]
+        end = batch[-1][0]
+        if start == end:
+            message = "While inserting record #%s" % (start+1)
+        else:
+            message = ("While inserting records #%s to #%s"
+                       % (start+1, end+1))
+        try:
+            extract_table.prefetch([row for idx, record, row in batch])
+        except Error, exc:
+            exc.wrap(message, None)
+            raise
+        rows = []
+        for idx, record, row in batch:
+            try:
+                rows.append(extract_table(row))
+            except Error, exc:
+                exc.wrap("While inserting record #%s" % (idx+1),
+                         record_domain.dump(record))
+                raise
+        with transaction() as connection:
+            savepoint = Savepoint(connection)
+            try:
+                data = resolve_batch(execute_batch(rows))
+            except Error:
+                savepoint.rollback()
+            else:
+                savepoint.release()
+                return data
+        # Insert the records one by one to find the one that failed.
+        data = []
+        for (idx, record, row), table_row in zip(batch, rows):
+            try:
+                data.extend(resolve_batch(execute_batch([table_row])))
+            except Error, exc:
+                exc.wrap("While inserting record #%s" % (idx+1),
+                         record_domain.dump(record))
+                raise
+        return data
@@ -297,29 +297,40 @@ class ProduceMerge(Act):
             else:
                 records = [product.data]
                 record_domain = product.meta.domain
+            items = []
             for idx, record in enumerate(records):
                 if record is None:
                     continue
                 try:
                     row = extract_node(record)
                     update_id, update_row = extract_identity(row)
-                    key = resolve_key(update_id)
-                    if key is not None:
-                        row = extract_table_for_update(update_row)
-                        key = execute_update(key, row)
-                    else:
-                        row = extract_table(row)
-                        key = execute_insert(row)
-                    row = resolve_identity(key)
                 except Error, exc:
-                    if extract_node.is_list:
-                        message = "While merging record #%s" % (idx+1)
-                    else:
-                        message = "While merging a record"
-                    quote = record_domain.dump(record)
-                    exc.wrap(message, quote)
+                    self.wrap(exc, idx, record, record_domain,
+                              extract_node.is_list)
                     raise
-                data.append(row)
+                items.append((idx, record, row, update_id, update_row))
+            size = context.app.tweak.etl.insert_limit or 1
+            for start in range(0, len(items), size):
+                batch = items[start:start+size]
+                # Resolve the links of the whole batch in advance.
+                extract_table.prefetch([item[2] for item in batch])
+                extract_table_for_update.prefetch([item[4]
+                                                   for item in batch])
+                for idx, record, row, update_id, update_row in batch:
+                    try:
+                        key = resolve_key(update_id)
+                        if key is not None:
+                            row = extract_table_for_update(update_row)
+                            key = execute_update(key, row)
+                        else:
+                            row = extract_table(row)
+                            key = execute_insert(row)
+                        row = resolve_identity(key)
+                    except Error, exc:
+                        self.wrap(exc, idx, record, record_domain,
+                                  extract_node.is_list)
+                        raise
+                    data.append(row)
             if not extract_node.is_list:
                 assert len(data) <= 1
                 if data:
@@ -328,4 +339,12 @@ class ProduceMerge(Act):
                     data = None
             return Product(meta, data)
 
+    def wrap(self, exc, idx, record, record_domain, is_list):
+        if is_list:
+            message = "While merging record #%s" % (idx+1)
+        else:
+            message = "While merging a record"
+        quote = record_domain.dump(record)
+        exc.wrap(message, quote)
+
 
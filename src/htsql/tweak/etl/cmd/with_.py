@@ -5,6 +5,7 @@
 
 from ....core.util import to_name
 from ....core.adapter import adapt
+from ....core.context import context
 from ....core.error import Error, act_guard
 from ....core.connect import transaction
 from ....core.domain import UntypedDomain, RecordDomain, Value, Product
@@ -47,7 +48,13 @@ class ProduceWith(Act):
                             value = Value(field.domain, input.data[idx])
                             environment[name] = value
                 action = self.action.clone(environment=environment)
-                return act(self.command.body, action)
+                # Within a loop, the fields are passed to the queries
+                # as parameters, like the loop variable.
+                names = context.env.parameter_names
+                if names:
+                    names |= frozenset(environment)
+                with context.env(parameter_names=names):
+                    return act(self.command.body, action)
             else:
                 meta = decorate(VoidBinding())
                 meta = meta.clone(domain=UntypedDomain())
@@ -11,13 +11,16 @@ from ....core.tr.dump import SerializingState, DumpBase
 
 class SerializeInsert(Utility, DumpBase):
 
-    def __init__(self, table, columns, returning_columns):
+    def __init__(self, table, columns, returning_columns, count=1):
         assert isinstance(table, TableEntity)
         assert isinstance(columns, listof(ColumnEntity))
         assert isinstance(returning_columns, maybe(listof(ColumnEntity)))
+        assert isinstance(count, int) and count >= 1
+        assert count == 1 or columns
         self.table = table
         self.columns = columns
         self.returning_columns = returning_columns
+        self.count = count
         self.state = SerializingState()
         self.stream = self.state.stream
 
@@ -55,12 +58,19 @@ class SerializeInsert(Utility, DumpBase):
 
     def dump_values(self):
         self.newline()
-        self.write(u"VALUES (")
-        for idx, column in enumerate(self.columns):
-            self.format("{index:placeholder}", index=None)
-            if idx < len(self.columns)-1:
-                self.write(u", ")
-        self.write(u")")
+        self.write(u"VALUES ")
+        self.indent()
+        for row_idx in range(self.count):
+            if row_idx > 0:
+                self.write(u",")
+                self.newline()
+            self.write(u"(")
+            for idx, column in enumerate(self.columns):
+                self.format("{index:placeholder}", index=None)
+                if idx < len(self.columns)-1:
+                    self.write(u", ")
+            self.write(u")")
+        self.dedent()
 
     def dump_no_values(self):
         self.newline()
@@ -195,8 +205,9 @@ class SerializeTruncate(Utility, DumpBase):
         return self.stream.flush()
 
 
-def serialize_insert(table, columns, returning_columns):
-    return SerializeInsert.__invoke__(table, columns, returning_columns)
+def serialize_insert(table, columns, returning_columns, count=1):
+    return SerializeInsert.__invoke__(table, columns, returning_columns,
+                                      count)
 
 
 def serialize_update(table, columns, key_columns, returning_columns):
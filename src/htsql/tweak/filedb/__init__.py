@@ -6,7 +6,7 @@
 from . import connect, introspect
 from ...core.addon import Addon, Parameter
 from ...core.util import DB
-from ...core.validator import StrVal, SeqVal, RecordVal
+from ...core.validator import StrVal, SeqVal, RecordVal, PIntVal
 
 
 class TweakFileDBAddon(Addon):
@@ -25,6 +25,26 @@ class TweakFileDBAddon(Addon):
 
     `file`: the path to the CSV file.
 
+    `primary-key`: (optional) the columns of the primary key.
+
+    `foreign-keys`: (optional) a list of foreign keys; each has
+    fields `columns`, `target` (the name of the target table) and
+    optional `target-columns` (by default, the primary key of
+    the target table).  Foreign keys make links between the tables.
+
+    `indexes`: (optional) a list of indexes, each given as a list
+    of columns.
+
+    The type of each column is inferred from the values in the file:
+    a column could be integer, decimal, date (in `YYYY-MM-DD`
+    format), boolean (`true` or `false`) or text.  Empty values
+    are loaded as `NULL`.  Decimal values are stored as floating
+    point numbers; a column with values that do not fit a float
+    exactly is loaded as text.
+
+    Use parameter `workers` to load multiple CSV files in parallel
+    worker processes.
+
     Use parameter `encoding` to specify the encoding of CSV files.
     By default, UTF-8 encoding is assumed.
 
@@ -36,7 +56,13 @@ class TweakFileDBAddon(Addon):
     postrequisites = ['htsql']
     parameters = [
             Parameter('sources', SeqVal(RecordVal([
-                ("file", StrVal())])),
+                ("file", StrVal()),
+                ("primary_key", SeqVal(StrVal()), []),
+                ("foreign_keys", SeqVal(RecordVal([
+                    ("columns", SeqVal(StrVal())),
+                    ("target", StrVal()),
+                    ("target_columns", SeqVal(StrVal()), None)])), []),
+                ("indexes", SeqVal(SeqVal(StrVal())), [])])),
                 default=[],
                 hint="""source CSV files"""),
             Parameter('encoding', StrVal(),
@@ -44,6 +70,8 @@ class TweakFileDBAddon(Addon):
                 hint="""encoding of CSV files"""),
             Parameter('cache_file', StrVal(),
                 hint="""persistent storage"""),
+            Parameter('workers', PIntVal(), default=1,
+                hint="""number of processes to load CSV files"""),
     ]
 
     @classmethod
@@ -8,9 +8,13 @@ from ...core.cache import once
 from ...core.connect import Connect, DBErrorGuard
 from ...core.adapter import rank, Utility
 from ...core.error import Error
+from .load import LoadError, load_table, load_file, make_table_sql
+from htsql_sqlite.core.connect import UnscrambleSQLiteDecimal
 import sqlite3
-import os.path
-import csv
+import decimal
+import multiprocessing
+import tempfile
+import os, os.path
 import re
 import glob
 
@@ -23,13 +27,24 @@ class FileDBConnect(Connect):
         return build_filedb()
 
 
+class UnscrambleFileDBDecimal(UnscrambleSQLiteDecimal):
+
+    @staticmethod
+    def convert(value):
+        # Decimal values are loaded only if they fit a float exactly;
+        # `repr()` restores the value written in the CSV file.
+        if isinstance(value, float):
+            return decimal.Decimal(repr(value))
+        return UnscrambleSQLiteDecimal.convert(value)
+
+
 class BuildFileDB(Utility):
 
     def __init__(self, connection):
         self.connection = connection
 
     def __call__(self):
-        encoding = context.app.tweak.filedb.encoding
+        addon = context.app.tweak.filedb
         cursor = self.connection.cursor()
         source_meta = {}
         cursor.execute("""
@@ -43,100 +58,148 @@ class BuildFileDB(Utility):
                     name        TEXT PRIMARY KEY NOT NULL,
                     file        TEXT UNIQUE NOT NULL,
                     size        INTEGER NOT NULL,
-                    timestamp   FLOAT NOT NULL
+                    timestamp   FLOAT NOT NULL,
+                    options     TEXT
                 )
             """)
         else:
             cursor.execute("""
-                SELECT name, file, size, timestamp
+                PRAGMA table_info("!source")
+            """)
+            if 'options' not in [row[1] for row in cursor.fetchall()]:
+                # Tables loaded by an older version are reloaded.
+                cursor.execute("""
+                    ALTER TABLE "!source" ADD COLUMN options TEXT
+                """)
+            cursor.execute("""
+                SELECT name, file, size, timestamp, options
                 FROM "!source"
                 ORDER BY name
             """)
-            for name, file, size, timestamp in cursor.fetchall():
-                source_meta[name] = (file, size, timestamp)
+            for name, file, size, timestamp, options in cursor.fetchall():
+                source_meta[name] = (file, size, timestamp, options)
+        cursor.execute("""
+            SELECT name
+            FROM sqlite_master
+            WHERE type = 'table'
+        """)
+        existing_names = set(name for name, in cursor.fetchall())
+        keys = build_keys()
+        jobs = []
         for table_name, source_file in build_names():
             if not os.path.exists(source_file):
                 raise Error("File does not exist", source_file)
             stat = os.stat(source_file)
-            meta = (source_file, stat.st_size, stat.st_mtime)
+            primary_key, foreign_keys, indexes = keys[table_name]
+            options = repr((primary_key, foreign_keys, indexes))
+            meta = (source_file, stat.st_size, stat.st_mtime, options)
             if table_name in source_meta:
-                if meta == source_meta[table_name]:
+                if (meta == source_meta[table_name] and
+                        table_name in existing_names):
                     continue
                 else:
                     cursor.execute("""
                         UPDATE "!source"
                         SET file = ?,
                             size = ?,
-                            timestamp = ?
+                            timestamp = ?,
+                            options = ?
                         WHERE name = ?
                     """, meta+(table_name,))
                     cursor.execute("""
-                        DROP TABLE "%s"
+                        DROP TABLE IF EXISTS "%s"
                     """ % table_name)
             else:
                 cursor.execute("""
-                    INSERT INTO "!source" (name, file, size, timestamp)
-                    VALUES (?, ?, ?, ?)
+                    INSERT INTO "!source" (name, file, size, timestamp,
+                                           options)
+                    VALUES (?, ?, ?, ?, ?)
                 """, (table_name,)+meta)
-            try:
-                stream = open(source_file, mode="rU")
-            except IOError, exc:
-                raise Error("Failed to open file", source_file)
-            reader = csv.reader(stream)
-            try:
-                columns_row = next(reader)
-            except StopIteration:
-                continue
-            if not columns_row:
-                continue
-            column_names = []
-            for idx, name in enumerate(columns_row):
+            jobs.append((table_name, source_file, addon.encoding,
+                         primary_key, foreign_keys))
+        if addon.workers > 1 and len(jobs) > 1:
+            columns_by_table = self.load_parallel(jobs)
+        else:
+            columns_by_table = {}
+            for job in jobs:
                 try:
-                    name = name.decode(encoding)
-                except UnicodeDecodeError:
-                    raise Error("Failed to decode file using %s encoding"
-                                % encoding, source_file)
-                if name:
-                    name = to_name(name)
-                if not name or name in column_names or re.match(r"^_\d+$", name):
-                    name = u"_%s" % (idx+1)
-                column_names.append(name)
-            records = []
-            for row in reader:
-                record = []
-                for idx in range(len(column_names)):
-                    if idx < len(row):
-                        value = row[idx]
-                        if not value:
-                            value = None
-                    else:
-                        value = None
-                    if value is not None:
-                        try:
-                            value = value.decode(encoding)
-                        except UnicodeDecodeError:
-                            raise Error("Failed to decode file using %s encoding"
-                                    % encoding, source_file)
-                    record.append(value)
-                records.append(record)
-            chunks = []
-            chunks.append("CREATE TABLE \"%s\" (" % table_name)
-            for idx, column_name in enumerate(column_names):
-                chunks.append("    \"%s\" TEXT" % column_name
-                              + ("," if idx < len(column_names)-1 else ""))
-            chunks.append(")")
-            sql = "\n".join(chunks)
-            cursor.execute(sql)
-            if records:
-                chunks = []
-                chunks.append("INSERT INTO \"%s\"" % table_name)
-                chunks.append("VALUES (%s)" % ",".join(["?"]*len(column_names)))
-                sql = "\n".join(chunks)
-                cursor.executemany(sql, records)
+                    columns_by_table[job[0]] = load_table(self.connection,
+                                                          *job)
+                except LoadError, exc:
+                    raise Error(*exc.args)
+        for table_name, source_file, encoding, primary_key, foreign_keys \
+                in jobs:
+            columns = columns_by_table[table_name]
+            if columns is None:
+                continue
+            names = [name for name, type in columns]
+            primary_key, foreign_keys, indexes = keys[table_name]
+            for index in indexes:
+                for name in index:
+                    if name not in names:
+                        raise Error("Found unknown column %s" % name,
+                                    source_file)
+                cursor.execute("""
+                    CREATE INDEX "%s" ON "%s" (%s)
+                """ % ("_".join([table_name]+index+["idx"]), table_name,
+                       ", ".join("\"%s\"" % name for name in index)))
+
+    def load_parallel(self, jobs):
+        # Loads the files in worker processes, each file into a separate
+        # temporary database, and then copies the tables.
+        addon = context.app.tweak.filedb
+        paths = []
+        try:
+            for job in jobs:
+                descriptor, path = tempfile.mkstemp(suffix='.sqlite')
+                os.close(descriptor)
+                paths.append(path)
+            pool = multiprocessing.Pool(min(addon.workers, len(jobs)))
+            try:
+                results = pool.map(load_file,
+                                   [(path,)+job
+                                    for path, job in zip(paths, jobs)])
+            except LoadError, exc:
+                raise Error(*exc.args)
+            finally:
+                pool.terminate()
+                pool.join()
+            columns_by_table = {}
+            cursor = self.connection.cursor()
+            for path, job, columns in zip(paths, jobs, results):
+                table_name, source_file, encoding, primary_key, foreign_keys \
+                        = job
+                columns_by_table[table_name] = columns
+                if columns is None:
+                    continue
+                cursor.execute(make_table_sql(table_name, columns,
+                                              primary_key, foreign_keys))
+                # Cannot attach a database within a transaction.
+                self.connection.commit()
+                cursor.execute("""
+                    ATTACH DATABASE ? AS source
+                """, (path,))
+                cursor.execute("""
+                    INSERT INTO "%s" SELECT * FROM source."%s"
+                """ % (table_name, table_name))
+                self.connection.commit()
+                cursor.execute("""
+                    DETACH DATABASE source
+                """)
+        finally:
+            for path in paths:
+                os.remove(path)
+        return columns_by_table
 
 
 @once
 def build_names():
+    return [(table_name, filename)
+            for table_name, filename, source in build_sources()]
+
+
+@once
+def build_sources():
     sources = context.app.tweak.filedb.sources
     names = []
     table_names = set()
@@ -152,11 +215,47 @@ def build_names():
                     re.match(r"^_\d+$", table_name)):
                 table_name = "_%s" % (source_idx+1)
             table_names.add(table_name)
-            names.append((table_name, filename))
+            names.append((table_name, filename, source))
             source_idx += 1
     return names
 
 
+@once
+def build_keys():
+    # Maps each table to its primary key, foreign keys and indexes.
+    primary_key_by_table = {}
+    for table_name, filename, source in build_sources():
+        primary_key_by_table[table_name] = [to_name(name)
+                                            for name in source.primary_key]
+    keys = {}
+    for table_name, filename, source in build_sources():
+        primary_key = primary_key_by_table[table_name]
+        foreign_keys = []
+        for foreign_key in source.foreign_keys:
+            target_name = to_name(foreign_key.target)
+            if target_name not in primary_key_by_table:
+                raise Error("Found unknown table %s" % target_name, filename)
+            if foreign_key.target_columns is not None:
+                target_column_names = [to_name(name)
+                        for name in foreign_key.target_columns]
+            else:
+                target_column_names = primary_key_by_table[target_name]
+                if not target_column_names:
+                    raise Error("Found no primary key in table %s"
+                                % target_name, filename)
+            column_names = [to_name(name) for name in foreign_key.columns]
+            if len(column_names) != len(target_column_names):
+                raise Error("Expected %s columns to match table %s"
+                            % (len(target_column_names), target_name),
+                            filename)
+            foreign_keys.append((column_names, target_name,
+                                 target_column_names))
+        indexes = [[to_name(name) for name in index]
+                   for index in source.indexes]
+        keys[table_name] = (primary_key, foreign_keys, indexes)
+    return keys
+
+
 @once
 def build_filedb():
     cache_file = context.app.tweak.filedb.cache_file
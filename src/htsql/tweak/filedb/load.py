@@ -0,0 +1,237 @@
+#
+# Copyright (c) 2006-2013, Prometheus Research, LLC
+#
+
+
+from ...core.util import to_name
+import sqlite3
+import datetime
+import csv
+import decimal
+import re
+
+
+# The number of rows inserted with a single `executemany()` call.
+CHUNK_SIZE = 1000
+
+
+class LoadError(Exception):
+    # Raised when a CSV file could not be loaded.  The arguments are
+    # the message and the quote of `htsql.core.error.Error`; unlike
+    # `Error`, the exception could be passed between processes.
+    pass
+
+
+def to_boolean(value):
+    value = value.lower()
+    if value == u'true':
+        return True
+    if value == u'false':
+        return False
+    raise ValueError(value)
+
+
+def to_integer(value):
+    if not re.match(ur"^[+-]?(?:0|[1-9][0-9]*)$", value):
+        raise ValueError(value)
+    value = int(value)
+    # SQLite integers are 64-bit.
+    if not (-2**63 <= value < 2**63):
+        raise ValueError(value)
+    return value
+
+
+def to_decimal(value):
+    # SQLite has no decimal type; decimal values are stored as floats.
+    # Reject values that cannot be represented by a float exactly so
+    # that they are kept as text.
+    if not re.match(ur"^[+-]?(?:(?:0|[1-9][0-9]*)(?:\.[0-9]*)?|\.[0-9]+)$",
+                    value):
+        raise ValueError(value)
+    number = float(value)
+    if decimal.Decimal(repr(number)) != decimal.Decimal(value):
+        raise ValueError(value)
+    return number
+
+
+def to_date(value):
+    match = re.match(ur"^([0-9]{4})-([0-9]{2})-([0-9]{2})$", value)
+    if match is None:
+        raise ValueError(value)
+    datetime.date(*[int(group) for group in match.groups()])
+    return value
+
+
+def to_text(value):
+    return value
+
+
+# Column types in the order of preference and their converters.
+TYPES = [
+        ('BOOLEAN', to_boolean),
+        ('INTEGER', to_integer),
+        ('DECIMAL', to_decimal),
+        ('DATE', to_date),
+        ('TEXT', to_text),
+]
+CONVERTERS = dict(TYPES)
+
+
+def narrow_types(types, value):
+    # Filters the candidate types of a column leaving those that fit
+    # the value; `TEXT` fits any value.
+    candidates = []
+    for type in types:
+        try:
+            CONVERTERS[type](value)
+        except ValueError:
+            continue
+        candidates.append(type)
+    return candidates
+
+
+def read_csv(source_file, encoding):
+    # Generates the column names followed by the rows of a CSV file.
+    # Values are decoded; empty values are replaced with `None`.
+    try:
+        stream = open(source_file, mode="rU")
+    except IOError, exc:
+        raise LoadError("Failed to open file", source_file)
+    with stream:
+        reader = csv.reader(stream)
+        try:
+            columns_row = next(reader)
+        except StopIteration:
+            return
+        if not columns_row:
+            return
+        column_names = []
+        for idx, name in enumerate(columns_row):
+            try:
+                name = name.decode(encoding)
+            except UnicodeDecodeError:
+                raise LoadError("Failed to decode file using %s encoding"
+                                % encoding, source_file)
+            if name:
+                name = to_name(name)
+            if (not name or name in column_names or
+                    re.match(r"^_\d+$", name)):
+                name = u"_%s" % (idx+1)
+            column_names.append(name)
+        yield column_names
+        width = len(column_names)
+        for row in reader:
+            record = []
+            for idx in range(width):
+                value = None
+                if idx < len(row) and row[idx]:
+                    try:
+                        value = row[idx].decode(encoding)
+                    except UnicodeDecodeError:
+                        raise LoadError("Failed to decode file using %s"
+                                        " encoding" % encoding, source_file)
+                record.append(value)
+            yield record
+
+
+def make_table_sql(table_name, columns, primary_key, foreign_keys):
+    # Generates a `CREATE TABLE` statement.
+    chunks = []
+    chunks.append(u"CREATE TABLE \"%s\" (" % table_name)
+    lines = []
+    for column_name, type in columns:
+        line = u"    \"%s\" %s" % (column_name, type)
+        if column_name in primary_key:
+            line += u" NOT NULL"
+        lines.append(line)
+    if primary_key:
+        lines.append(u"    PRIMARY KEY (%s)"
+                     % u", ".join(u"\"%s\"" % name for name in primary_key))
+    for column_names, target_name, target_column_names in foreign_keys:
+        lines.append(u"    FOREIGN KEY (%s) REFERENCES \"%s\" (%s)"
+                     % (u", ".join(u"\"%s\"" % name
+                                   for name in column_names),
+                        target_name,
+                        u", ".join(u"\"%s\"" % name
+                                   for name in target_column_names)))
+    chunks.append(u",\n".join(lines))
+    chunks.append(u")")
+    return u"\n".join(chunks)
+
+
+def load_table(connection, table_name, source_file, encoding,
+               primary_key, foreign_keys):
+    """
+    Loads a CSV file into a new table.
+
+    The file is read twice: the first pass finds the narrowest type
+    that fits all the values of each column, the second pass creates
+    the table and inserts the converted rows.  Returns a list of pairs
+    of the column names and types or ``None`` if the file is empty.
+    """
+    rows = read_csv(source_file, encoding)
+    names = next(rows, None)
+    if not names:
+        return None
+    for name in primary_key+[name for column_names, target_name,
+                                        target_column_names in foreign_keys
+                                  for name in column_names]:
+        if name not in names:
+            raise LoadError("Found unknown column %s" % name, source_file)
+    # Each column keeps the types that fit all of its values so far;
+    # the narrowest of them becomes the column type.
+    candidates = [[type for type, convert in TYPES]]*len(names)
+    for row in rows:
+        for idx, value in enumerate(row):
+            if value is not None and len(candidates[idx]) > 1:
+                candidates[idx] = narrow_types(candidates[idx], value)
+    types = [types[0] for types in candidates]
+    columns = zip(names, types)
+    cursor = connection.cursor()
+    cursor.execute(make_table_sql(table_name, columns,
+                                  primary_key, foreign_keys))
+    sql = u"INSERT INTO \"%s\" VALUES (%s)" \
+            % (table_name, u", ".join([u"?"]*len(names)))
+    converts = [CONVERTERS[type] for type in types]
+    rows = read_csv(source_file, encoding)
+    next(rows)
+    chunk = []
+    for row in rows:
+        for idx, value in enumerate(row):
+            if value is not None:
+                try:
+                    row[idx] = converts[idx](value)
+                except ValueError:
+                    raise LoadError("Failed to convert value %r to %s"
+                                    % (value, types[idx]), source_file)
+        chunk.append(row)
+        if len(chunk) == CHUNK_SIZE:
+            insert(cursor, sql, chunk, source_file)
+            chunk = []
+    if chunk:
+        insert(cursor, sql, chunk, source_file)
+    return columns
+
+
+def insert(cursor, sql, chunk, source_file):
+    try:
+        cursor.executemany(sql, chunk)
+    except sqlite3.IntegrityError, exc:
+        raise LoadError("Failed to load file: %s" % exc, source_file)
+
+
+def load_file(job):
+    # Loads a CSV file into a new SQLite database; executed by a worker
+    # process.
+    (path, table_name, source_file, encoding,
+     primary_key, foreign_keys) = job
+    connection = sqlite3.connect(path)
+    try:
+        columns = load_table(connection, table_name, source_file, encoding,
+                             primary_key, foreign_keys)
+        connection.commit()
+    finally:
+        connection.close()
+    return columns
+
+
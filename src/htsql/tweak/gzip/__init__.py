@@ -0,0 +1,47 @@
+#
+# Copyright (c) 2006-2013, Prometheus Research, LLC
+#
+
+
+from . import wsgi
+from ...core.addon import Addon, Parameter
+from ...core.validator import IntVal, UIntVal, SeqVal, StrVal
+
+
+class TweakGzipAddon(Addon):
+
+    name = 'tweak.gzip'
+    hint = """compress HTTP output"""
+    help = """
+    This addon compresses HTTP output with `gzip` or `deflate`
+    encoding when the client permits it in the `Accept-Encoding`
+    header.  The output is compressed as it is generated, so
+    streaming of query results is preserved.
+
+    Parameter `level` sets the compression level, from 1 (fastest)
+    to 9 (best compression); the default is 6.
+
+    Parameter `min_size` sets the minimum size of output, in bytes,
+    which is worth compressing (the default is 1024).
+
+    Parameter `content_types` lists the content types of output
+    that are compressed.  By default, the output of all HTSQL formats
+    is compressed.
+    """
+
+    parameters = [
+            Parameter('level', IntVal(1, 9), default=6,
+                      hint="""compression level (default: 6)"""),
+            Parameter('min_size', UIntVal(), default=1024,
+                      value_name="""size""",
+                      hint="""min. size to compress (default: 1024)"""),
+            Parameter('content_types', SeqVal(StrVal()),
+                      default=['text/plain', 'text/html', 'text/csv',
+                               'text/tab-separated-values',
+                               'application/javascript', 'application/json',
+                               'application/xml'],
+                      value_name="""types""",
+                      hint="""content types to compress"""),
+    ]
+
+
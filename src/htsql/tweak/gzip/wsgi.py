@@ -0,0 +1,125 @@
+#
+# Copyright (c) 2006-2013, Prometheus Research, LLC
+#
+
+
+from ...core.context import context
+from ...core.adapter import rank
+from ...core.wsgi import WSGI
+import zlib
+
+
+class GzipWSGI(WSGI):
+
+    rank(15.0)
+
+    def __call__(self):
+        addon = context.app.tweak.gzip
+        encoding = negotiate(self.environ.get('HTTP_ACCEPT_ENCODING'))
+        level = addon.level
+        min_size = addon.min_size
+        content_types = addon.content_types
+        start_response = self.start_response
+        response = []
+        writes = []
+        def gzip_start_response(status, headers, exc_info=None):
+            response[:] = [status, headers, exc_info]
+            return writes.append
+        self.start_response = gzip_start_response
+        body = super(GzipWSGI, self).__call__()
+        status, headers, exc_info = response
+        if writes:
+            body = writes+list(body)
+        content_type = None
+        for header, value in headers:
+            header = header.lower()
+            if header == 'content-encoding':
+                content_type = None
+                break
+            if header == 'content-type':
+                content_type = value.split(';')[0].strip().lower()
+        if content_type not in content_types:
+            start_response(status, headers, exc_info)
+            return body
+        headers = add_vary(headers, 'Accept-Encoding')
+        if encoding is None:
+            start_response(status, headers, exc_info)
+            return body
+        # Wait for enough output to decide if it is worth compressing.
+        body = iter(body)
+        head = []
+        size = 0
+        for chunk in body:
+            head.append(chunk)
+            size += len(chunk)
+            if size >= min_size:
+                break
+        if size < min_size:
+            start_response(status, headers, exc_info)
+            return head
+        headers = [(header, value) for header, value in headers
+                   if header.lower() != 'content-length']
+        headers.append(('Content-Encoding', encoding))
+        start_response(status, headers, exc_info)
+        return compress(head, body, encoding, level)
+
+
+def negotiate(accept_encoding):
+    # Chooses the content encoding acceptable by the client.
+    if not accept_encoding:
+        return None
+    qualities = {}
+    for item in accept_encoding.split(','):
+        parameters = item.split(';')
+        name = parameters[0].strip().lower()
+        quality = 1.0
+        for parameter in parameters[1:]:
+            key, separator, value = parameter.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name] = quality
+    for name in ['gzip', 'deflate']:
+        if qualities.get(name, qualities.get('*', 0.0)) > 0.0:
+            return name
+    return None
+
+
+def add_vary(headers, name):
+    # Adds a field name to the `Vary` header.
+    for idx, (header, value) in enumerate(headers):
+        if header.lower() == 'vary':
+            names = [item.strip().lower() for item in value.split(',')]
+            if name.lower() not in names and '*' not in names:
+                headers = headers[:]
+                headers[idx] = (header, value+', '+name)
+            return headers
+    return headers+[('Vary', name)]
+
+
+def compress(head, body, encoding, level):
+    # Compresses the output chunk by chunk; each chunk is flushed
+    # to the client as soon as it is generated.
+    if encoding == 'gzip':
+        compressor = zlib.compressobj(level, zlib.DEFLATED,
+                                      16+zlib.MAX_WBITS)
+    else:
+        compressor = zlib.compressobj(level)
+    try:
+        data = compressor.compress("".join(head))
+        data += compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield data
+        for chunk in body:
+            if not chunk:
+                continue
+            data = compressor.compress(chunk)
+            data += compressor.flush(zlib.Z_SYNC_FLUSH)
+            yield data
+        yield compressor.flush()
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+
+
@@ -4,8 +4,9 @@
 
 
 from . import connect
-from ...core.addon import Addon
-import threading
+from ...core.addon import Addon, Parameter
+from ...core.validator import UIntVal, PIntVal
+from .connect import ConnectionPool
 
 
 class TweakPoolAddon(Addon):
@@ -15,11 +16,54 @@ class TweakPoolAddon(Addon):
     help = """
     This addon caches database connections so that a single
     connection could be used to execute more than one query.
+
+    Parameter `min_size` is the number of idle connections that
+    are kept open regardless of `max_idle`.  Connections are not
+    opened in advance, so the pool may hold fewer connections.
+
+    Parameter `max_size` limits the number of open connections;
+    when all of them are busy, a request waits for `wait_timeout`
+    seconds for a connection to become free.
+
+    Parameter `max_idle` is the number of seconds after which an
+    idle connection is closed.  Parameter `max_lifetime` is the
+    number of seconds after which any connection is closed.
+
+    A connection that was idle for `probe_idle` seconds or longer
+    is checked with a trivial query before it is reused.  Set
+    `probe_idle` to 0 to check every connection.
     """
 
+    parameters = [
+            Parameter('min_size', UIntVal(), default=0,
+                      value_name="N",
+                      hint="""number of idle connections to keep"""),
+            Parameter('max_size', PIntVal(is_nullable=True),
+                      value_name="N",
+                      hint="""maximum number of connections"""),
+            Parameter('max_idle', PIntVal(is_nullable=True),
+                      value_name="SEC",
+                      hint="""close connections idle for SEC seconds"""),
+            Parameter('max_lifetime', PIntVal(is_nullable=True),
+                      value_name="SEC",
+                      hint="""close connections older than SEC seconds"""),
+            Parameter('wait_timeout', PIntVal(is_nullable=True), default=30,
+                      value_name="SEC",
+                      hint="""time to wait for a free connection"""
+                           """ (default: 30)"""),
+            Parameter('probe_idle', UIntVal(), default=10,
+                      value_name="SEC",
+                      hint="""check connections idle for SEC seconds"""
+                           """ (default: 10)"""),
+    ]
+
     def __init__(self, app, attributes):
         super(TweakPoolAddon, self).__init__(app, attributes)
-        self.lock = threading.Lock()
-        self.items = []
+        self.pool = ConnectionPool(min_size=self.min_size,
+                                   max_size=self.max_size,
+                                   max_idle=self.max_idle,
+                                   max_lifetime=self.max_lifetime,
+                                   wait_timeout=self.wait_timeout,
+                                   probe_idle=self.probe_idle)
 
 
@@ -5,7 +5,229 @@
 
 from ...core.adapter import rank
 from ...core.context import context
-from ...core.connect import Connect
+from ...core.connect import Connect, ConnectionProxy, probe
+from ...core.error import Error, EngineError
+import collections
+import threading
+import time
+import os
+
+
+class PoolConnectionProxy(ConnectionProxy):
+    """
+    A database connection owned by a connection pool.
+
+    Releasing the connection returns it to the pool.
+    """
+
+    def __init__(self, connection, guard, pool):
+        super(PoolConnectionProxy, self).__init__(connection, guard)
+        self.pool = pool
+        # When the connection was opened and when it was returned
+        # to the pool.
+        self.opened_at = time.time()
+        self.released_at = None
+
+    def release(self):
+        super(PoolConnectionProxy, self).release()
+        self.pool.put(self)
+
+
+class ConnectionPool(object):
+    """
+    Maintains a set of open database connections.
+
+    `min_size` (an integer)
+        The number of idle connections that are never closed
+        for being idle.  Connections are not opened in advance;
+        this only limits how many of them are reaped.
+
+    `max_size` (an integer or ``None``)
+        The maximum number of open connections.
+
+    `max_idle` (an integer or ``None``)
+        Idle connections are closed after the given number of seconds.
+
+    `max_lifetime` (an integer or ``None``)
+        Connections are closed once they are older than the given
+        number of seconds.
+
+    `wait_timeout` (an integer or ``None``)
+        How long to wait for a free connection when the pool is
+        exhausted.
+
+    `probe_idle` (an integer)
+        Idle connections are probed before they are reused if they
+        were idle for at least the given number of seconds.
+    """
+
+    def __init__(self, min_size=0, max_size=None, max_idle=None,
+                 max_lifetime=None, wait_timeout=None, probe_idle=0):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.wait_timeout = wait_timeout
+        self.probe_idle = probe_idle
+        self.condition = threading.Condition(threading.Lock())
+        # Idle connections; the most recently released on the right.
+        self.free = collections.deque()
+        # The number of open connections, including those being opened.
+        self.size = 0
+        self.waits = 0
+        self.wait_time = 0.0
+        # The process owning the connections.
+        self.pid = os.getpid()
+        # Connections inherited from the parent process.
+        self.inherited = []
+
+    def get(self, open, probe, is_blocking=True):
+        """
+        Takes a connection from the pool.
+
+        `open`
+            A function that opens a new connection.
+
+        `probe`
+            A function that verifies if an idle connection is alive;
+            called for connections idle for at least `probe_idle`
+            seconds.  Other connections were valid when released:
+            a connection that fails is invalidated and discarded.
+
+        `is_blocking` (Boolean)
+            If not set, returns ``None`` instead of waiting when
+            the pool is exhausted.
+        """
+        deadline = None
+        if self.wait_timeout is not None:
+            deadline = time.time()+self.wait_timeout
+        while True:
+            connection = None
+            with self.condition:
+                if self.pid != os.getpid():
+                    self.detach()
+                self.reap()
+                if not self.free and self.max_size is not None and \
+                        self.size >= self.max_size:
+                    if not is_blocking:
+                        return None
+                    self.wait(deadline)
+                if self.free:
+                    connection = self.free.pop()
+                else:
+                    self.size += 1
+            if connection is None:
+                try:
+                    connection = open()
+                except:
+                    self.discard()
+                    raise
+                return connection
+            connection.acquire()
+            if (time.time()-connection.released_at < self.probe_idle or
+                    probe(connection)):
+                return connection
+            self.discard(connection)
+
+    def put(self, connection):
+        """
+        Returns a connection to the pool.
+        """
+        now = time.time()
+        if not connection.is_valid or self.is_expired(connection, now):
+            self.discard(connection)
+            return
+        connection.released_at = now
+        with self.condition:
+            self.free.append(connection)
+            self.condition.notify()
+
+    def discard(self, connection=None):
+        # Closes a connection and frees its slot.  A connection that
+        # is no longer valid is closed too: it may still be open on
+        # the server and hold locks.
+        if connection is not None:
+            try:
+                connection.close()
+            except Exception:
+                pass
+        with self.condition:
+            self.size -= 1
+            self.condition.notify()
+
+    def wait(self, deadline):
+        # Waits for a free connection; must be called with the lock held.
+        start = time.time()
+        self.waits += 1
+        while not self.free and self.size >= self.max_size:
+            if deadline is None:
+                self.condition.wait()
+            else:
+                timeout = deadline-time.time()
+                if timeout <= 0:
+                    self.wait_time += time.time()-start
+                    raise EngineError("Connection pool is exhausted")
+                self.condition.wait(timeout)
+        self.wait_time += time.time()-start
+
+    def detach(self):
+        # Abandons connections opened before the process was forked;
+        # they are still used by the parent process.  We keep them
+        # referenced so that they are never closed by this process.
+        self.inherited.extend(self.free)
+        self.free.clear()
+        self.size = 0
+        self.pid = os.getpid()
+
+    def reap(self):
+        # Closes expired idle connections; must be called with the lock held.
+        now = time.time()
+        expired = []
+        while self.free and len(self.free) > self.min_size and \
+                self.is_expired(self.free[0], now, is_idle=True):
+            expired.append(self.free.popleft())
+        for connection in expired:
+            self.size -= 1
+            try:
+                connection.close()
+            except Error:
+                pass
+
+    def is_expired(self, connection, now, is_idle=False):
+        if (self.max_lifetime is not None and
+                now-connection.opened_at > self.max_lifetime):
+            return True
+        if (is_idle and self.max_idle is not None and
+                now-connection.released_at > self.max_idle):
+            return True
+        return False
+
+    def clear(self):
+        """
+        Closes all idle connections.
+        """
+        with self.condition:
+            while self.free:
+                connection = self.free.pop()
+                self.size -= 1
+                try:
+                    connection.close()
+                except Error:
+                    pass
+            self.condition.notify_all()
+
+    def stats(self):
+        """
+        Returns pool statistics.
+        """
+        with self.condition:
+            return {
+                    'size': self.size,
+                    'busy': self.size-len(self.free),
+                    'idle': len(self.free),
+                    'waits': self.waits,
+                    'wait_time': self.wait_time,
+            }
 
 
 class PoolConnect(Connect):
@@ -15,17 +237,12 @@ class PoolConnect(Connect):
     def __call__(self):
         if self.with_autocommit:
             return super(PoolConnect, self).__call__()
-        addon = context.app.tweak.pool
-        with addon.lock:
-            for connection in addon.items[:]:
-                if not connection.is_valid:
-                    addon.items.remove(connection)
-            for connection in addon.items:
-                if not connection.is_busy:
-                    connection.acquire()
-                    return connection
-            connection = super(PoolConnect, self).__call__()
-            addon.items.append(connection)
-            return connection
+        pool = context.app.tweak.pool.pool
+        return pool.get(self.open_pooled, probe, self.is_blocking)
+
+    def open_pooled(self):
+        connection = super(PoolConnect, self).__call__()
+        return PoolConnectionProxy(connection.connection, connection.guard,
+                                   context.app.tweak.pool.pool)
 
 
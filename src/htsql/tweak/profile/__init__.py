@@ -0,0 +1,35 @@
+#
+# Copyright (c) 2006-2013, Prometheus Research, LLC
+#
+
+
+from . import command, wsgi
+from ...core.addon import Addon, Parameter
+from ...core.validator import BoolVal
+
+
+class TweakProfileAddon(Addon):
+
+    name = 'tweak.profile'
+    hint = """report query performance statistics"""
+    help = """
+    This addon adds command `/:profile`, which executes the query
+    and displays, instead of the query output, the time spent in each
+    translation stage, executing SQL, fetching rows and formatting
+    the output, as well as the number of adapter calls.
+
+    When parameter `header` is set, every response is profiled and
+    the summary of the profile is sent in the `X-HTSQL-Profile` header.
+    Collecting the profile slows down the request, so do not enable
+    the header in production.
+
+    To profile a request programmatically, use
+    `htsql.core.profile.profiling()`.
+    """
+
+    parameters = [
+            Parameter('header', BoolVal(), default=False,
+                      hint="""add profile header to every response"""),
+    ]
+
+
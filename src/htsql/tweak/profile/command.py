@@ -0,0 +1,48 @@
+#
+# Copyright (c) 2006-2013, Prometheus Research, LLC
+#
+
+
+from ...core.adapter import adapt, call
+from ...core.error import Error
+from ...core.cmd.command import Command
+from ...core.cmd.summon import Summon, recognize
+from ...core.cmd.act import Act, RenderAction, act
+from ...core.profile import profiling
+
+
+class ProfileCmd(Command):
+
+    def __init__(self, feed):
+        assert isinstance(feed, Command)
+        self.feed = feed
+
+
+class SummonProfile(Summon):
+
+    call('profile')
+
+    def __call__(self):
+        if len(self.arguments) != 1:
+            raise Error("Expected 1 argument")
+        [syntax] = self.arguments
+        feed = recognize(syntax)
+        return ProfileCmd(feed)
+
+
+class RenderProfile(Act):
+
+    adapt(ProfileCmd, RenderAction)
+
+    def __call__(self):
+        with profiling() as profile:
+            status, headers, body = act(self.command.feed, self.action)
+            # Generate the output to measure the formatting time.
+            for chunk in body:
+                pass
+        status = "200 OK"
+        headers = [('Content-Type', "text/plain; charset=UTF-8")]
+        body = [str(profile)]
+        return (status, headers, body)
+
+
@@ -0,0 +1,35 @@
+#
+# Copyright (c) 2006-2013, Prometheus Research, LLC
+#
+
+
+from ...core.context import context
+from ...core.adapter import rank
+from ...core.wsgi import WSGI
+from ...core.profile import profiling
+
+
+class ProfileWSGI(WSGI):
+
+    rank(20.0)
+
+    def __call__(self):
+        if not context.app.tweak.profile.header:
+            return super(ProfileWSGI, self).__call__()
+        # The header is sent before the body, so we have to generate
+        # the whole output before we could report the profile.
+        start_response = self.start_response
+        response = []
+        def profile_start_response(status, headers, exc_info=None):
+            response[:] = [status, headers, exc_info]
+            return (lambda data: body.append(data))
+        self.start_response = profile_start_response
+        body = []
+        with profiling() as profile:
+            body.extend(super(ProfileWSGI, self).__call__())
+        status, headers, exc_info = response
+        headers = headers + [('X-HTSQL-Profile', profile.summary())]
+        start_response(status, headers, exc_info)
+        return body
+
+
@@ -0,0 +1,111 @@
+#
+# Copyright (c) 2006-2013, Prometheus Research, LLC
+#
+
+
+from . import connect
+from ...core.context import context
+from ...core.util import DB
+from ...core.addon import Addon, Parameter, Variable
+from ...core.validator import (AnyVal, UnionVal, MapVal, StrVal, DBVal,
+        SeqVal, ChoiceVal)
+from .connect import Target, ReplicaRouter
+
+
+class TweakReplicaAddon(Addon):
+
+    name = 'tweak.replica'
+    hint = """execute read queries on replica databases"""
+    help = """
+    This addon distributes read queries among a set of replica
+    databases.  Queries of a request are executed on the same
+    replica.  Once a request writes to the database, for instance,
+    with an ETL command, the remaining queries of the request are
+    executed on the primary database.  Queries within an explicit
+    transaction and catalog introspection always use the primary
+    database.
+
+    Parameter `replicas` is a list of connection URIs or nested
+    HTSQL configurations of the replica databases.  The replicas
+    must use the same database engine as the primary database.
+    Replicas inherit the `htsql` and `tweak.pool` settings of the
+    primary database, except for the connection URI, the password,
+    the catalog snapshot and the warm-up settings; a nested
+    configuration may override them.
+
+    Parameter `strategy` determines how a replica is chosen for
+    a request: `round-robin` (the default) or `least-busy`, which
+    prefers the replica with the fewest active connections.
+
+    If a connection to a replica cannot be established, the request
+    falls back to the primary database.
+    """
+
+    parameters = [
+            Parameter('replicas',
+                      SeqVal(UnionVal([
+                          DBVal(),
+                          MapVal(StrVal(), AnyVal())])),
+                      default=[],
+                      value_name="[DB]",
+                      hint="""replica databases"""),
+            Parameter('strategy', ChoiceVal(['round-robin', 'least-busy']),
+                      default='round-robin',
+                      hint="""how to choose a replica"""
+                           """ (default: round-robin)"""),
+    ]
+
+    variables = [
+            Variable('replica_target'),
+    ]
+
+    # Parameters of the `htsql` addon that are not inherited by replicas.
+    private_parameters = ['db', 'password', 'catalog_snapshot',
+                          'warmup', 'warmup_queries']
+
+    def __init__(self, app, attributes):
+        super(TweakReplicaAddon, self).__init__(app, attributes)
+        # Replicas are added by `validate()`, once the settings they
+        # inherit are known; until then, all queries are executed
+        # on the primary database.
+        self.router = ReplicaRouter(Target("primary"), [], self.strategy)
+
+    def validate(self):
+        app = context.app
+        inherited = self.get_inherited(app)
+        engine = app.htsql.db.engine
+        for index, db in enumerate(self.replicas):
+            if isinstance(db, DB):
+                instance = app.__class__(db, inherited)
+            else:
+                instance = app.__class__(None, db, inherited)
+            target = Target("replica-%s" % (index+1), instance)
+            if target.app.htsql.db.engine != engine:
+                raise ValueError("%s must use the %s engine"
+                                 % (target.name, engine))
+            self.router.replicas.append(target)
+
+    def get_inherited(self, app):
+        # Produces the configuration shared by the primary database
+        # and the replicas.
+        configuration = {}
+        addons = [app.htsql]
+        if hasattr(app.tweak, 'pool'):
+            addons.append(app.tweak.pool)
+        for addon in addons:
+            parameters = {}
+            for parameter in addon.parameters:
+                name = parameter.attribute
+                if addon is app.htsql and name in self.private_parameters:
+                    continue
+                parameters[name] = getattr(addon, name)
+            configuration[addon.name] = parameters
+        return configuration
+
+    def stats(self):
+        """
+        Returns usage statistics of the primary and replica databases.
+        """
+        return self.router.stats()
+
+
@@ -0,0 +1,171 @@
+#
+# Copyright (c) 2006-2013, Prometheus Research, LLC
+#
+
+
+from ...core.context import context
+from ...core.adapter import rank
+from ...core.error import Error
+from ...core.connect import Connect, ConnectionProxy, connect
+import threading
+
+
+class ReplicaConnect(Connect):
+
+    rank(3.0) # choose the database before connections are pooled
+
+    def __call__(self):
+        if self.with_autocommit:
+            return super(ReplicaConnect, self).__call__()
+        addon = context.app.tweak.replica
+        router = addon.router
+        # The database is chosen once per request, so that all queries
+        # of the request see the same data.  Once the request writes
+        # to the database, the remaining queries are executed on the
+        # primary database to see the changes.  Note that we update
+        # the environment in place to preserve the choice.
+        target = context.env.replica_target
+        if not self.is_read_only:
+            target = router.primary
+            context.env.replica_target = target
+        elif target is None:
+            target = router.choose()
+            context.env.replica_target = target
+        if target is not router.primary:
+            try:
+                with target.app:
+                    connection = connect(is_read_only=True,
+                                         is_blocking=self.is_blocking)
+            except Error:
+                target.fail()
+                target = router.primary
+                context.env.replica_target = target
+            else:
+                if connection is None:
+                    return None
+                return target.open(connection)
+        connection = super(ReplicaConnect, self).__call__()
+        if connection is None:
+            return None
+        return target.open(connection)
+
+
+class ReplicaConnectionProxy(ConnectionProxy):
+    """
+    A database connection opened by a replica router.
+
+    `proxy` (:class:`htsql.core.connect.ConnectionProxy`)
+        The connection to the database.
+
+    `target` (:class:`Target`)
+        The database that owns the connection.
+    """
+
+    def __init__(self, proxy, target):
+        super(ReplicaConnectionProxy, self).__init__(proxy.connection,
+                                                     proxy.guard)
+        self.proxy = proxy
+        self.target = target
+
+    def close(self):
+        self.is_valid = False
+        self.proxy.close()
+
+    def invalidate(self):
+        self.is_valid = False
+        self.proxy.invalidate()
+
+    def release(self):
+        super(ReplicaConnectionProxy, self).release()
+        self.proxy.release()
+        self.target.release()
+
+
+class Target(object):
+    """
+    A database served by a replica router.
+
+    `name` (a string)
+        The name of the database in statistics.
+
+    `app` (:class:`htsql.core.application.Application` or ``None``)
+        The application that opens connections to a replica database;
+        ``None`` for the primary database.
+    """
+
+    def __init__(self, name, app=None):
+        self.name = name
+        self.app = app
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.active = 0
+        self.errors = 0
+
+    def open(self, connection):
+        # Wraps a connection to the database to track its usage.
+        with self.lock:
+            self.connections += 1
+            self.active += 1
+        return ReplicaConnectionProxy(connection, self)
+
+    def release(self):
+        with self.lock:
+            self.active -= 1
+
+    def fail(self):
+        with self.lock:
+            self.errors += 1
+
+    def stats(self):
+        with self.lock:
+            return {
+                    'connections': self.connections,
+                    'active': self.active,
+                    'errors': self.errors,
+            }
+
+
+class ReplicaRouter(object):
+    """
+    Distributes read queries among replica databases.
+
+    `primary` (:class:`Target`)
+        The primary database.
+
+    `replicas` (a list of :class:`Target`)
+        The replica databases.
+
+    `strategy` (``'round-robin'`` or ``'least-busy'``)
+        How to choose a replica for a request.
+    """
+
+    def __init__(self, primary, replicas, strategy):
+        assert strategy in ['round-robin', 'least-busy']
+        self.primary = primary
+        self.replicas = replicas
+        self.strategy = strategy
+        self.lock = threading.Lock()
+        self.index = 0
+
+    def choose(self):
+        """
+        Returns the database to execute read queries of a request.
+        """
+        if not self.replicas:
+            return self.primary
+        with self.lock:
+            index = self.index
+            self.index = (index+1) % len(self.replicas)
+        candidates = self.replicas[index:]+self.replicas[:index]
+        if self.strategy == 'least-busy':
+            candidates.sort(key=(lambda target: target.active))
+        return candidates[0]
+
+    def stats(self):
+        """
+        Returns a dictionary with usage statistics of each database.
+        """
+        return dict((target.name, target.stats())
+                    for target in [self.primary]+self.replicas)
+
+
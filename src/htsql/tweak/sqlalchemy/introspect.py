@@ -5,7 +5,7 @@
 
 from ...core.context import context
 from ...core.adapter import Adapter, rank, adapt, adapt_many
-from ...core.introspect import Introspect
+from ...core.introspect import Introspect, Fingerprint
 from ...core.entity import make_catalog
 from ...core.domain import (BooleanDomain, IntegerDomain, FloatDomain,
                             DecimalDomain, TextDomain, DateDomain,
@@ -26,6 +26,18 @@ def decode(name, quote=None):
     return name
 
 
+class SQLAlchemyFingerprint(Fingerprint):
+
+    rank(1.0)
+
+    def __call__(self):
+        # When the catalog is generated from the metadata, the database
+        # fingerprint cannot tell when it is out of date.
+        if context.app.tweak.sqlalchemy.metadata:
+            return None
+        return super(SQLAlchemyFingerprint, self).__call__()
+
+
 class SQLAlchemyIntrospect(Introspect):
 
     rank(1.0)
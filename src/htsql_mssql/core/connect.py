@@ -3,7 +3,8 @@
 #
 
 
-from htsql.core.connect import Connect, Scramble, Unscramble, UnscrambleError
+from htsql.core.connect import (Connect, Scramble, Unscramble, UnscrambleError,
+        BeginRead, EndRead)
 from htsql.core.adapter import adapt
 from htsql.core.context import context
 from htsql.core.domain import (BooleanDomain, TextDomain, DateDomain,
@@ -36,6 +37,25 @@ class ConnectMSSQL(Connect):
         return connection
 
 
+class BeginMSSQLRead(BeginRead):
+
+    def __call__(self):
+        # MS SQL Server has no read-only transactions.
+        if self.mode != 'autocommit':
+            return None
+        with self.connection.guard:
+            self.connection.connection.autocommit(True)
+        return True
+
+
+class EndMSSQLRead(EndRead):
+
+    def __call__(self):
+        # Connections are opened with autocommit disabled.
+        with self.connection.guard:
+            self.connection.connection.autocommit(False)
+
+
 class UnscrambleMSSQLError(UnscrambleError):
 
     def __call__(self):
@@ -4,7 +4,7 @@
 
 
 from htsql.core.adapter import Protocol, call
-from htsql.core.introspect import Introspect
+from htsql.core.introspect import Introspect, Fingerprint
 from htsql.core.entity import make_catalog
 from htsql.core.domain import (BooleanDomain, IntegerDomain, DecimalDomain,
                                FloatDomain, TextDomain, DateTimeDomain,
@@ -14,6 +14,15 @@ import itertools
 import fnmatch
 
 
+class FingerprintMSSQL(Fingerprint):
+
+    sql = """
+        SELECT COUNT(*), MAX(o.modify_date)
+        FROM sys.objects o
+        WHERE o.type IN ('U', 'V', 'PK', 'UQ', 'F')
+    """
+
+
 class IntrospectMSSQL(Introspect):
 
     system_schema_names = [u'guest', u'INFORMATION_SCHEMA', u'sys', u'db_*']
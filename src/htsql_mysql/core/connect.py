@@ -3,7 +3,8 @@
 #
 
 
-from htsql.core.connect import Connect, Scramble, Unscramble, UnscrambleError
+from htsql.core.connect import (Connect, Scramble, Unscramble, UnscrambleError,
+        BeginRead, EndRead)
 from htsql.core.adapter import adapt
 from htsql.core.context import context
 from htsql.core.domain import (BooleanDomain, TextDomain, EnumDomain,
@@ -41,6 +42,32 @@ class ConnectMySQL(Connect):
         return connection
 
 
+class BeginMySQLRead(BeginRead):
+
+    def __call__(self):
+        connection = self.connection.connection
+        if self.mode == 'autocommit':
+            with self.connection.guard:
+                connection.autocommit(True)
+            return True
+        # Read-only transactions are supported since MySQL 5.6.5.
+        version = tuple(int(number) for number in
+                        connection.get_server_info().split('-')[0].split('.')
+                        if number.isdigit())
+        if version >= (5, 6, 5):
+            cursor = self.connection.cursor()
+            cursor.execute("START TRANSACTION READ ONLY")
+        return None
+
+
+class EndMySQLRead(EndRead):
+
+    def __call__(self):
+        # Connections are always opened with autocommit disabled.
+        with self.connection.guard:
+            self.connection.connection.autocommit(False)
+
+
 class UnscrambleMySQLError(UnscrambleError):
 
     def __call__(self):
@@ -4,7 +4,7 @@
 
 
 from htsql.core.adapter import Protocol, call
-from htsql.core.introspect import Introspect
+from htsql.core.introspect import Introspect, Fingerprint
 from htsql.core.entity import make_catalog
 from htsql.core.domain import (BooleanDomain, IntegerDomain,
                                DecimalDomain, FloatDomain, TextDomain,
@@ -14,6 +14,16 @@ from htsql.core.connect import connect
 import itertools
 
 
+class FingerprintMySQL(Fingerprint):
+
+    # `ALTER TABLE` recreates the table in most cases.
+    sql = """
+        SELECT COUNT(*), MAX(t.create_time)
+        FROM information_schema.tables t
+        WHERE t.table_schema NOT IN ('mysql', 'information_schema')
+    """
+
+
 class IntrospectMySQL(Introspect):
 
     system_schema_names = [u'mysql', u'information_schema']
@@ -3,7 +3,8 @@
 #
 
 
-from htsql.core.connect import Connect, Scramble, Unscramble, UnscrambleError
+from htsql.core.connect import (Connect, Scramble, Unscramble, UnscrambleError,
+        BeginRead, EndRead, Probe)
 from htsql.core.adapter import adapt
 from htsql.core.context import context
 from htsql.core.error import Error
@@ -60,6 +61,30 @@ class ConnectOracle(Connect):
         return connection
 
 
+class BeginOracleRead(BeginRead):
+
+    def __call__(self):
+        connection = self.connection.connection
+        if self.mode == 'autocommit':
+            state = connection.autocommit
+            connection.autocommit = True
+            return state
+        cursor = self.connection.cursor()
+        cursor.execute("SET TRANSACTION READ ONLY")
+        return None
+
+
+class EndOracleRead(EndRead):
+
+    def __call__(self):
+        self.connection.connection.autocommit = self.state
+
+
+class ProbeOracle(Probe):
+
+    statement = "SELECT 1 FROM DUAL"
+
+
 class UnscrambleOracleError(UnscrambleError):
 
     def __call__(self):
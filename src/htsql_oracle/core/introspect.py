@@ -4,7 +4,7 @@
 
 
 from htsql.core.adapter import Protocol, call
-from htsql.core.introspect import Introspect
+from htsql.core.introspect import Introspect, Fingerprint
 from htsql.core.entity import make_catalog
 from htsql.core.domain import (BooleanDomain, IntegerDomain, DecimalDomain,
                                FloatDomain, TextDomain, DateTimeDomain,
@@ -14,6 +14,15 @@ import re
 import itertools
 
 
+class FingerprintOracle(Fingerprint):
+
+    sql = """
+        SELECT COUNT(*), MAX(o.last_ddl_time)
+        FROM all_objects o
+        WHERE o.object_type IN ('TABLE', 'VIEW')
+    """
+
+
 class IntrospectOracle(Introspect):
 
     system_owner_names = ['SYS', 'SYSTEM', 'OUTLN', 'DIP', 'TSMSYS', 'DBSNMP',
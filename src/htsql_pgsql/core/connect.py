@@ -6,7 +6,7 @@
 from htsql.core.adapter import adapt
 from htsql.core.domain import TextDomain, EnumDomain
 from htsql.core.connect import (Connect, UnscrambleError, Unscramble,
-        Scramble)
+        Scramble, ExportSnapshot, ImportSnapshot, BeginRead, EndRead)
 from htsql.core.context import context
 import psycopg2, psycopg2.extensions
 
@@ -51,6 +51,71 @@ class ConnectPGSQL(Connect):
         return connection
 
 
+def is_serializable(connection):
+    # Checks if `BeginPGSQLRead` declared the transaction serializable.
+    return (context.app.htsql.read_mode == 'deferrable' and
+            connection.connection.server_version >= 90100)
+
+
+class ExportPGSQLSnapshot(ExportSnapshot):
+
+    def __call__(self):
+        # Snapshots could be exported since PostgreSQL 9.2.
+        if self.connection.connection.server_version < 90200:
+            return None
+        # No snapshot if the connection is not in a transaction.
+        if (self.connection.connection.isolation_level ==
+                psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT):
+            return None
+        cursor = self.connection.cursor()
+        # Keep the isolation level chosen by the read mode.
+        if not is_serializable(self.connection):
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        cursor.execute("SELECT pg_export_snapshot()")
+        [(snapshot,)] = cursor.fetchall()
+        return snapshot
+
+
+class ImportPGSQLSnapshot(ImportSnapshot):
+
+    def __call__(self):
+        cursor = self.connection.cursor()
+        # A serializable snapshot could only be imported by a serializable
+        # transaction, which must not be deferrable.
+        if is_serializable(self.connection):
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL SERIALIZABLE,"
+                           " READ ONLY, NOT DEFERRABLE")
+        else:
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+        cursor.execute("SET TRANSACTION SNAPSHOT %s", (self.snapshot,))
+
+
+class BeginPGSQLRead(BeginRead):
+
+    def __call__(self):
+        connection = self.connection.connection
+        if self.mode == 'autocommit':
+            state = connection.isolation_level
+            connection.set_isolation_level(
+                    psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+            return state
+        cursor = self.connection.cursor()
+        # Deferrable transactions are supported since PostgreSQL 9.1.
+        if self.mode == 'deferrable' and connection.server_version >= 90100:
+            cursor.execute("SET TRANSACTION ISOLATION LEVEL SERIALIZABLE,"
+                           " READ ONLY, DEFERRABLE")
+        else:
+            cursor.execute("SET TRANSACTION READ ONLY")
+        return None
+
+
+class EndPGSQLRead(EndRead):
+
+    def __call__(self):
+        with self.connection.guard:
+            self.connection.connection.set_isolation_level(self.state)
+
+
 class UnscramblePGSQLError(UnscrambleError):
 
     def __call__(self):
@@ -4,7 +4,7 @@
 
 
 from htsql.core.adapter import Protocol, call
-from htsql.core.introspect import Introspect
+from htsql.core.introspect import Introspect, Fingerprint
 from htsql.core.entity import make_catalog
 from htsql.core.domain import (BooleanDomain, IntegerDomain, FloatDomain,
                                DecimalDomain, TextDomain, EnumDomain,
@@ -15,6 +15,27 @@ import itertools
 import fnmatch
 
 
+class FingerprintPGSQL(Fingerprint):
+
+    # Rows of the system catalogs get a new `xmin` when updated.
+    # Temporary tables are created by other sessions all the time,
+    # so we skip them.
+    sql = """
+        SELECT c.n, c.x, a.n, a.x, r.n, r.x
+        FROM (SELECT COUNT(*) AS n, SUM(c.xmin::text::bigint) AS x
+              FROM pg_catalog.pg_class c
+              WHERE c.relpersistence <> 't') AS c,
+             (SELECT COUNT(*) AS n, SUM(a.xmin::text::bigint) AS x
+              FROM pg_catalog.pg_attribute a
+              JOIN pg_catalog.pg_class c ON (a.attrelid = c.oid)
+              WHERE c.relpersistence <> 't') AS a,
+             (SELECT COUNT(*) AS n, SUM(r.xmin::text::bigint) AS x
+              FROM pg_catalog.pg_constraint r
+              LEFT JOIN pg_catalog.pg_class c ON (r.conrelid = c.oid)
+              WHERE c.relpersistence IS DISTINCT FROM 't') AS r
+    """
+
+
 class IntrospectPGSQL(Introspect):
 
     system_schema_names = [u'pg_*', u'information_schema']
@@ -3,7 +3,8 @@
 #
 
 
-from htsql.core.connect import Connect, Scramble, Unscramble, UnscrambleError
+from htsql.core.connect import (Connect, Scramble, Unscramble, UnscrambleError,
+        BeginRead, EndRead)
 from htsql.core.adapter import adapt
 from htsql.core.error import Error
 from htsql.core.context import context
@@ -44,8 +45,9 @@ class ConnectSQLite(Connect):
         if not ((db.database.startswith(":") and db.database.endswith(":")) or
                 os.path.exists(db.database)):
             raise Error("file does not exist: %s" % db.database)
-        # Generate and return the DBAPI connection.
-        connection = sqlite3.connect(db.database)
+        # Generate and return the DBAPI connection.  A pooled connection
+        # may be used by different threads, but never at the same time.
+        connection = sqlite3.connect(db.database, check_same_thread=False)
         self.create_functions(connection)
         if self.with_autocommit:
             connection.isolation_level = None
@@ -56,6 +58,25 @@ class ConnectSQLite(Connect):
         connection.create_function('SQRT', 1, sqlite3_sqrt)
 
 
+class BeginSQLiteRead(BeginRead):
+
+    def __call__(self):
+        # SQLite has no read-only transactions, but we could still skip
+        # the transaction altogether.
+        if self.mode != 'autocommit':
+            return None
+        connection = self.connection.connection
+        state = connection.isolation_level
+        connection.isolation_level = None
+        return state
+
+
+class EndSQLiteRead(EndRead):
+
+    def __call__(self):
+        self.connection.connection.isolation_level = self.state
+
+
 class UnscrambleSQLiteError(UnscrambleError):
 
     def __call__(self):
@@ -107,6 +128,10 @@ class UnscrambleSQLiteDecimal(Unscramble):
             return None
         if isinstance(value, float):
             return decimal.Decimal(str(value))
+        # A column with numeric affinity stores integral values
+        # as integers.
+        if isinstance(value, (int, long)):
+            return decimal.Decimal(value)
         raise Error("Expected a decimal value, got", repr(value))
 
 
@@ -202,3 +227,47 @@ class UnscrambleSQLiteDateTime(Unscramble):
         return value
 
 
+
+
+class ScrambleSQLiteDecimal(Scramble):
+
+    adapt(DecimalDomain)
+
+    @staticmethod
+    def convert(value):
+        if value is None:
+            return None
+        return float(value)
+
+
+class ScrambleSQLiteDate(Scramble):
+
+    adapt(DateDomain)
+
+    @staticmethod
+    def convert(value):
+        if value is None:
+            return None
+        return unicode(value)
+
+
+class ScrambleSQLiteTime(Scramble):
+
+    adapt(TimeDomain)
+
+    @staticmethod
+    def convert(value):
+        if value is None:
+            return None
+        return unicode(value.replace(tzinfo=None))
+
+
+class ScrambleSQLiteDateTime(Scramble):
+
+    adapt(DateTimeDomain)
+
+    @staticmethod
+    def convert(value):
+        if value is None:
+            return None
+        return unicode(value.replace(tzinfo=None))
@@ -4,7 +4,7 @@
 
 
 from htsql.core.adapter import Protocol, call
-from htsql.core.introspect import Introspect
+from htsql.core.introspect import Introspect, Fingerprint
 from htsql.core.entity import make_catalog
 from htsql.core.domain import (BooleanDomain, IntegerDomain, DecimalDomain,
         FloatDomain, TextDomain, DateDomain, TimeDomain, DateTimeDomain,
@@ -12,6 +12,12 @@ from htsql.core.domain import (BooleanDomain, IntegerDomain, DecimalDomain,
 from htsql.core.connect import connect
 
 
+class FingerprintSQLite(Fingerprint):
+
+    # The schema version is incremented on every schema change.
+    sql = """PRAGMA schema_version"""
+
+
 class IntrospectSQLite(Introspect):
 
     @staticmethod
@@ -0,0 +1,99 @@
+#
+# Copyright (c) 2006-2013, Prometheus Research, LLC
+#
+
+
+# Compares converting rows fetched from the database cell by cell with
+# the row decoder generated by `UnscrambleRows`.
+#
+# Usage:
+#   python test/bench/decode.py [ROWS [CHUNK]]
+
+
+from htsql import HTSQL
+from htsql.core.domain import (IntegerDomain, DecimalDomain, FloatDomain,
+        TextDomain, DateDomain, BooleanDomain)
+from htsql.core.connect import unscramble, unscramble_rows
+import sys
+import time
+import tempfile
+
+
+# Values as they are returned by the SQLite driver.
+NARROW = [(IntegerDomain(), lambda k: k),
+          (TextDomain(), lambda k: u"Name %s" % k)]
+
+WIDE = NARROW + \
+       [(DecimalDomain(), lambda k: k/100.0),
+        (FloatDomain(), lambda k: k*0.5),
+        (DateDomain(), lambda k: u"2000-01-%02d" % (k % 28 + 1)),
+        (BooleanDomain(), lambda k: k % 3 == 0),
+        (TextDomain(), lambda k: u"Title %s" % k),
+        (IntegerDomain(), lambda k: k*7),
+        (TextDomain(), lambda k: None),
+        (IntegerDomain(), lambda k: None)]
+
+
+def split(columns, count, size):
+    chunks = []
+    rows = []
+    for k in xrange(count):
+        rows.append(tuple(value(k) for domain, value in columns))
+        if len(rows) == size:
+            chunks.append(rows)
+            rows = []
+    if rows:
+        chunks.append(rows)
+    return chunks
+
+
+def run_cells(domains, chunks):
+    unscrambles = [unscramble(domain) for domain in domains]
+    total = 0
+    for chunk in chunks:
+        chunk = [tuple([convert(item)
+                        for item, convert in zip(row, unscrambles)])
+                 for row in chunk]
+        total += len(chunk)
+    return total
+
+
+def run_rows(domains, chunks):
+    decode = unscramble_rows(domains)
+    total = 0
+    for chunk in chunks:
+        chunk = decode(chunk)
+        total += len(chunk)
+    return total
+
+
+def measure(name, run, domains, chunks, count):
+    start = time.time()
+    total = run(domains, chunks)
+    end = time.time()
+    assert total == count
+    print "%-8s %-8s %10.0f rows/s" % (name, run.__name__[4:],
+                                       count/(end-start))
+
+
+def main():
+    count = 1000000
+    size = 1000
+    if len(sys.argv) > 1:
+        count = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        size = int(sys.argv[2])
+    # The application is needed to look up the column decoders; an
+    # empty SQLite database would do.
+    database = tempfile.NamedTemporaryFile(suffix='.sqlite')
+    with HTSQL("sqlite:"+database.name):
+        print "%s rows in chunks of %s" % (count, size)
+        for name, columns in [("narrow", NARROW), ("wide", WIDE)]:
+            domains = [domain for domain, value in columns]
+            chunks = split(columns, count, size)
+            measure(name, run_cells, domains, chunks, count)
+            measure(name, run_rows, domains, chunks, count)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+#
+# Copyright (c) 2006-2013, Prometheus Research, LLC
+#
+
+
+# Compares the compiled JSON and raw renderers with rendering the output
+# through the token stream.
+#
+# Usage:
+#   python test/bench/json_emit.py [ROWS]
+
+
+from htsql import HTSQL
+from htsql.core.cmd.act import produce
+from htsql.core.fmt.format import JSONFormat, RawFormat
+from htsql.core.fmt.json import EmitJSON, EmitRaw, dump_json, purge_null_keys
+import sys
+import time
+import hashlib
+import tempfile
+import sqlite3
+
+
+def prepare(count):
+    database = tempfile.NamedTemporaryFile(suffix='.sqlite')
+    connection = sqlite3.connect(database.name)
+    connection.execute("""
+        CREATE TABLE sample (
+            id INTEGER NOT NULL PRIMARY KEY,
+            name TEXT NOT NULL,
+            amount INTEGER,
+            ratio REAL,
+            created DATE,
+            is_active BOOLEAN)
+    """)
+    connection.executemany("INSERT INTO sample VALUES (?, ?, ?, ?, ?, ?)",
+            ((k, u"Name \"%s\"" % k, k*100, k*0.5,
+              "2000-01-%02d" % (k % 28 + 1), k % 3 == 0)
+             for k in xrange(count)))
+    connection.commit()
+    connection.close()
+    return database
+
+
+def run_tokens(emitter, with_null):
+    tokens = emitter.emit()
+    if not with_null:
+        tokens = purge_null_keys(tokens)
+    return (line.encode('utf-8') for line in dump_json(tokens))
+
+
+def run_compiled(emitter, with_null):
+    return emitter()
+
+
+def measure(name, run, emit, format, product):
+    emitter = emit.__prepare__(format, product)
+    start = time.time()
+    digest = hashlib.md5()
+    size = 0
+    chunks = 0
+    for chunk in run(emitter, format.with_null):
+        digest.update(chunk)
+        size += len(chunk)
+        chunks += 1
+    end = time.time()
+    print "%-16s time: %6.2fs  chunks: %8d  size: %6.1fMB" \
+            % (name, end-start, chunks, size/1024.0/1024.0)
+    return digest.hexdigest()
+
+
+def main():
+    count = 100000
+    if len(sys.argv) > 1:
+        count = int(sys.argv[1])
+    database = prepare(count)
+    with HTSQL("sqlite:"+database.name):
+        product = produce("/sample")
+        print "%s rows" % count
+        for emit, format in [(EmitJSON, JSONFormat()),
+                             (EmitRaw, RawFormat())]:
+            name = emit.__name__[4:].lower()
+            expected = measure(name+" (tokens)", run_tokens,
+                               emit, format, product)
+            output = measure(name+" (compiled)", run_compiled,
+                             emit, format, product)
+            assert output == expected, "%s output differs" % name
+
+
+if __name__ == '__main__':
+    main()
+
+
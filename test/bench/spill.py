@@ -0,0 +1,113 @@
+#
+# Copyright (c) 2006-2013, Prometheus Research, LLC
+#
+
+
+# Compares the columnar spill format used by `BatchSQLPipe` with
+# pickling batches of rows to a temporary file.
+#
+# Usage:
+#   python test/bench/spill.py [ROWS [BATCH]]
+
+
+from htsql import HTSQL
+from htsql.core.domain import (IntegerDomain, DecimalDomain, FloatDomain,
+        TextDomain, DateDomain, DateTimeDomain, BooleanDomain)
+from htsql.core.tr.spill import SpillFile
+import sys
+import time
+import tempfile
+import cPickle
+import datetime
+import decimal
+
+
+def generate(count):
+    start = datetime.datetime(2000, 1, 1)
+    for k in xrange(count):
+        yield (k,
+               u"Name %s" % k,
+               decimal.Decimal(k)/100,
+               k*0.5,
+               (start+datetime.timedelta(k % 10000)).date(),
+               start+datetime.timedelta(0, k),
+               (k % 3 == 0) or None)
+
+
+def split(count, size):
+    batches = []
+    rows = []
+    for row in generate(count):
+        rows.append(row)
+        if len(rows) == size:
+            batches.append(rows)
+            rows = []
+    if rows:
+        batches.append(rows)
+    return batches
+
+
+def run_pickle(batches, count):
+    stream = tempfile.TemporaryFile()
+    number = 0
+    for rows in batches:
+        number += 1
+        cPickle.dump(rows, stream, 2)
+    disk = stream.tell()
+    stream.seek(0)
+    yield disk
+    total = 0
+    for k in xrange(number):
+        for row in cPickle.load(stream):
+            total += 1
+    assert total == count
+    yield total
+
+
+def run_spill(batches, count):
+    spill = SpillFile([IntegerDomain(), TextDomain(), DecimalDomain(),
+                       FloatDomain(), DateDomain(), DateTimeDomain(),
+                       BooleanDomain()])
+    for rows in batches:
+        spill.write(rows)
+    disk = spill.stream.tell()
+    yield disk
+    total = 0
+    for row in spill:
+        total += 1
+    assert total == count
+    yield total
+
+
+def measure(name, run, batches, count):
+    start = time.time()
+    routine = run(batches, count)
+    disk = next(routine)
+    middle = time.time()
+    next(routine)
+    end = time.time()
+    print "%-8s write: %6.2fs  read: %6.2fs  disk: %6.1fMB" \
+            % (name, middle-start, end-middle, disk/1024.0/1024.0)
+
+
+def main():
+    count = 1000000
+    size = 1000
+    if len(sys.argv) > 1:
+        count = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        size = int(sys.argv[2])
+    # The application is needed to look up the column encoders; an
+    # empty SQLite database would do.
+    database = tempfile.NamedTemporaryFile(suffix='.sqlite')
+    with HTSQL("sqlite:"+database.name):
+        print "%s rows in batches of %s" % (count, size)
+        batches = split(count, size)
+        measure("pickle", run_pickle, batches, count)
+        measure("columnar", run_spill, batches, count)
+
+
+if __name__ == '__main__':
+    main()
+
+
@@ -0,0 +1,85 @@
+#
+# Copyright (c) 2006-2013, Prometheus Research, LLC
+#
+
+
+# Measures translation throughput on the queries of the regression
+# test suite; queries are translated to SQL, but not executed.
+#
+# Usage:
+#   python test/bench/translate.py [DB [ROUNDS]]
+
+
+from htsql import HTSQL
+from htsql.core.error import Error
+from htsql.core.cmd.act import act, AnalyzeAction
+import sys
+import os
+import time
+import yaml
+
+
+DEMO_DB = 'sqlite:build/regress/sqlite/htsql_demo.sqlite'
+INPUTS = ['test/input/translation.yaml',
+          'test/input/library.yaml',
+          'test/input/tutorial.yaml',
+          'test/input/format.yaml']
+
+
+def collect(node, uris):
+    # Finds URIs of all regression tests that are expected to succeed.
+    if isinstance(node, list):
+        for item in node:
+            collect(item, uris)
+    elif isinstance(node, dict):
+        if 'uri' in node and 'expect' not in node and 'if' not in node:
+            uris.append(node['uri'])
+        for key in sorted(node):
+            if key not in ('uri', 'if', 'ifndef'):
+                collect(node[key], uris)
+
+
+def translate(uris):
+    for uri in uris:
+        act(uri, AnalyzeAction())
+
+
+def main():
+    db = DEMO_DB
+    rounds = 5
+    if len(sys.argv) > 1:
+        db = sys.argv[1]
+    if len(sys.argv) > 2:
+        rounds = int(sys.argv[2])
+    uris = []
+    for path in INPUTS:
+        collect(yaml.safe_load(open(path)), uris)
+    app = HTSQL(db, {'htsql': {'plan_cache_size': None}})
+    with app:
+        # Skip queries that are not valid for the demo database and
+        # let the first pass populate the caches.
+        valid_uris = []
+        for uri in uris:
+            try:
+                act(uri, AnalyzeAction())
+            except Error:
+                continue
+            valid_uris.append(uri)
+        uris = valid_uris
+        print "%s queries, %s rounds" % (len(uris), rounds)
+        best = None
+        for k in range(rounds):
+            start = time.time()
+            translate(uris)
+            elapsed = time.time()-start
+            if best is None or elapsed < best:
+                best = elapsed
+            print "round %s: %6.3fs  %8.1f queries/s" \
+                    % (k+1, elapsed, len(uris)/elapsed)
+        print "best:    %6.3fs  %8.1f queries/s" % (best, len(uris)/best)
+
+
+if __name__ == '__main__':
+    main()
+
+